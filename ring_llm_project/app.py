@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, Optional
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 from commands.ask import AskCommand
 from commands.copy import CopyCommand
@@ -15,9 +16,15 @@ from commands.loop_done import LoopDoneCommand
 from commands.say import SayCommand
 from commands.unfold import UnfoldCommand
 from core.dispatcher import CommandDispatcher, CommandRegistry
+from core.fold import FoldTrigger
+from core.budget import BudgetController
+from core.changefeed import MemoryDelta
 from core.io import ConsoleIO, IOAdapter
 from core.llm_client import LLMClient, LLMConfig
+from core.maintenance import MaintenanceWorker
 from core.memory import Memory
+from core.types import ExecutionContext
+from core.usage import USAGE, UsageLedger
 from scenarios.day.engine import DayEngine
 
 
@@ -27,9 +34,22 @@ class AgentApp:
     dispatcher: CommandDispatcher
     day_engine: DayEngine
     memory: Memory
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    maintenance: Optional[MaintenanceWorker] = None
+    io: Optional[IOAdapter] = None
+    # change-feed position the frontend has seen (see poll_changes)
+    changes_seq: int = -1
 
     @classmethod
-    def build_default(cls, *, llm_pool: Dict[str, LLMConfig], io: Optional[IOAdapter] = None) -> "AgentApp":
+    def build_default(
+        cls,
+        *,
+        llm_pool: Dict[str, LLMConfig],
+        io: Optional[IOAdapter] = None,
+        budgets: Optional[BudgetController] = None,
+        ledger: Optional[UsageLedger] = None,
+    ) -> "AgentApp":
+        """budgets/ledger: pass the interactive router's, to share budgets and usage totals (default USAGE)."""
         io = io or ConsoleIO()
 
         pool: Dict[str, LLMClient] = {k: LLMClient(cfg) for k, cfg in llm_pool.items()}
@@ -47,14 +67,63 @@ class AgentApp:
         registry.register(AskCommand())
 
         dispatcher = CommandDispatcher(registry)
-        day = DayEngine(dispatcher=dispatcher, llm_pool=pool, io=io)
+        # the S2 loop uses the first pool entry, queued under the same key as interactive calls to it
+        key = next(iter(pool))
+        day = DayEngine(
+            dispatcher=dispatcher,
+            llm=pool[key],
+            llm_key=key,
+            budgets=budgets or BudgetController(),
+            ledger=ledger or USAGE,
+        )
         mem = Memory()
-        return cls(llm_pool=pool, dispatcher=dispatcher, day_engine=day, memory=mem)
+        return cls(llm_pool=pool, dispatcher=dispatcher, day_engine=day, memory=mem, io=io)
+
+    def start_background_folding(self, *, idle_delay_s: float = 1.0) -> None:
+        """Move the S2 fold-loop off the turn path: it runs while the user is idle."""
+        if self.maintenance is not None:
+            return
+
+        def job(work: Memory, cancel: threading.Event) -> None:
+            self.day_engine.run_s2_fold_loop(work, ExecutionContext(llm_pool=self.llm_pool, cancel=cancel))
+
+        # same hysteresis as the interactive pipeline's Folder, so a memory that sits
+        # just above max_chars is not re-folded on every idle period
+        trigger = FoldTrigger()
+        self.maintenance = MaintenanceWorker(
+            lock=self.lock,
+            get_memory=lambda: self.memory,
+            needs_fold=trigger.needs_fold,
+            job=job,
+            idle_delay_s=idle_delay_s,
+            on_settled=trigger.settle,
+        )
+        self.maintenance.start()
+
+    def poll_changes(self) -> List[MemoryDelta]:
+        """Memory deltas since the last poll; a full snapshot on the first call or after falling behind the feed."""
+        with self.lock:
+            deltas = self.memory.changes_since(self.changes_seq) if self.changes_seq >= 0 else None
+            if deltas is None:
+                deltas = self.memory.snapshot_deltas()
+            self.changes_seq = self.memory.changes.seq
+            return deltas
 
     def run_once(self, user_text: str) -> str:
-        """One app tick: add user's message into BODY and run day S2 fold-loop."""
-        if user_text.strip():
-            self.memory.append_body(f"USER: {user_text}\n")
-        res = self.day_engine.run_s2_fold_loop(self.memory)
-        self.memory = res.memory
-        return self.memory.to_text()
+        """One app tick: add user's message into BODY and run day S2 fold-loop (inline unless backgrounded).
+
+        If the IO adapter consumes deltas, they are pushed to it and "" is returned
+        instead of the full memory text.
+        """
+        if self.maintenance is not None:
+            self.maintenance.notify_user_activity()
+        with self.lock:
+            if user_text.strip():
+                self.memory.append_body(f"USER: {user_text}\n")
+            if self.maintenance is None:
+                res = self.day_engine.run_s2_fold_loop(self.memory, ExecutionContext(llm_pool=self.llm_pool))
+                self.memory = res.memory
+            if self.io is not None and self.io.wants_deltas:
+                self.io.apply_deltas(self.poll_changes())
+                return ""
+            return self.memory.to_text()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Run scripted conversations from a JSONL file through create_process, without a console.
+
+    python batch.py sessions.jsonl -o results.jsonl --workers 4
+
+One input line per session:
+
+    {"session": "s1", "turns": ["hi", "fold the specs"], "answers": ["yes"], "body": "..."}
+
+"turns" are the user messages in order; an item may also be
+{"user": "...", "answers": [...]} to script the ASK answers of that turn.
+"answers" are used by any turn once its own are used up. "body" (optional)
+is the initial memory body.
+
+Output is JSONL, written as results arrive: one {"type": "turn"} line per
+turn (what the assistant said, wall time) and one {"type": "session"} line
+per session (totals, error, and with --dump-memory the final memory).
+Input is read lazily and at most 2 * workers sessions are in flight, so
+memory use does not grow with the input size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import IO, Any, Deque, Dict, Iterator, List, Optional
+
+from core.io import IOAdapter
+from core.llm_client import LLMClient, LLMConfig
+from core.memory import Memory
+from core.behavior import DebugFlags
+from core.process import ProcessConfig
+
+_DONE = object()
+
+
+class ScriptExhausted(RuntimeError):
+    pass
+
+
+class ScriptedIO(IOAdapter):
+    """Answers ASK from the session script and collects what the pipeline says during a turn."""
+
+    def __init__(self, answers: List[str], default_answer: Optional[str] = None):
+        self._answers: Deque[str] = deque(answers)
+        self._turn: Deque[str] = deque()
+        self.default_answer = default_answer
+        self.said: List[str] = []
+        self.asked = 0
+
+    def start_turn(self, answers: List[str]) -> None:
+        self._turn = deque(answers)
+        self.said = []
+
+    def say(self, text: str) -> None:
+        self.said.append(text)
+
+    def show(self, text: str) -> None:
+        self.said.append(text)
+
+    def ask(self, prompt: str) -> str:
+        self.asked += 1
+        self.said.append(prompt)
+        if self._turn:
+            return self._turn.popleft()
+        if self._answers:
+            return self._answers.popleft()
+        if self.default_answer is not None:
+            return self.default_answer
+        raise ScriptExhausted("ASK without a scripted answer")
+
+
+@dataclass
+class BatchConfig:
+    workers: int = 4
+    llm_url: str = "http://127.0.0.1:1234"
+    model: str = "openai/gpt-oss-20b"
+    llm_key: str = "oss20b"
+    turn_budget_s: Optional[float] = None
+    max_chars: int = 30_000
+    dump_memory: bool = False
+    default_answer: Optional[str] = None
+    log_level: str = "WARNING"
+
+
+def read_sessions(lines: Iterator[str]) -> Iterator[Dict[str, Any]]:
+    """Parsed sessions, one line at a time; bad lines come back as {"error": ...}."""
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict) or not isinstance(item.get("turns"), list):
+                raise ValueError('expected an object with a "turns" list')
+        except ValueError as exc:
+            yield {"session": f"line{n}", "error": f"line {n}: {exc}"}
+            continue
+        item.setdefault("session", f"line{n}")
+        yield item
+
+
+def run_session(item: Dict[str, Any], cfg: BatchConfig, llms: Dict[str, LLMClient], emit) -> None:
+    """Run one session; emit(record) is called once per turn and once at the end."""
+    from main import create_process
+
+    sid = str(item["session"])
+    summary: Dict[str, Any] = {"type": "session", "session": sid, "turns": 0, "total_ms": 0.0, "error": None}
+    if item.get("error"):
+        summary["error"] = item["error"]
+        emit(summary)
+        return
+
+    io = ScriptedIO([str(a) for a in item.get("answers", [])], cfg.default_answer)
+    process = None
+    try:
+        process = create_process(
+            io=io,
+            mem=Memory(body=str(item.get("body", "")), max_chars=cfg.max_chars),
+            llms=llms,
+            process_cfg=ProcessConfig(control_llm_key=cfg.llm_key, turn_budget_s=cfg.turn_budget_s),
+            debug=DebugFlags(show_raw_model_output=False, show_extracted_command=False, log_level=cfg.log_level),
+        )
+        for k, turn in enumerate(item["turns"]):
+            if isinstance(turn, dict):
+                user, answers = str(turn.get("user", "")), [str(a) for a in turn.get("answers", [])]
+            else:
+                user, answers = str(turn), []
+            io.start_turn(answers)
+            t0 = time.perf_counter()
+            error = None
+            try:
+                process.handle_user_message(user)
+                process.run_once()
+            except Exception as exc:  # one bad turn ends the session, not the batch
+                error = f"{type(exc).__name__}: {exc}"
+            ms = (time.perf_counter() - t0) * 1000.0
+            summary["turns"] += 1
+            summary["total_ms"] += ms
+            emit({"type": "turn", "session": sid, "turn": k, "user": user, "said": io.said, "ms": round(ms, 1), "error": error})
+            if error is not None:
+                summary["error"] = f"turn {k}: {error}"
+                break
+        summary["asked"] = io.asked
+        if cfg.dump_memory:
+            summary["memory"] = process.mem.to_text()
+    except Exception as exc:
+        summary["error"] = f"{type(exc).__name__}: {exc}"
+    finally:
+        if process is not None:
+            process.close()
+    summary["total_ms"] = round(summary["total_ms"], 1)
+    emit(summary)
+
+
+def run_batch(lines: Iterator[str], out: IO[str], cfg: BatchConfig) -> Dict[str, int]:
+    """Stream sessions from lines through a pool of cfg.workers threads; results go to out as JSONL."""
+    llms = {cfg.llm_key: LLMClient(LLMConfig(base_url=cfg.llm_url, model=cfg.model))}
+    todo: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, cfg.workers) * 2)
+    results: "queue.Queue[Any]" = queue.Queue(maxsize=256)
+    counts = {"sessions": 0, "turns": 0, "failed": 0}
+
+    def worker() -> None:
+        while True:
+            item = todo.get()
+            if item is _DONE:
+                return
+            run_session(item, cfg, llms, results.put)
+
+    def writer() -> None:
+        while True:
+            rec = results.get()
+            if rec is _DONE:
+                return
+            if rec["type"] == "turn":
+                counts["turns"] += 1
+            else:
+                counts["sessions"] += 1
+                counts["failed"] += rec["error"] is not None
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+
+    threads = [threading.Thread(target=worker, name=f"batch-{i}", daemon=True) for i in range(max(1, cfg.workers))]
+    w = threading.Thread(target=writer, name="batch-writer", daemon=True)
+    for t in threads + [w]:
+        t.start()
+    for item in read_sessions(lines):
+        todo.put(item)  # blocks while the pool is busy: input is never read ahead
+    for _ in threads:
+        todo.put(_DONE)
+    for t in threads:
+        t.join()
+    results.put(_DONE)
+    w.join()
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="batch.py", description="Run scripted JSONL sessions.")
+    ap.add_argument("input", help="sessions JSONL ('-' = stdin)")
+    ap.add_argument("-o", "--output", default="-", help="results JSONL ('-' = stdout)")
+    ap.add_argument("-w", "--workers", type=int, default=4)
+    ap.add_argument("--llm-url", default=BatchConfig.llm_url)
+    ap.add_argument("--model", default=BatchConfig.model)
+    ap.add_argument("--turn-budget-s", type=float, default=None)
+    ap.add_argument("--max-chars", type=int, default=BatchConfig.max_chars)
+    ap.add_argument("--dump-memory", action="store_true", help="add the final memory to each session line")
+    ap.add_argument("--default-answer", default=None, help="answer for ASKs the script does not cover")
+    ap.add_argument("--log-level", default="WARNING")
+    args = ap.parse_args(argv)
+
+    cfg = BatchConfig(
+        workers=args.workers,
+        llm_url=args.llm_url,
+        model=args.model,
+        turn_budget_s=args.turn_budget_s,
+        max_chars=args.max_chars,
+        dump_memory=args.dump_memory,
+        default_answer=args.default_answer,
+        log_level=args.log_level,
+    )
+    from main import configure_logging
+    from utils import log
+
+    # one sink for all sessions; create_process does not touch it
+    configure_logging(DebugFlags(log_level=cfg.log_level))
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        counts = run_batch(iter(src), dst, cfg)
+    finally:
+        log.shutdown()
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(
+        f"{counts['sessions']} sessions, {counts['turns']} turns, {counts['failed']} failed",
+        file=sys.stderr,
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
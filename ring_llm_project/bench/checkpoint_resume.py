@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Checkpoint save / resume time and how many folds the first prompt pages in.
+
+    python -m bench.checkpoint_resume --lines 3000 --folds 400 --shards 3
+
+Builds a Memory of --shards shards with --lines lines of about --line-chars
+chars in total and --folds folds spread over them, checkpoints it, resumes
+it, and packs the first prompt from the resumed memory. For comparison it
+also times re-indexing every fold from its content, which is what a resume
+without saved postings would do.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from core.checkpoint import load_checkpoint, save_checkpoint
+from core.fold_index import FoldIndex
+from core.memory import Memory
+from core.process import Process, ProcessConfig
+from core.prompt_builder import PromptBuilder, PromptConfig
+
+_WORDS = (
+    "buck boost flyback inductor ripple mosfet gate driver snubber diode capacitor esr "
+    "thermal efficiency switching frequency duty cycle feedback loop compensation"
+).split()
+
+
+def _line(rng: random.Random, k: int, chars: int) -> str:
+    words: List[str] = [f"item {k}:"]
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(_WORDS))
+    return " ".join(words) + "\n"
+
+
+def build_memory(lines: int, folds: int, shards: int, line_chars: int, seed: int) -> Memory:
+    rng = random.Random(seed)
+    mem = Memory(max_chars=1 << 30)
+    names = ["main"] + [f"shard{s}" for s in range(1, shards)]
+    per_shard, folds_per_shard = lines // shards, folds // shards
+    for s, name in enumerate(names):
+        mem.switch_shard(name)
+        mem.body = "".join(_line(rng, s * per_shard + k, line_chars) for k in range(per_shard))
+        # fold every other block of lines, last block first so earlier offsets stay valid
+        block = max(1, per_shard // (2 * folds_per_shard))
+        starts = [k * 2 * block for k in range(folds_per_shard) if (k * 2 + 1) * block <= per_shard]
+        offsets = [0]
+        for ln in mem.body.splitlines(keepends=True):
+            offsets.append(offsets[-1] + len(ln))
+        for k in reversed(starts):
+            mem.fold_by_offsets(offsets[k], offsets[k + block], f"{rng.choice(_WORDS)} notes {s}.{k}")
+    mem.switch_shard("main")
+    mem.add_event("user", "what was the inductor ripple at the highest switching frequency?")
+    return mem
+
+
+def _all_folds(mem: Memory) -> Dict[str, object]:
+    out = dict(mem.folds)
+    for sh in mem.shards.values():
+        out.update(sh.folds)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--lines", type=int, default=3000)
+    ap.add_argument("--folds", type=int, default=400)
+    ap.add_argument("--shards", type=int, default=3)
+    ap.add_argument("--line-chars", type=int, default=1400)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    mem = build_memory(args.lines, args.folds, args.shards, args.line_chars, args.seed)
+    folds = _all_folds(mem)
+    total_chars = len(mem.body) + sum(len(sh.body) for sh in mem.shards.values())
+    total_chars += sum(len(f.content) for f in folds.values())  # type: ignore[attr-defined]
+    process = Process(ProcessConfig(control_llm_key="stub"), mem, behavior=None)  # type: ignore[arg-type]
+
+    from main import build_registry
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.ckpt")
+        saved = save_checkpoint(process, path)
+        resumed = load_checkpoint(path)
+        builder = PromptBuilder(PromptConfig(), registry=build_registry(), validator_help="")
+        t0 = time.perf_counter()
+        builder.build_messages(resumed.mem)
+        pack_ms = (time.perf_counter() - t0) * 1000.0
+        paged = [f for f in _all_folds(resumed.mem).values() if getattr(f, "loaded", True)]
+
+    t0 = time.perf_counter()
+    index = FoldIndex()
+    for f in folds.values():
+        index.add(f)  # type: ignore[arg-type]
+    reindex_ms = (time.perf_counter() - t0) * 1000.0
+
+    print(f"memory: {total_chars / 1e6:.1f} MB, {args.lines} lines, {len(folds)} folds, {args.shards} shards")
+    print(f"save:   {saved.ms:.1f} ms, {saved.bytes_written / 1e6:.1f} MB written")
+    print(f"resume: {resumed.info.summary()}")
+    print(f"first prompt: packed in {pack_ms:.1f} ms, paged in {len(paged)} of {len(folds)} folds")
+    print(f"re-indexing all folds instead: {reindex_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
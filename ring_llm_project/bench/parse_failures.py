@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Parse-failure rate and retries per turn, per constraint mode, against the stub server.
+
+    python -m bench.parse_failures --turns 200 --malformed 0.25
+
+A turn calls the model until the reply validates as exactly one <CMD> block
+(at most --max-calls times); every extra call is a retry.
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+from typing import Dict
+
+from bench.stub_llm_server import make_server
+from core.constraints import CONSTRAINT_MODES, ParseStats, build_constraint
+from core.llm_client import LLMClient, LLMConfig
+from core.parser import ParseError, parse_command_block
+from core.validator import CommandValidator
+from commands.fold import FoldCommand
+from commands.loop_done import LoopDoneCommand
+from commands.say import SayCommand
+
+
+def run_mode(base_url: str, mode: str, turns: int, max_calls: int) -> Dict[str, object]:
+    cmds = [FoldCommand(), SayCommand(), LoopDoneCommand()]
+    constraint = build_constraint({c.name: c for c in cmds})
+    llm = LLMClient(LLMConfig(base_url=base_url, model="stub", constraint=mode))
+    validator = CommandValidator(mode="strict")
+    stats = ParseStats()
+    calls = 0
+    for _ in range(turns):
+        for _ in range(max_calls):
+            calls += 1
+            raw = llm.chat([{"role": "user", "content": "fold something"}], constraint=constraint)
+            v = validator.validate(raw)
+            if not v.ok:
+                stats.failure(v.error or "invalid")
+                continue
+            try:
+                parse_command_block(v.cmd_blocks[0])
+            except ParseError as exc:
+                stats.failure(str(exc))
+                continue
+            stats.ok()
+            break
+        stats.finish_turn()
+    out = stats.snapshot()
+    out["llm_calls"] = calls
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--turns", type=int, default=200)
+    ap.add_argument("--max-calls", type=int, default=4)
+    ap.add_argument("--malformed", type=float, default=0.25)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"{'mode':12} {'calls':>6} {'fail_rate':>9} {'retries/turn':>12} {'max':>4}  errors")
+    for mode in CONSTRAINT_MODES:
+        server, _ = make_server(malformed=args.malformed, seed=args.seed)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            r = run_mode(base, mode, args.turns, args.max_calls)
+        finally:
+            server.shutdown()
+        print(
+            f"{mode:12} {r['llm_calls']:>6} {r['failure_rate']:>9} {r['retries_per_turn']:>12} "
+            f"{r['max_retries_per_turn']:>4}  {r['by_error']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""OpenAI-compatible stub server for parse-failure benchmarks.
+
+Without a constraint in the request it answers with a FOLD/SAY <CMD> block that
+is malformed with probability --malformed (prose around it, missing </CMD>,
+lowercase tags, ...), like a small local model does. With `grammar` it always
+answers with a well-formed block; with `format` / `response_format` it
+answers with schema JSON, as a constrained server would. With `replies`
+(tests) it answers with those texts in order first.
+
+    python -m bench.stub_llm_server --port 8089 --malformed 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Tuple
+
+_GOOD = [
+    ("FOLD", {"LABEL": "Old notes", "START": "Specs:", "END": "0.5%"}),
+    ("SAY", {"TEXT": "Done."}),
+    ("LOOP DONE", {}),
+]
+
+_BREAKAGES = (
+    lambda b: "Sure! Here is the command:\n" + b,
+    lambda b: b.replace("</CMD>", ""),
+    lambda b: b.replace("<CMD>", "<cmd>").replace("</CMD>", "</cmd>"),
+    lambda b: b + "\n" + b,
+    lambda b: "<CMD>\n</CMD>",
+)
+
+
+def _block(name: str, fields: Dict[str, str]) -> str:
+    lines = ["<CMD>", name]
+    for k, v in fields.items():
+        lines += [f"{k}:", v]
+    lines.append("</CMD>")
+    return "\n".join(lines)
+
+
+class StubLLM:
+    def __init__(self, malformed: float = 0.25, seed: int = 0, replies: Iterable[str] = ()):
+        self.malformed = malformed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replies = deque(replies)
+        self.requests = 0
+
+    def reply(self, payload: Dict[str, Any]) -> str:
+        with self._lock:
+            self.requests += 1
+            if self._replies:
+                return self._replies.popleft()
+            name, fields = self._rng.choice(_GOOD)
+            broken = self._rng.random() < self.malformed
+            breakage = self._rng.choice(_BREAKAGES)
+        if "format" in payload or "response_format" in payload:
+            return json.dumps({"command": name, **fields})
+        block = _block(name, fields)
+        if "grammar" in payload or not broken:
+            return block
+        return breakage(block)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, **kw: Any) -> Tuple[ThreadingHTTPServer, StubLLM]:
+    stub = StubLLM(**kw)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args: Any) -> None:  # keep benchmark output clean
+            pass
+
+        def _send(self, code: int, obj: Dict[str, Any]) -> None:
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(200, {"data": [{"id": "stub"}]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            n = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(n) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": "not found"})
+                return
+            content = stub.reply(payload)
+            self._send(200, {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4},
+            })
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    return server, stub
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--malformed", type=float, default=0.25)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    server, _ = make_server(args.host, args.port, malformed=args.malformed, seed=args.seed)
+    print(f"stub LLM on http://{args.host}:{server.server_address[1]} (malformed={args.malformed})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
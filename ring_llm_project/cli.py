@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from ring_llm_project.commands.base import IOAdapter
-from ring_llm_project.main import create_process, run_once
+import os
+
+from commands.base import IOAdapter
+
+DEFAULT_CHECKPOINT = "session.ckpt"
 
 
 class ConsoleIO(IOAdapter):
@@ -13,13 +16,77 @@ class ConsoleIO(IOAdapter):
         return input("YOU> ")
 
 
+def _close(process) -> None:
+    for path in process.close():
+        print(f"Profile written: {path}")
+
+
 def main() -> None:
-    process = create_process(io=ConsoleIO())
+    # The pipeline is imported and built on the first message, so the prompt shows up immediately.
+    # Profile cold start with: python -X importtime cli.py (from ring_llm_project/)
+    process = None
+    # checkpoint read by /resume; the process for it is built on the next message
+    resumed = None
+    # the log sink is started once, with the first process
+    logging_ready = False
 
     while True:
         user = input("YOU> ").strip()
         if user.lower() in {"/exit", "exit", "quit"}:
+            if process is not None:
+                _close(process)
             break
+        if user.lower() == "/profile":
+            # hotspots of the last turn (needs DebugFlags.profile_cpu or profile_alloc)
+            profiler = getattr(process, "profiler", None)
+            if profiler is None or profiler.last is None:
+                print("No profile yet. Enable DebugFlags(profile_cpu=True) and run a turn.")
+            else:
+                print(profiler.last.format())
+            continue
+        if user.lower() == "/usage":
+            # token and timing totals per session / step / llm key / command
+            from core.usage import USAGE
+
+            print(USAGE.report())
+            continue
+        if user.lower().split(" ", 1)[0] in {"/checkpoint", "/resume"}:
+            from core.checkpoint import Checkpointer, CheckpointError, load_checkpoint
+
+            cmd, _, path = user.partition(" ")
+            path = path.strip() or DEFAULT_CHECKPOINT
+            if cmd.lower() == "/checkpoint":
+                if process is None:
+                    print("Nothing to checkpoint yet.")
+                    continue
+                if process.checkpointer is None or process.checkpointer.path != os.path.abspath(path):
+                    process.checkpointer = Checkpointer(path)
+                info = process.checkpointer.save(process)
+                print(f"Saved {info.path} in {info.ms:.1f} ms ({info.folds_written} folds written).")
+            else:
+                try:
+                    resumed = load_checkpoint(path)
+                except (OSError, CheckpointError) as exc:
+                    print(f"Cannot resume: {exc}")
+                    continue
+                if process is not None:
+                    _close(process)
+                process = None
+                print(resumed.info.summary())
+                if resumed.pending_user:
+                    print(f"Unfinished turn: {resumed.pending_user!r} (runs with your next message)")
+            continue
+        from main import configure_logging, create_process, resume_process, run_once
+
+        if not logging_ready:
+            configure_logging()
+            logging_ready = True
+        if process is None and resumed is not None:
+            process, resumed = resume_process(resumed, io=ConsoleIO()), None
+            if process.pending_user is not None:
+                process.run_once()
+        if process is None:
+            process = create_process(io=ConsoleIO())
         run_once(process, user)
 
 
@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Optional
 
+from core.io import IOAdapter
 from core.types import CommandCall, DispatchResult, ExecutionContext
 from core.memory import Memory
 
@@ -18,5 +19,13 @@ class BaseCommand:
         raise NotImplementedError
 
 
+@dataclass
+class CommandContext:
+    """What run()-style commands (e.g. builtin ASK) get instead of an ExecutionContext."""
+
+    io: Optional[IOAdapter] = None
+    llms: Dict[str, object] = field(default_factory=dict)
+
+
 class CommandError(Exception):
     pass
@@ -3,9 +3,12 @@
 from __future__ import annotations
 
 from commands.base import BaseCommand
-from commands.util import need
+from commands.util import match_note, resolve_range
 from core.types import CommandCall, DispatchResult, ExecutionContext
 from core.memory import Memory
+from utils.log import get_logger
+
+log = get_logger("cmd.copy")
 
 
 class CopyCommand(BaseCommand):
@@ -14,16 +17,20 @@ class CopyCommand(BaseCommand):
             name="COPY",
             prompt_help=(
                 "COPY: Copies a selected fragment from MEMORY BODY into CLIPBOARD.\n"
-                "Provide exact START and END substrings that appear in the MEMORY BODY.\n\n"
+                "Provide exact START and END substrings that appear in the MEMORY BODY,\n"
+                "or FROM and TO line IDs (e.g. L12) when BODY lines are shown with IDs.\n\n"
                 "Format:\n"
                 "<CMD>\nCOPY\nSTART:\n...\nEND:\n...\n</CMD>\n"
+                "<CMD>\nCOPY\nFROM:\nL3\nTO:\nL7\n</CMD>\n"
             ),
         )
 
     def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
-        start = need(call.payload, "START")
-        end = need(call.payload, "END")
-        frag = memory.copy_body_range_to_clipboard(start, end)
-        if ctx.debug_commands:
-            ctx.log(f"[COPY] {len(frag)} chars")
+        i, j = resolve_range(memory, call.payload)
+        note = match_note("COPY", memory, call.payload, i, j)
+        if note:
+            memory.add_event("system", note, kind="note")
+        frag = memory.body[i:j]
+        memory.clipboard = frag
+        log.debug("copy", chars=len(frag))
         return DispatchResult(memory=memory)
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from commands.base import BaseCommand
-from commands.util import need
+from commands.util import match_note, resolve_range
 from core.types import CommandCall, DispatchResult, ExecutionContext
 from core.memory import Memory
 
@@ -17,9 +17,13 @@ class DeleteCommand(BaseCommand):
 
 Fields:
 START:
-  (exact substring found in BODY)
+  (exact substring found in BODY; only whitespace/quote differences are tolerated)
 END:
   (exact substring found in BODY after START)
+FROM:
+  (instead of START/END: first line ID, e.g. L12)
+TO:
+  (last line ID; defaults to FROM)
 
 Effect:
 - Deletes the inclusive range [START..END] from BODY.
@@ -29,8 +33,10 @@ Effect:
         )
 
     def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
-        start = need(call.payload, "START")
-        end = need(call.payload, "END")
-        memory.delete_range(start, end)
+        i, j = resolve_range(memory, call.payload, fuzzy=False)
+        note = match_note("DELETE", memory, call.payload, i, j)
+        if note:
+            memory.add_event("system", note, kind="note")
+        memory.delete_offsets(i, j)
         memory.add_history(call)
         return DispatchResult(memory=memory)
@@ -3,9 +3,12 @@
 from __future__ import annotations
 
 from commands.base import BaseCommand
-from commands.util import need
+from commands.util import match_note, need, resolve_range
 from core.types import CommandCall, DispatchResult, ExecutionContext
 from core.memory import Memory
+from utils.log import get_logger
+
+log = get_logger("cmd.fold")
 
 
 class FoldCommand(BaseCommand):
@@ -19,9 +22,13 @@ Required fields:
 LABEL:
   short label (usually a short summary)
 START:
-  exact start substring (must exist in BODY)
+  exact start substring (must exist in BODY; only whitespace/quote differences are tolerated)
 END:
   exact end substring (must exist after START)
+FROM:
+  (instead of START/END) first line ID, e.g. L12
+TO:
+  last line ID; defaults to FROM
 
 Optional fields:
 ID:
@@ -43,11 +50,13 @@ END:
 
     def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
         label = need(call.payload, "LABEL")
-        start = need(call.payload, "START")
-        end = need(call.payload, "END")
+        # the placeholder replaces the lines' text, not their line break
+        i, j = resolve_range(memory, call.payload, newline=False, fuzzy=False)
+        note = match_note("FOLD", memory, call.payload, i, j)
+        if note:
+            memory.add_event("system", note, kind="note")
         fold_id = call.payload.get("ID")
-        new_id = memory.fold_range(start=start, end=end, label=label, fold_id=fold_id)
-        if ctx.debug_log:
-            ctx.debug_log(f"FOLD created/used id={new_id}")
+        new_id = memory.fold_by_offsets(i, j, label, fold_id=fold_id)
+        log.debug("fold", id=new_id)
         memory.add_history(memory.format_cmd_block(call))
         return DispatchResult(memory=memory)
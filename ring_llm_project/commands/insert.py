@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from commands.base import BaseCommand
-from commands.util import need
+from commands.util import match_note, need, resolve_range, resolve_spans
 from core.types import CommandCall, DispatchResult, ExecutionContext
 from core.memory import Memory
 
@@ -18,9 +18,11 @@ while also requiring that END occurs after START (to disambiguate).
 
 Fields:
 START:
-  (exact substring that already exists in BODY)
+  (exact substring that already exists in BODY; small typos are tolerated, digits must match)
 END:
   (exact substring that already exists in BODY after START)
+FROM:
+  (instead of START/END: line ID, e.g. L12; TEXT becomes new line(s) after it)
 TEXT:
   (text to insert; can be multi-line)
 
@@ -33,10 +35,18 @@ Effect:
         )
 
     def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
-        start = need(call.payload, "START")
-        end = need(call.payload, "END")
         text = need(call.payload, "TEXT")
-
-        memory.insert_after_with_guard(start, end, text)
+        if call.payload.get("FROM"):
+            _, at = resolve_range(memory, {"FROM": call.payload["FROM"]})
+            if at and memory.body[at - 1] != "\n":
+                text = "\n" + text  # FROM is the last line
+            elif not text.endswith("\n"):
+                text += "\n"
+        else:
+            (i, at), (_, j) = resolve_spans(memory, call.payload)
+            note = match_note("INSERT", memory, call.payload, i, j)
+            if note:
+                memory.add_event("system", note, kind="note")
+        memory.insert_at(at, text)
         memory.add_history(call)
         return DispatchResult(memory=memory)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.log import get_logger
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".command_manifest.json")
+
+log = get_logger("manifest")
+
+
+@dataclass(frozen=True)
+class CommandManifestEntry:
+    """What the registry needs to know about a command without importing it."""
+
+    name: str
+    module: str
+    attr: str
+    prompt_help: str
+    source_mtime: float = 0.0
+
+
+class LazyCommand:
+    """Registry placeholder: exposes name/prompt_help, imports the implementation on first use."""
+
+    def __init__(self, entry: CommandManifestEntry):
+        self.entry = entry
+        self._cmd: Optional[Any] = None
+
+    @property
+    def name(self) -> str:
+        return self.entry.name
+
+    @property
+    def prompt_help(self) -> str:
+        return self.entry.prompt_help
+
+    @property
+    def loaded(self) -> bool:
+        return self._cmd is not None
+
+    def load(self) -> Any:
+        if self._cmd is None:
+            cls = getattr(importlib.import_module(self.entry.module), self.entry.attr)
+            self._cmd = cls()
+        return self._cmd
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "lazy"
+        return f"LazyCommand({self.entry.name!r} -> {self.entry.module}:{self.entry.attr}, {state})"
+
+
+def _source_mtime(module: str) -> float:
+    # find_spec imports parent packages only, never the command module itself
+    spec = importlib.util.find_spec(module)
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return 0.0
+    return os.path.getmtime(spec.origin)
+
+
+def _describe(module: str, attr: str) -> CommandManifestEntry:
+    """Import one command and record its name and prompt help (slow path)."""
+    cmd = getattr(importlib.import_module(module), attr)()
+    name = getattr(cmd, "name", None) or getattr(cmd, "command_name", None)
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"{module}:{attr} does not define a name or command_name")
+    help_text = getattr(cmd, "prompt_help", None)
+    if help_text is None and hasattr(cmd, "prompt_fragment"):
+        help_text = cmd.prompt_fragment()
+    if callable(help_text):
+        help_text = help_text()
+    return CommandManifestEntry(
+        name=name,
+        module=module,
+        attr=attr,
+        prompt_help=help_text or "",
+        source_mtime=_source_mtime(module),
+    )
+
+
+def _read_cache(path: str) -> Dict[Tuple[str, str], CommandManifestEntry]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    out: Dict[Tuple[str, str], CommandManifestEntry] = {}
+    for item in raw.get("commands", []):
+        try:
+            entry = CommandManifestEntry(**item)
+        except TypeError:
+            return {}
+        out[(entry.module, entry.attr)] = entry
+    return out
+
+
+def _write_cache(path: str, entries: List[CommandManifestEntry]) -> None:
+    data = json.dumps({"commands": [asdict(e) for e in entries]}, ensure_ascii=False, indent=1)
+    directory = os.path.dirname(path) or "."
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=".manifest.", dir=directory)
+    except OSError:
+        # read-only install: the manifest just gets rebuilt next start
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as exc:
+        # disk full, path is a directory...: same as read-only, but say so
+        _discard(tmp)
+        log.warning("manifest_cache_not_written", path=path, error=str(exc))
+    except BaseException:
+        _discard(tmp)
+        raise
+
+
+def _discard(tmp: str) -> None:
+    try:
+        os.unlink(tmp)
+    except OSError:
+        pass
+
+
+def load_manifest(
+    plugins: Sequence[Tuple[str, str]],
+    cache_path: str = DEFAULT_CACHE_PATH,
+) -> List[CommandManifestEntry]:
+    """Manifest entries for (module, class) plugins, from cache when the sources are unchanged.
+
+    Only commands whose module changed (or is new) get imported to refresh the cache.
+    """
+    cached = _read_cache(cache_path)
+    entries: List[CommandManifestEntry] = []
+    dirty = False
+    for module, attr in plugins:
+        entry = cached.get((module, attr))
+        if entry is None or entry.source_mtime != _source_mtime(module):
+            entry = _describe(module, attr)
+            dirty = True
+        entries.append(entry)
+    if dirty or len(cached) != len(entries):
+        _write_cache(cache_path, entries)
+    return entries
@@ -1,13 +1,14 @@
 from __future__ import annotations
 from typing import Dict, Protocol
-from .base import BaseCommand, Command
+from .base import BaseCommand
+from .manifest import CommandManifestEntry, LazyCommand
 
 
 class _NamedCommand(Protocol):
     command_name: str
 
 
-RegistryCommand = BaseCommand | Command | _NamedCommand
+RegistryCommand = BaseCommand | _NamedCommand | LazyCommand
 
 
 class CommandRegistry:
@@ -15,18 +16,23 @@ class CommandRegistry:
         self._cmds: Dict[str, RegistryCommand] = {}
 
     def register(self, cmd: RegistryCommand) -> None:
-        if isinstance(cmd, BaseCommand):
-            name = cmd.command_name
-        else:
-            name = getattr(cmd, "name", None) or getattr(cmd, "command_name", None)
+        name = getattr(cmd, "name", None) or getattr(cmd, "command_name", None)
         if not isinstance(name, str) or not name:
             raise ValueError("CommandRegistry.register: command must define a name or command_name")
         self._cmds[name] = cmd
 
+    def register_lazy(self, entry: CommandManifestEntry) -> None:
+        """Register a command from its manifest entry; it is imported on first get()."""
+        self._cmds[entry.name] = LazyCommand(entry)
+
     def get(self, name: str) -> RegistryCommand:
         if name not in self._cmds:
             raise KeyError(f"Unknown command: {name}")
-        return self._cmds[name]
+        cmd = self._cmds[name]
+        if isinstance(cmd, LazyCommand):
+            cmd = self._cmds[name] = cmd.load()
+        return cmd
 
     def all(self) -> Dict[str, RegistryCommand]:
+        """All commands; lazy ones stay as LazyCommand (name and prompt_help only)."""
         return dict(self._cmds)
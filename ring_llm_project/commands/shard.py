@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from commands.base import BaseCommand
+from commands.util import need, opt
+from core.types import CommandCall, DispatchResult, ExecutionContext
+from core.memory import Memory
+
+
+class ShardCommand(BaseCommand):
+    def __init__(self) -> None:
+        super().__init__(
+            name="SHARD",
+            prompt_help=(
+                """SHARD: Switch the active MEMORY BODY shard (a named, separate body with its own folds).
+
+Fields:
+NAME:
+  shard to switch to; a new name creates an empty shard
+SUMMARY:
+  (optional) one-line summary of the shard you are leaving, shown while it is inactive
+
+Effect:
+- Only the active shard's BODY is shown in full; other shards appear as one-line summaries.
+- All BODY and fold commands work on the active shard.
+"""
+            ),
+        )
+
+    def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
+        name = need(call.payload, "NAME").strip()
+        summary = opt(call.payload, "SUMMARY").strip()
+        if summary:
+            memory.shard_summaries[memory.shard] = summary.splitlines()[0]
+        left = memory.shard
+        if memory.switch_shard(name):
+            memory.add_event("system", f"SHARD: {left} -> {name}", kind="note")
+        return DispatchResult(memory=memory)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from commands.base import BaseCommand
+from commands.util import PayloadError, opt
+from core.types import CommandCall, DispatchResult, ExecutionContext
+from core.memory import Memory
+
+
+def _steps(call: CommandCall) -> int:
+    raw = opt(call.payload, "STEPS", "1").strip() or "1"
+    try:
+        n = int(raw)
+    except ValueError:
+        raise PayloadError(f"STEPS must be a number: {raw}")
+    if n < 1:
+        raise PayloadError("STEPS must be >= 1")
+    return n
+
+
+class UndoCommand(BaseCommand):
+    def __init__(self) -> None:
+        super().__init__(
+            name="UNDO",
+            prompt_help=(
+                """UNDO: Reverts the last BODY/CLIPBOARD/fold changes made by commands (e.g. a wrong CUT or DELETE).
+
+Optional fields:
+STEPS:
+  how many commands to revert (default 1)
+
+Effect:
+- BODY, CLIPBOARD and created folds go back to how they were before those commands.
+- HISTORY is not rewound.
+"""
+            ),
+        )
+
+    def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
+        if memory.undo is None:
+            raise PayloadError("undo is disabled for this memory")
+        done = memory.undo.undo(memory, _steps(call))
+        memory.add_event("system", f"UNDO: {', '.join(done) if done else 'nothing to undo'}", kind="note")
+        return DispatchResult(memory=memory)
+
+
+class RedoCommand(BaseCommand):
+    def __init__(self) -> None:
+        super().__init__(
+            name="REDO",
+            prompt_help=(
+                """REDO: Re-applies commands reverted by UNDO (only until the next BODY-changing command).
+
+Optional fields:
+STEPS:
+  how many commands to re-apply (default 1)
+"""
+            ),
+        )
+
+    def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
+        if memory.undo is None:
+            raise PayloadError("undo is disabled for this memory")
+        done = memory.undo.redo(memory, _steps(call))
+        memory.add_event("system", f"REDO: {', '.join(done) if done else 'nothing to redo'}", kind="note")
+        return DispatchResult(memory=memory)
@@ -29,5 +29,5 @@ Behavior:
     def execute(self, memory: Memory, call: CommandCall, ctx: ExecutionContext) -> DispatchResult:
         fold_id = need(call.payload, "ID")
         memory.toggle_fold(fold_id)
-        memory.add_history(ctx.render_cmd_for_history(call))
+        memory.add_history(call)
         return DispatchResult(memory=memory)
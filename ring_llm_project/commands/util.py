@@ -3,7 +3,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+from core.anchors import ADDRESSING
+from core.memory import Memory
+from utils.text import clamp, estimate_tokens
 
 
 @dataclass(frozen=True)
@@ -26,3 +30,69 @@ def need(payload: Dict[str, str], key: str) -> str:
 def opt(payload: Dict[str, str], key: str, default: str = "") -> str:
     v = payload.get(key, default)
     return v if v is not None else default
+
+
+def resolve_range(
+    memory: Memory,
+    payload: Dict[str, str],
+    *,
+    newline: bool = True,
+    fuzzy: bool = True,
+) -> Tuple[int, int]:
+    """Body offsets (i, j) of the range a command addresses.
+
+    FROM/TO line IDs (TO defaults to FROM) take precedence over exact
+    START/END substrings; newline=False leaves the last line's newline out
+    of an ID range. fuzzy=False (destructive commands) accepts only exact
+    and whitespace/quote-normalized START/END. Outcomes are counted in
+    core.anchors.ADDRESSING.
+    """
+    if payload.get("FROM"):
+        from_id = payload["FROM"].strip()
+        to_id = (payload.get("TO") or from_id).strip()
+        try:
+            i, j = memory.line_span(from_id, to_id)
+        except ValueError:
+            ADDRESSING.record("anchor", address=from_id + to_id, ok=False)
+            raise
+        if not newline and j > i and memory.body[j - 1] == "\n":
+            j -= 1
+        lines = memory.body[i:j].strip("\n").split("\n")
+        equiv = estimate_tokens(lines[0].strip()) + estimate_tokens(lines[-1].strip())
+        ADDRESSING.record("anchor", address=from_id + to_id, ok=True, substring_equiv=equiv)
+        return i, j
+    (i, _), (_, j) = resolve_spans(memory, payload, fuzzy=fuzzy)
+    return i, j
+
+
+def resolve_spans(
+    memory: Memory,
+    payload: Dict[str, str],
+    *,
+    fuzzy: bool = True,
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Matched body spans of START and of END (see Memory.find_spans), counted like resolve_range."""
+    start = need(payload, "START")
+    end = need(payload, "END")
+    try:
+        spans = memory.find_spans(start, end, fuzzy=fuzzy)
+    except ValueError:
+        ADDRESSING.record("substring", address=start + end, ok=False)
+        raise
+    ADDRESSING.record("substring", address=start + end, ok=True)
+    return spans
+
+
+def match_note(name: str, memory: Memory, payload: Dict[str, str], i: int, j: int, limit: int = 240) -> Optional[str]:
+    """History note showing BODY[i:j] when START/END were not matched verbatim, else None.
+
+    HISTORY keeps the command as issued; without the note a whitespace or
+    typo-tolerant match on the wrong text would go unnoticed (and not undone).
+    Call it before the command changes BODY.
+    """
+    if payload.get("FROM"):
+        return None
+    text = memory.body[i:j]
+    if text.startswith(payload.get("START") or "") and text.endswith(payload.get("END") or ""):
+        return None
+    return f"{name}: START/END matched approximately; range was {clamp(text, limit)!r}"
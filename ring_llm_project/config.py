@@ -77,3 +77,13 @@ class AppConfig:
     cmd_end: str = "§§CMD_END§§"
     msg_start: str = "§§MSG_START§§"
     msg_end: str = "§§MSG_END§§"
+
+    def delimiter_pairs(self) -> List["DelimiterPair"]:
+        """Every block marker the scanner should recognise in model output (one pass for all of them)."""
+        from core.scanner import CMD_PAIR, COMMAND, MESSAGE, DelimiterPair
+
+        return [
+            CMD_PAIR,
+            DelimiterPair(COMMAND, self.cmd_start, self.cmd_end),
+            DelimiterPair(MESSAGE, self.msg_start, self.msg_end),
+        ]
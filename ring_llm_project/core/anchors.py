@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import difflib
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.text import estimate_tokens
+
+# Stable line anchors for BODY. The prompt shows every body line as
+# "L7| text"; range commands may then say FROM: L7 / TO: L9 instead of
+# echoing exact START/END substrings. An ID stays on its line across edits
+# elsewhere in the body, so anchors the model saw a few turns ago still work.
+
+ANCHOR_RE = re.compile(r"^\s*L(\d+)\s*$")
+SEP = "| "
+
+
+def anchor_name(line_id: int) -> str:
+    return f"L{line_id}"
+
+
+def parse_anchor(text: str) -> int:
+    m = ANCHOR_RE.match(text or "")
+    if not m:
+        raise ValueError(f"bad line id: {text.strip()!r} (expected e.g. L12)")
+    return int(m.group(1))
+
+
+def _line_starts(body: str) -> List[int]:
+    starts = [0]
+    i = body.find("\n")
+    while i >= 0:
+        starts.append(i + 1)
+        i = body.find("\n", i + 1)
+    return starts
+
+
+class AnchorIndex:
+    """Line ID per body line, in body order (ids[k] is line k).
+
+    splice() mirrors Memory._splice: lines outside the edited range keep
+    their IDs, the first edited line keeps its ID, and lines the edit
+    creates get fresh ones. rebase() carries IDs over a wholesale body
+    replacement by matching unchanged lines.
+    """
+
+    def __init__(self, body: str = ""):
+        self._next = 1
+        self.ids: List[int] = self._fresh(body.count("\n") + 1)
+
+    def _fresh(self, n: int) -> List[int]:
+        out = list(range(self._next, self._next + n))
+        self._next += n
+        return out
+
+    def copy(self) -> "AnchorIndex":
+        other = AnchorIndex.__new__(AnchorIndex)
+        other._next = self._next
+        other.ids = list(self.ids)
+        return other
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"ids": list(self.ids), "next": self._next}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "AnchorIndex":
+        other = cls.__new__(cls)
+        other._next = state["next"]
+        other.ids = list(state["ids"])
+        return other
+
+    def splice(self, body: str, i: int, j: int, text: str) -> None:
+        """Update for body[i:j] = text, where body is the text BEFORE the edit."""
+        a = body.count("\n", 0, i)
+        b = a + body.count("\n", i, j)
+        k = text.count("\n")
+        ids = self.ids
+        at_line_start = i == 0 or body[i - 1] == "\n"
+        ends_at_line_start = j == 0 or body[j - 1] == "\n"
+        if at_line_start and ends_at_line_start and (not text or text.endswith("\n")):
+            # whole lines a..b-1 replaced by k whole lines; line b is untouched
+            ids[a:b] = self._fresh(k)
+            return
+        if k == 0:
+            ids[a:b + 1] = [ids[a]]
+            return
+        # first line keeps its id; the tail of old line b ends up on the last new line
+        last = [ids[b]] if b > a else self._fresh(1)
+        ids[a:b + 1] = [ids[a]] + self._fresh(k - 1) + last
+
+    def rebase(self, old: str, new: str) -> None:
+        """Replace the whole body; unchanged lines keep their IDs."""
+        if old == new:
+            return
+        old_lines, new_lines = old.split("\n"), new.split("\n")
+        ids: List[Optional[int]] = [None] * len(new_lines)
+        sm = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for blk in sm.get_matching_blocks():
+            for t in range(blk.size):
+                ids[blk.b + t] = self.ids[blk.a + t]
+        self.ids = [x if x is not None else self._fresh(1)[0] for x in ids]
+
+    # ----------------------------
+    # Lookup / rendering
+    # ----------------------------
+
+    def line_of(self, line_id: int) -> int:
+        try:
+            return self.ids.index(line_id)
+        except ValueError:
+            raise ValueError(f"unknown line id: {anchor_name(line_id)} (the line was deleted or never existed)")
+
+    def span(self, body: str, from_id: int, to_id: int) -> Tuple[int, int]:
+        """Offsets of lines FROM..TO (inclusive), with TO's newline if it has one."""
+        a, b = self.line_of(from_id), self.line_of(to_id)
+        if b < a:
+            raise ValueError(f"{anchor_name(to_id)} comes before {anchor_name(from_id)}")
+        starts = _line_starts(body)
+        i = starts[a]
+        j = starts[b + 1] if b + 1 < len(starts) else len(body)
+        return i, j
+
+    def render(self, body: str) -> str:
+        """Body with an "L<id>| " prefix on every line (the empty line after a final newline is left out)."""
+        lines = body.split("\n")
+        if len(lines) > 1 and not lines[-1]:
+            lines.pop()
+        return "\n".join(f"{anchor_name(n)}{SEP}{line}" for n, line in zip(self.ids, lines))
+
+
+# ----------------------------
+# Addressing stats
+# ----------------------------
+
+
+class AddressingStats:
+    """Range-command addressing: anchors vs substrings.
+
+    address_tokens counts the output tokens spent on the address fields.
+    For anchor calls, substring_equiv estimates what START/END would have
+    cost (first and last line of the same range).
+    """
+
+    MODES = ("anchor", "substring")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by: Dict[str, Dict[str, int]] = {
+            m: {"calls": 0, "failures": 0, "address_tokens": 0, "substring_equiv": 0} for m in self.MODES
+        }
+
+    def record(self, mode: str, *, address: str, ok: bool, substring_equiv: int = 0) -> None:
+        with self._lock:
+            st = self._by[mode]
+            st["calls"] += 1
+            st["failures"] += 0 if ok else 1
+            st["address_tokens"] += estimate_tokens(address)
+            st["substring_equiv"] += substring_equiv
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for mode, st in self._by.items():
+                calls = st["calls"]
+                out[mode] = {
+                    "calls": calls,
+                    "failure_rate": round(st["failures"] / calls, 4) if calls else 0.0,
+                    "avg_address_tokens": round(st["address_tokens"] / calls, 1) if calls else 0.0,
+                }
+            a = self._by["anchor"]
+            if a["calls"]:
+                out["anchor"]["avg_substring_equiv_tokens"] = round(a["substring_equiv"] / a["calls"], 1)
+                out["anchor"]["tokens_saved"] = a["substring_equiv"] - a["address_tokens"]
+            return out
+
+
+ADDRESSING = AddressingStats()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .llm_client import LLMClient
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    # "least_outstanding": fewest in-flight requests, EWMA latency breaks ties.
+    # "ewma": lowest ewma_latency * (in_flight + 1) (peak-EWMA).
+    strategy: str = "least_outstanding"
+    ewma_alpha: float = 0.3
+    # circuit breaker: eject after N consecutive failures for cooldown_s, then allow one trial call
+    failure_threshold: int = 3
+    cooldown_s: float = 30.0
+    # background health probes (0 disables)
+    probe_interval_s: float = 10.0
+    # try at most this many endpoints per request before giving up
+    max_attempts: int = 2
+
+
+class Endpoint:
+    """One backend of a pool plus its load/latency/breaker bookkeeping. Guarded by the pool lock."""
+
+    def __init__(self, name: str, client: LLMClient):
+        self.name = name
+        self.client = client
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.picked = 0
+        self.ok = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.half_open = False
+        self.healthy = True
+        self.last_error = ""
+
+    def available(self, now: float) -> bool:
+        if not self.healthy:
+            return False
+        if self.ejected_until > now:
+            return False
+        if self.ejected_until and self.half_open:
+            # cool-down over: exactly one trial request at a time
+            return self.in_flight == 0
+        return True
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        if self.ejected_until > now:
+            state = "open"
+        elif self.ejected_until:
+            state = "half_open"
+        else:
+            state = "closed"
+        return {
+            "in_flight": self.in_flight,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "picked": self.picked,
+            "ok": self.ok,
+            "failures": self.failures,
+            "breaker": state,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+        }
+
+
+class EndpointPool:
+    """N interchangeable LLM endpoints behind one router key.
+
+    Duck-types LLMClient (.chat), so steps don't know they talk to a pool.
+    """
+
+    def __init__(self, clients: Dict[str, LLMClient], cfg: PoolConfig = PoolConfig()):
+        if not clients:
+            raise ValueError("EndpointPool needs at least one client")
+        if cfg.strategy not in ("least_outstanding", "ewma"):
+            raise ValueError("strategy must be 'least_outstanding' or 'ewma'")
+        self.cfg = cfg
+        self.endpoints: List[Endpoint] = [Endpoint(name, c) for name, c in clients.items()]
+        self._lock = threading.Lock()
+        self._rr = 0
+        self.failovers = 0
+        self.rejected = 0
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ----------------------------
+    # Selection
+    # ----------------------------
+
+    def _score(self, ep: Endpoint) -> float:
+        # unknown latency scores as fast so new endpoints get traffic
+        lat = ep.ewma_ms if ep.ewma_ms is not None else 0.0
+        if self.cfg.strategy == "ewma":
+            return (lat + 1.0) * (ep.in_flight + 1)
+        return ep.in_flight * 1e9 + lat
+
+    def _acquire(self, exclude: List[Endpoint]) -> Optional[Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            n = len(self.endpoints)
+            best: Optional[Endpoint] = None
+            # rotate the start so equal scores spread round-robin
+            for k in range(n):
+                ep = self.endpoints[(self._rr + k) % n]
+                if ep in exclude or not ep.available(now):
+                    continue
+                if best is None or self._score(ep) < self._score(best):
+                    best = ep
+            self._rr = (self._rr + 1) % n
+            if best is None:
+                return None
+            if best.ejected_until and best.ejected_until <= now:
+                best.half_open = True
+            best.in_flight += 1
+            best.picked += 1
+            if exclude:
+                self.failovers += 1
+            return best
+
+    def _release(self, ep: Endpoint, elapsed_ms: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            ep.in_flight -= 1
+            if error is None:
+                a = self.cfg.ewma_alpha
+                ep.ewma_ms = elapsed_ms if ep.ewma_ms is None else a * elapsed_ms + (1 - a) * ep.ewma_ms
+                ep.ok += 1
+                ep.consecutive_failures = 0
+                ep.ejected_until = 0.0
+                ep.half_open = False
+                return
+            ep.failures += 1
+            ep.consecutive_failures += 1
+            ep.last_error = f"{type(error).__name__}: {error}"[:200]
+            if ep.half_open or ep.consecutive_failures >= self.cfg.failure_threshold:
+                ep.ejected_until = time.monotonic() + self.cfg.cooldown_s
+                ep.half_open = False
+
+    # ----------------------------
+    # LLMClient interface
+    # ----------------------------
+
+    def chat(self, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        tried: List[Endpoint] = []
+        last_exc: Optional[BaseException] = None
+        for _ in range(max(1, self.cfg.max_attempts)):
+            ep = self._acquire(tried)
+            if ep is None:
+                break
+            tried.append(ep)
+            t0 = time.perf_counter()
+            try:
+                out = ep.client.chat(messages, **kwargs)
+            except Exception as exc:
+                self._release(ep, (time.perf_counter() - t0) * 1000.0, exc)
+                last_exc = exc
+                continue
+            self._release(ep, (time.perf_counter() - t0) * 1000.0, None)
+            return out
+
+        if last_exc is not None:
+            raise last_exc
+        with self._lock:
+            self.rejected += 1
+        raise RuntimeError("no available endpoint in pool (all ejected or unhealthy)")
+
+    # ----------------------------
+    # Health probes
+    # ----------------------------
+
+    def probe(self) -> None:
+        """Probe every endpoint once. Clients without .health() are assumed healthy."""
+        for ep in self.endpoints:
+            health = getattr(ep.client, "health", None)
+            ok = True
+            if callable(health):
+                try:
+                    ok = bool(health())
+                except Exception:
+                    ok = False
+            with self._lock:
+                ep.healthy = ok
+
+    def start_health_checks(self) -> None:
+        if self.cfg.probe_interval_s <= 0 or self._probe_thread is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(self.cfg.probe_interval_s):
+                self.probe()
+
+        self._probe_thread = threading.Thread(target=loop, name="llm-pool-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop_health_checks(self) -> None:
+        self._stop.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join(timeout=1.0)
+            self._probe_thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.cfg.strategy,
+                "failovers": self.failovers,
+                "rejected": self.rejected,
+                "endpoints": {ep.name: ep.stats(now) for ep in self.endpoints},
+            }
@@ -1,29 +1,38 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
 
-from ring_llm_project.commands.base import BaseCommand, CommandContext, IOAdapter
-from ring_llm_project.commands.registry import CommandRegistry
+from commands.base import BaseCommand, CommandContext, CommandError, IOAdapter
+from commands.util import PayloadError
+from commands.registry import CommandRegistry
+from utils.log import DEBUG, get_logger
 
+from .budget import INTERACTIVE_BUDGET, GenerationBudget
+from .constraints import PARSE_STATS, ResponseConstraint, error_kind
+from .deadline import DEADLINE_METRICS
 from .fold import Folder
-from .llm_client import LLMClient
 from .memory import Memory
 from .normalize import Normalizer
-from .parse_cmd import CommandParser, CommandParseError
+from .parser import ParseError, parse_command_block
+from .parse_cmd import CommandParser, CommandParseError, ParsedCommand
 from .prompt_builder import PromptBuilder
 from .router import LLMRouter
+from .scheduler import Priority, QueueTimeout
 from .sequence import StepSequence
 from .step import (
     RUNTIME_COMMAND_BLOCK_KEY,
+    RUNTIME_COMMAND_INNER_KEY,
     RUNTIME_NORMALIZED_OUTPUT_KEY,
     RUNTIME_RAW_OUTPUT_KEY,
     Step,
     mark_stop,
 )
-from .types import CommandCall, DispatchResult, ExecutionContext
+from .types import DispatchResult, ExecutionContext
 from .validate import CommandValidator
 
+log = get_logger("behavior")
+
 
 @dataclass
 class DebugFlags:
@@ -31,6 +40,18 @@ class DebugFlags:
     show_raw_model_output: bool = True
     show_extracted_command: bool = True
     show_memory: bool = False
+    # with show_memory: print only what changed since the previous FoldStep (full dump the first time)
+    show_memory_deltas: bool = True
+    # cProfile / tracemalloc per turn (or per session), attributed to steps and commands; see core/profiling.py
+    profile_cpu: bool = False
+    profile_alloc: bool = False
+    profile_dir: Optional[str] = None  # write .pstats/.collapsed files here
+    profile_scope: str = "turn"  # "turn" | "session"
+    # the show_* output above goes to utils.log at DEBUG level (background writer, truncated fields)
+    log_level: str = "DEBUG"
+    log_path: Optional[str] = None  # None = stderr
+    log_json: bool = False
+    log_max_field_chars: int = 2000
 
 
 @dataclass
@@ -38,21 +59,36 @@ class BehaviorModel:
     sequence: StepSequence
     name: str = "default"
 
-    def run(self, memory: Memory) -> Memory:
-        return self.sequence.run(memory)
+    def run(self, memory: Memory, ctx: Optional[ExecutionContext] = None) -> Memory:
+        return self.sequence.run(memory, ctx)
 
 
 class FoldStep(Step):
-    def __init__(self, folder: Folder, debug: DebugFlags):
+    def __init__(self, folder: Folder, debug: DebugFlags, inline: bool = True):
         self.folder = folder
         self.debug = debug
+        # False when a MaintenanceWorker folds between turns
+        self.inline = inline
+        self._seen: Optional[Tuple[int, int]] = None  # (id(memory), feed seq) at the last print
 
     def execute(self, memory: Memory, ctx: Optional[ExecutionContext] = None) -> Memory:
-        self.folder.auto_fold_if_needed(memory)
-        if self.debug.show_memory:
-            print(memory.to_text())
+        if self.inline:
+            self.folder.auto_fold_if_needed(memory)
+        if self.debug.show_memory and log.enabled(DEBUG):
+            self._show(memory)
         return memory
 
+    def _show(self, memory: Memory) -> None:
+        deltas = None
+        if self.debug.show_memory_deltas and self._seen is not None and self._seen[0] == id(memory):
+            deltas = memory.changes_since(self._seen[1])
+        if deltas is None:
+            log.debug("memory", text=memory.to_text())
+        else:
+            for d in deltas:
+                log.debug("memory_delta", delta=d.describe())
+        self._seen = (id(memory), memory.changes.seq)
+
 
 class PromptAndCallStep(Step):
     def __init__(
@@ -61,25 +97,61 @@ class PromptAndCallStep(Step):
         router: LLMRouter,
         control_llm_key: str,
         debug: DebugFlags,
+        fallback_llm_key: Optional[str] = None,
+        fallback_below_s: float = 10.0,
+        constraint: Optional[ResponseConstraint] = None,
+        budget: GenerationBudget = INTERACTIVE_BUDGET,
     ):
         self.prompt_builder = prompt_builder
         self.router = router
         self.control_llm_key = control_llm_key
         self.debug = debug
+        # cheaper model used when less than fallback_below_s is left of the turn
+        self.fallback_llm_key = fallback_llm_key
+        self.fallback_below_s = fallback_below_s
+        # response-format constraint built from the registry (sent per LLMConfig.constraint)
+        self.constraint = constraint
+        self.budget = budget
 
     def execute(self, memory: Memory, ctx: Optional[ExecutionContext] = None) -> Memory:
+        deadline = ctx.deadline if ctx else None
+        if deadline is not None and deadline.expired():
+            DEADLINE_METRICS.incr("skipped_calls")
+            mark_stop(memory)
+            return memory
+
         messages = self.prompt_builder.build_messages(memory)
-        llm: LLMClient = self.router.get(self.control_llm_key)
+
+        key = self.control_llm_key
+        kwargs = {}
+        if deadline is not None and self.fallback_llm_key and deadline.near(self.fallback_below_s):
+            key = self.fallback_llm_key
+            DEADLINE_METRICS.incr("fallbacks")
+        if self.constraint is not None:
+            kwargs["constraint"] = self.constraint
 
         if self.debug.show_class_calls:
-            print("[CALL] LLMClient.chat")
+            log.debug("call", target="LLMClient.chat", key=key)
 
-        raw = llm.chat(messages)
+        try:
+            # the request timeout is taken from the deadline once the call leaves the scheduler queue
+            raw = self.router.chat(
+                key,
+                messages,
+                priority=Priority.INTERACTIVE,
+                session=ctx.session_id if ctx else "default",
+                budget=self.budget,
+                step=type(self).__name__,
+                deadline=deadline,
+                **kwargs,
+            )
+        except QueueTimeout:
+            DEADLINE_METRICS.incr("skipped_calls")
+            mark_stop(memory)
+            return memory
 
         if self.debug.show_raw_model_output:
-            print("\n--- RAW MODEL OUTPUT ---\n")
-            print(raw)
-            print("\n------------------------\n")
+            log.debug("raw_model_output", key=key, text=raw)
 
         memory.vars[RUNTIME_RAW_OUTPUT_KEY] = raw
         return memory
@@ -109,9 +181,13 @@ class CommandBlockStep(Step):
 
     def execute(self, memory: Memory, ctx: Optional[ExecutionContext] = None) -> Memory:
         normalized = memory.vars.get(RUNTIME_NORMALIZED_OUTPUT_KEY, "")
-        ok, block = self.validator.extract_command_block(normalized)
-        if not ok or not block:
-            text = normalized.strip()
+        memory.vars.pop(RUNTIME_COMMAND_INNER_KEY, None)
+        # the only pass over the reply: every configured pair (commands, messages) at once
+        spans = self.validator.scan(normalized) if normalized else []
+        span = self.validator.command_span(spans)
+        messages = self.validator.messages(spans)
+        if span is None:
+            text = "\n\n".join(messages) or normalized.strip()
             if text:
                 memory.add_event("assistant", text, kind="msg")
                 if self.io:
@@ -119,12 +195,16 @@ class CommandBlockStep(Step):
             mark_stop(memory)
             return memory
 
+        for text in messages:
+            memory.add_event("assistant", text, kind="msg")
+            if self.io:
+                self.io.show(text)
+
         if self.debug.show_extracted_command:
-            print("\n--- EXTRACTED COMMAND BLOCK ---\n")
-            print(block)
-            print("\n------------------------------\n")
+            log.debug("command_block", text=span.text)
 
-        memory.vars[RUNTIME_COMMAND_BLOCK_KEY] = block
+        memory.vars[RUNTIME_COMMAND_BLOCK_KEY] = span.text
+        memory.vars[RUNTIME_COMMAND_INNER_KEY] = span.inner
         return memory
 
 
@@ -147,9 +227,12 @@ class CommandDispatchStep(Step):
             mark_stop(memory)
             return memory
 
+        inner = memory.vars.pop(RUNTIME_COMMAND_INNER_KEY, None)
         try:
-            parsed = self.parser.parse(block)
+            # CommandBlockStep already delimited the block; only re-scan a block set some other way
+            parsed = self.parser.parse_inner(inner, block) if inner is not None else self.parser.parse(block)
         except CommandParseError as exc:
+            PARSE_STATS.failure(error_kind(str(exc)))
             err = f"Command parse error: {exc}"
             memory.add_event("assistant", err, kind="note")
             if self.io:
@@ -157,6 +240,7 @@ class CommandDispatchStep(Step):
             mark_stop(memory)
             return memory
 
+        PARSE_STATS.ok()
         try:
             cmd = self.registry.get(parsed.name)
         except KeyError:
@@ -167,12 +251,39 @@ class CommandDispatchStep(Step):
             mark_stop(memory)
             return memory
 
+        prof = ctx.profiler if ctx is not None else None
+        if prof is None:
+            return self._run_command(cmd, parsed, memory, ctx)
+        with prof.section("cmd", parsed.name):
+            return self._run_command(cmd, parsed, memory, ctx)
+
+    def _run_command(self, cmd: object, parsed: ParsedCommand, memory: Memory, ctx: Optional[ExecutionContext]):
+        try:
+            undo = getattr(memory, "undo", None)
+            if undo is None:
+                return self._dispatch(cmd, parsed, memory, ctx)
+            # each command is one undo step (UNDO/REDO themselves record nothing)
+            with undo.step(parsed.name):
+                return self._dispatch(cmd, parsed, memory, ctx)
+        except (CommandError, PayloadError, ParseError, ValueError) as exc:
+            # a bad field or a range that is not in BODY: tell the model, don't end the session
+            err = f"Command error ({parsed.name}): {exc}"
+            memory.add_event("assistant", err, kind="note")
+            if self.io:
+                self.io.show(err)
+            mark_stop(memory)
+            return memory
+
+    def _dispatch(self, cmd: object, parsed: ParsedCommand, memory: Memory, ctx: Optional[ExecutionContext]):
         if isinstance(cmd, BaseCommand):
-            call = CommandCall(raw=parsed.raw_block, name=parsed.name, args=parsed.args)
-            result = cmd.execute(memory, call, ExecutionContext())
+            # KEY: sections of the payload, as the command classes expect them
+            call = parse_command_block(f"{parsed.name}\n{parsed.args['payload']}")
+            if ctx is None:
+                ctx = ExecutionContext(llm_pool=self.router.llms)
+            result = cmd.execute(memory, call, replace(ctx, io=self.io))
             if isinstance(result, DispatchResult):
                 return result
             return DispatchResult(memory=memory)
 
-        ctx = CommandContext(io=self.io, llms=self.router.llms)
-        return cmd.run(memory, parsed.args, ctx)
+        cmd_ctx = CommandContext(io=self.io, llms=self.router.llms)
+        return cmd.run(memory, parsed.args, cmd_ctx)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from utils.text import estimate_tokens
+
+_CMD_NAME = re.compile(r"<CMD>\s*\n\s*([^\n]+)")
+_CLOSE_TAG = re.compile(r"^</([A-Za-z][A-Za-z0-9_]*)>$")
+
+
+class ChatResponse(str):
+    """Model reply text plus what the server said about it.
+
+    A str subclass, so every caller that treats chat() output as text keeps
+    working; budget-aware code reads the extra attributes.
+    """
+
+    finish_reason: Optional[str]
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+    # server-side prompt processing / generation time, when reported (see core/usage.server_usage)
+    prompt_ms: Optional[float]
+    completion_ms: Optional[float]
+
+    def __new__(
+        cls,
+        text: str,
+        *,
+        finish_reason: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        prompt_ms: Optional[float] = None,
+        completion_ms: Optional[float] = None,
+    ) -> "ChatResponse":
+        obj = super().__new__(cls, text)
+        obj.finish_reason = finish_reason
+        obj.prompt_tokens = prompt_tokens
+        obj.completion_tokens = completion_tokens
+        obj.prompt_ms = prompt_ms
+        obj.completion_ms = completion_ms
+        return obj
+
+    @property
+    def truncated(self) -> bool:
+        return self.finish_reason == "length"
+
+
+@dataclass(frozen=True)
+class GenerationBudget:
+    """Per-step generation limits, sent with the request. None = LLMConfig default."""
+
+    kind: str = "default"  # budgets adapt per kind ("interactive", "fold", ...)
+    max_tokens: Optional[int] = None
+    stop: Tuple[str, ...] = ()
+    temperature: Optional[float] = None
+
+
+INTERACTIVE_BUDGET = GenerationBudget(kind="interactive")
+# a fold step needs one short <CMD> block; stop right after it
+FOLD_BUDGET = GenerationBudget(kind="fold", max_tokens=384, stop=("</CMD>",), temperature=0.1)
+
+
+def restore_stop(text: str, stop: Tuple[str, ...]) -> str:
+    """Servers drop the stop string; re-add a closing tag stop (e.g. </CMD>) if its block is left open."""
+    for s in stop:
+        m = _CLOSE_TAG.match(s)
+        if not m:
+            continue
+        opener = f"<{m.group(1)}>"
+        if text.count(opener) > text.count(s):
+            return text.rstrip() + "\n" + s
+    return text
+
+
+def command_of(text: str) -> str:
+    """Command name of the first <CMD> block in text, "text" if there is none."""
+    m = _CMD_NAME.search(text or "")
+    return m.group(1).strip().upper() if m else "text"
+
+
+class _Lengths:
+    def __init__(self, keep: int) -> None:
+        self.recent: Deque[int] = deque(maxlen=keep)
+        self.calls = 0
+        self.truncated = 0
+
+    def pct(self, p: float) -> int:
+        r = sorted(self.recent)
+        return r[min(len(r) - 1, int(p * len(r)))] if r else 0
+
+
+class BudgetController:
+    """Adapts max_tokens per budget kind from the observed reply lengths.
+
+    Lengths are kept per (kind, command type). The cap for a kind is
+    headroom * the largest p95 over its command types, plus margin_tokens,
+    clamped to [min_tokens, declared max_tokens]. A truncated reply
+    (finish_reason == "length") is discarded work, so the kind's cap is
+    lifted by `grow` until the truncations stop.
+
+    The declared max_tokens (GenerationBudget.max_tokens, else the client's
+    LLMConfig.max_tokens) is a hard ceiling: narrowing and boosting both
+    stay at or below it. Kinds in fixed_kinds ("interactive" by default)
+    are never narrowed. A user-facing reply always gets its configured cap,
+    since a truncated answer costs a whole extra turn. Their lengths are
+    still recorded for stats().
+    """
+
+    def __init__(
+        self,
+        *,
+        min_samples: int = 8,
+        keep: int = 200,
+        headroom: float = 1.25,
+        margin_tokens: int = 16,
+        min_tokens: int = 32,
+        grow: float = 2.0,
+        fixed_kinds: Tuple[str, ...] = (INTERACTIVE_BUDGET.kind,),
+    ):
+        self.min_samples = min_samples
+        self.keep = keep
+        self.headroom = headroom
+        self.margin_tokens = margin_tokens
+        self.min_tokens = min_tokens
+        self.grow = grow
+        self.fixed_kinds = frozenset(fixed_kinds)
+        self._lock = threading.Lock()
+        self._lengths: Dict[Tuple[str, str], _Lengths] = {}
+        self._boost: Dict[str, float] = {}
+        self._caps: Dict[str, int] = {}
+        self._declared: Dict[str, int] = {}
+
+    def resolve(self, budget: GenerationBudget, default_max_tokens: int) -> GenerationBudget:
+        """The budget to send: declared limits with max_tokens narrowed to what this kind really uses."""
+        declared = budget.max_tokens or default_max_tokens
+        with self._lock:
+            self._declared[budget.kind] = declared
+            if budget.kind in self.fixed_kinds:
+                return replace(budget, max_tokens=declared)
+            stats = [v for (k, _), v in self._lengths.items() if k == budget.kind]
+            if sum(len(v.recent) for v in stats) < self.min_samples:
+                return replace(budget, max_tokens=declared)
+            p95 = max(v.pct(0.95) for v in stats)
+            cap = int(p95 * self.headroom * self._boost.get(budget.kind, 1.0)) + self.margin_tokens
+            cap = max(self.min_tokens, min(declared, cap))
+            self._caps[budget.kind] = cap
+        return replace(budget, max_tokens=cap)
+
+    def observe(self, budget: GenerationBudget, reply: str) -> None:
+        tokens = getattr(reply, "completion_tokens", None)
+        if tokens is None:
+            tokens = estimate_tokens(reply)
+        truncated = getattr(reply, "finish_reason", None) == "length"
+        key = (budget.kind, command_of(reply))
+        with self._lock:
+            st = self._lengths.get(key)
+            if st is None:
+                st = self._lengths[key] = _Lengths(self.keep)
+            st.calls += 1
+            if truncated:
+                st.truncated += 1
+                self._boost[budget.kind] = self._boost.get(budget.kind, 1.0) * self.grow
+            else:
+                st.recent.append(tokens)
+                boost = self._boost.get(budget.kind)
+                if boost is not None:
+                    # drift back once replies fit again
+                    self._boost[budget.kind] = max(1.0, boost * 0.98)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for (kind, cmd), st in sorted(self._lengths.items()):
+                k = out.setdefault(kind, {
+                    "declared_max_tokens": self._declared.get(kind),
+                    "cap": self._caps.get(kind),
+                    "boost": round(self._boost.get(kind, 1.0), 2),
+                    "commands": {},
+                })
+                k["commands"][cmd] = {
+                    "calls": st.calls,
+                    "truncated": st.truncated,
+                    "p50_tokens": st.pct(0.50),
+                    "p95_tokens": st.pct(0.95),
+                }
+            return out
+
+
+def chat_with_budget(
+    call: Callable[..., str],
+    budget: Optional[GenerationBudget],
+    controller: Optional[BudgetController],
+    default_max_tokens: int,
+    **kwargs: Any,
+) -> str:
+    """call(budget=..., **kwargs) with the budget resolved by (and the reply fed back to) controller."""
+    if budget is None:
+        return call(**kwargs)
+    if controller is not None:
+        budget = controller.resolve(budget, default_max_tokens)
+    reply = call(budget=budget, **kwargs)
+    if controller is not None:
+        controller.observe(budget, reply)
+    return reply
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional
+
+# sections
+BODY = "body"
+HISTORY = "history"
+CLIPBOARD = "clipboard"
+STATE = "state"
+
+# ops
+REPLACE = "replace"  # section[start:end] = text (char offsets into the section before the change)
+APPEND = "append"    # HISTORY: one rendered entry added; the window keeps the last history_limit
+RESET = "reset"      # whole section replaced by text (HISTORY: cleared, APPENDs follow)
+SET = "set"          # STATE: key `text` split on the first "=" ("k=v"); DELETE has no value
+DELETE = "delete"
+
+
+@dataclass(frozen=True)
+class MemoryDelta:
+    """One structured change to a Memory section, in the order it happened.
+
+    seq is the feed position (strictly increasing, no gaps); a consumer keeps
+    the last seq it applied and asks for changes_since(seq).
+    """
+
+    seq: int
+    section: str
+    op: str
+    start: int = 0
+    end: int = 0
+    text: str = ""
+
+    def describe(self, max_chars: int = 80) -> str:
+        t = self.text.replace("\n", "\\n")
+        if len(t) > max_chars:
+            t = t[: max_chars - 3] + "..."
+        if self.op == REPLACE:
+            return f"#{self.seq} {self.section} {self.op} [{self.start}:{self.end}] {t!r}"
+        return f"#{self.seq} {self.section} {self.op} {t!r}"
+
+
+class ChangeFeed:
+    """Bounded log of MemoryDelta.
+
+    Old deltas fall off the front; a consumer that is further behind than the
+    log reaches gets None from changes_since() and must resync from
+    Memory.snapshot_deltas() (or to_text()).
+    """
+
+    def __init__(self, maxlen: int = 2000):
+        self._log: Deque[MemoryDelta] = deque(maxlen=maxlen)
+        self.seq = 0
+
+    def emit(self, section: str, op: str, start: int = 0, end: int = 0, text: str = "") -> None:
+        self.seq += 1
+        self._log.append(MemoryDelta(self.seq, section, op, start, end, text))
+
+    def changes_since(self, seq: int) -> Optional[List[MemoryDelta]]:
+        if seq >= self.seq:
+            return []
+        if not self._log or self._log[0].seq > seq + 1:
+            return None
+        # seqs are contiguous, so the first wanted delta sits at a known offset
+        first = seq + 1 - self._log[0].seq
+        return [self._log[i] for i in range(first, len(self._log))]
+
+
+class MemoryView:
+    """Frontend-side mirror of a Memory, patched from deltas (reference consumer of the feed)."""
+
+    def __init__(self, history_limit: int = 20):
+        self.history_limit = history_limit
+        self.state: Dict[str, str] = {}
+        self.history: List[str] = []
+        self.clipboard = ""
+        self.body = ""
+        self.seq = 0
+
+    def apply(self, deltas: Iterable[MemoryDelta]) -> None:
+        for d in deltas:
+            if d.section == BODY:
+                if d.op == REPLACE:
+                    self.body = self.body[: d.start] + d.text + self.body[d.end:]
+                else:
+                    self.body = d.text
+            elif d.section == HISTORY:
+                if d.op == APPEND:
+                    self.history.append(d.text)
+                    del self.history[: -self.history_limit]
+                else:
+                    self.history = []
+            elif d.section == CLIPBOARD:
+                self.clipboard = d.text
+            elif d.section == STATE:
+                if d.op == SET:
+                    k, _, v = d.text.partition("=")
+                    self.state[k] = v
+                elif d.op == DELETE:
+                    self.state.pop(d.text, None)
+                else:
+                    self.state = dict(line.partition("=")[::2] for line in d.text.split("\n") if line)
+            self.seq = max(self.seq, d.seq)
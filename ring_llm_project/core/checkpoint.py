@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, fields
+from typing import TYPE_CHECKING, Optional
+
+from .memory import Memory
+from .memory_store import (
+    CheckpointError,
+    FoldStore,
+    MemoryCheckpointer,
+    PagedFold,
+    ResumeInfo,
+    SaveInfo,
+    load_memory,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .process import Process, ProcessConfig
+
+# Checkpoint of a Process between turns: the Memory save of core/memory_store.py
+# plus the Process config and turn position ("config", "turns", "pending_user"
+# next to "memory" in the manifest).
+
+__all__ = [
+    "CheckpointError",
+    "Checkpointer",
+    "FoldStore",
+    "PagedFold",
+    "ResumeInfo",
+    "Resumed",
+    "SaveInfo",
+    "load_checkpoint",
+    "save_checkpoint",
+]
+
+
+@dataclass
+class Resumed:
+    cfg: "ProcessConfig"
+    mem: Memory
+    turns: int
+    pending_user: Optional[str]
+    checkpointer: "Checkpointer"
+    info: ResumeInfo
+
+
+class Checkpointer(MemoryCheckpointer):
+    """Saves a Process to `path`; see MemoryCheckpointer for the fold store."""
+
+    def save(self, process: "Process") -> SaveInfo:
+        """Checkpoint process. Call it between turns: a turn in flight is saved as pending."""
+        return self.save_memory(
+            process.mem,
+            lock=process.lock,
+            extra=lambda: {
+                "config": asdict(process.cfg),
+                "turns": process.turns,
+                "pending_user": process.pending_user,
+            },
+        )
+
+
+def save_checkpoint(process: "Process", path: str) -> SaveInfo:
+    """One-off save; keep a Checkpointer to save the same session repeatedly."""
+    return Checkpointer(path).save(process)
+
+
+def load_checkpoint(path: str) -> Resumed:
+    """Rebuild config, memory and turn position from a checkpoint without reading any fold content."""
+    from .process import ProcessConfig  # the Process pipeline is only needed to resume one
+
+    loaded = load_memory(path, checkpointer=Checkpointer(path))
+    manifest = loaded.manifest
+    if "config" not in manifest:
+        raise CheckpointError(f"{loaded.checkpointer.path}: a Memory save, not a Process checkpoint")
+    known = {f.name for f in fields(ProcessConfig)}
+    cfg = ProcessConfig(**{k: v for k, v in manifest["config"].items() if k in known})
+    return Resumed(cfg, loaded.mem, manifest["turns"], manifest["pending_user"], loaded.checkpointer, loaded.info)  # type: ignore[arg-type]
@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Dict
 
 from core.commands.base import Command, CommandContext, CommandResult
+from core.dedup import jaccard
 from core.memory import Memory
 from utils.text import safe_int
 
@@ -17,9 +18,9 @@ class AskCommand(Command):
             memory.add_debug("ASK: empty text -> rejected")
             return CommandResult(ok=False, error="ASK_missing_text")
 
-        # Anti-repeat: if same ASK text repeated too often recently, suppress it.
+        # Anti-repeat: if the same (or a near-identical) ASK was repeated too often recently, suppress it.
         recent = ctx.executed_recent_cmds[-ctx.repeat_ask_window :]
-        same = [c for c in recent if c.startswith("ASK|") and c == f"ASK|{text}"]
+        same = [c for c in recent if c.startswith("ASK|") and jaccard(c[4:], text) >= ctx.repeat_ask_similarity]
         if len(same) >= ctx.repeat_ask_limit:
             memory.add_debug(f"ASK suppressed (repeated): {text}")
             memory.add_inbox(f"(suppressed repeated ASK) {text}")
@@ -13,6 +13,8 @@ class CommandContext:
     executed_recent_cmds: list[str]
     repeat_ask_window: int
     repeat_ask_limit: int
+    # shingle Jaccard at or above this counts as the same ASK (1.0 = exact repeats only)
+    repeat_ask_similarity: float = 0.8
 
 
 @dataclass
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from typing import Optional
 
-from ring_llm_project.commands.base import IOAdapter
-from ring_llm_project.commands.registry import CommandRegistry
+from commands.base import IOAdapter
+from commands.registry import CommandRegistry
+from config import AppConfig
 
+from .constraints import build_constraint
 from .behavior import (
     BehaviorModel,
     CommandBlockStep,
@@ -32,32 +34,44 @@ class ConsciousnessBuilder:
         registry: CommandRegistry,
         io: Optional[IOAdapter] = None,
         debug: DebugFlags = DebugFlags(),
+        app_cfg: Optional[AppConfig] = None,
     ):
         self.cfg = cfg
         self.router = router
         self.registry = registry
         self.io = io
         self.debug = debug
+        # block markers (CMD and MESSAGE pairs) the reply scanner recognises
+        self.app_cfg = app_cfg or AppConfig()
 
     def build(self) -> BehaviorModel:
-        folder = Folder(keep_last_events=self.cfg.auto_fold_keep_last_events)
+        folder = Folder(
+            keep_last_events=self.cfg.auto_fold_keep_last_events,
+            compact_history=self.cfg.auto_fold_compact_history,
+        )
         normalizer = Normalizer(NormalizeConfig(strip_thoughts_only_if_prefix=True))
-        validator = CommandValidator(ValidateConfig(mode="extract_anywhere"))
+        validator = CommandValidator(ValidateConfig(
+            mode="extract_anywhere",
+            pairs=tuple(self.app_cfg.delimiter_pairs()),
+        ))
         parser = CommandParser()
         prompt_builder = PromptBuilder(
-            PromptConfig(),
+            PromptConfig(context_tokens=self.cfg.context_tokens, addressing=self.cfg.addressing),
             registry=self.registry,
             validator_help=validator.format_help_prompt(),
         )
 
         sequence = StepSequence(
             steps=[
-                FoldStep(folder=folder, debug=self.debug),
+                FoldStep(folder=folder, debug=self.debug, inline=not self.cfg.background_fold),
                 PromptAndCallStep(
                     prompt_builder=prompt_builder,
                     router=self.router,
                     control_llm_key=self.cfg.control_llm_key,
                     debug=self.debug,
+                    fallback_llm_key=self.cfg.fallback_llm_key,
+                    fallback_below_s=self.cfg.fallback_below_s,
+                    constraint=build_constraint(self.registry),
                 ),
                 NormalizeStep(normalizer=normalizer),
                 CommandBlockStep(validator=validator, io=self.io, debug=self.debug),
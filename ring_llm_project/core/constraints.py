@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Response-format constraints built from the registered commands, so the
+# server can only sample well-formed <CMD> blocks:
+#   - "gbnf":        llama.cpp / LM Studio `grammar` (the <CMD> text format itself)
+#   - "ollama":      Ollama `format` = JSON schema; the JSON reply is turned back into a <CMD> block
+#   - "json_schema": OpenAI-style `response_format` with the same schema
+CONSTRAINT_MODES = ("none", "gbnf", "ollama", "json_schema")
+
+_FIELD_LINE = re.compile(r"^([A-Z][A-Z0-9_]*):\s*$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class CommandShape:
+    """Name and KEY: fields of one command, as documented in its prompt_help."""
+
+    name: str
+    fields: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ResponseConstraint:
+    gbnf: str
+    json_schema: Dict[str, Any]
+
+    def apply(self, mode: str, payload: Dict[str, Any]) -> None:
+        """Add the constraint for mode to a chat-completions request payload."""
+        if mode == "gbnf":
+            payload["grammar"] = self.gbnf
+        elif mode == "ollama":
+            payload["format"] = self.json_schema
+        elif mode == "json_schema":
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "command", "strict": False, "schema": self.json_schema},
+            }
+        elif mode != "none":
+            raise ValueError(f"unknown constraint mode: {mode!r}")
+
+
+def command_fields(prompt_help: str) -> Tuple[str, ...]:
+    """KEY: lines of a prompt_help text, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for m in _FIELD_LINE.finditer(prompt_help or ""):
+        seen.setdefault(m.group(1), None)
+    return tuple(seen)
+
+
+def shapes_from_registry(registry: Any) -> List[CommandShape]:
+    """Works on CommandRegistry (lazy entries included) and CommandDispatcher registries."""
+    cmds = registry.all() if hasattr(registry, "all") else registry
+    shapes = []
+    for name, cmd in sorted(cmds.items()):
+        shapes.append(CommandShape(name=name, fields=command_fields(getattr(cmd, "prompt_help", ""))))
+    return shapes
+
+
+# ----------------------------
+# GBNF
+# ----------------------------
+
+
+def _rule_name(name: str) -> str:
+    return "cmd-" + re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def _lit(s: str) -> str:
+    return json.dumps(s)
+
+
+def build_gbnf(shapes: Iterable[CommandShape]) -> str:
+    """Grammar for exactly one <CMD> block of a registered command.
+
+    Commands with documented fields get "KEY:\\nvalue lines" sections (each
+    optional, in documented order); the others take free payload lines.
+    Payload lines cannot contain "</", so the block cannot end early.
+    """
+    shapes = list(shapes)
+    if not shapes:
+        raise ValueError("no commands to build a grammar from")
+    lines = [
+        'root ::= "<CMD>\\n" command "</CMD>"',
+        "command ::= " + " | ".join(_rule_name(s.name) for s in shapes),
+        'line ::= ([^<\\n] | "<" [^/\\n])* "\\n"',
+    ]
+    for s in shapes:
+        if s.fields:
+            parts = " ".join(f"({_lit(f + ':' + chr(10))} line+)?" for f in s.fields)
+        else:
+            parts = "line*"
+        lines.append(f"{_rule_name(s.name)} ::= {_lit(s.name + chr(10))} {parts}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------
+# JSON schema (+ mapping back to a <CMD> block)
+# ----------------------------
+
+
+def build_json_schema(shapes: Iterable[CommandShape]) -> Dict[str, Any]:
+    """{"command": <name>, <FIELD>: str..., "text": str}. Flat, because Ollama's format ignores oneOf."""
+    shapes = list(shapes)
+    props: Dict[str, Any] = {"command": {"type": "string", "enum": [s.name for s in shapes]}}
+    for s in shapes:
+        for f in s.fields:
+            props.setdefault(f, {"type": "string"})
+    props["text"] = {"type": "string", "description": "payload for commands without fields"}
+    return {"type": "object", "properties": props, "required": ["command"]}
+
+
+def json_to_cmd_block(raw: str) -> str:
+    """Turn a JSON reply of build_json_schema() into a <CMD> block; anything else is returned as is."""
+    s = raw.strip()
+    if not s.startswith("{"):
+        return raw
+    try:
+        obj = json.loads(s)
+    except ValueError:
+        return raw
+    if not isinstance(obj, dict) or not isinstance(obj.get("command"), str):
+        return raw
+    out = ["<CMD>", obj["command"].strip()]
+    for k, v in obj.items():
+        if k in ("command", "text") or v is None or v == "":
+            continue
+        out.append(f"{k}:")
+        out.append(str(v).rstrip("\n"))
+    text = obj.get("text")
+    if isinstance(text, str) and text:
+        out.append(text.rstrip("\n"))
+    out.append("</CMD>")
+    return "\n".join(out)
+
+
+def build_constraint(registry: Any) -> ResponseConstraint:
+    shapes = shapes_from_registry(registry)
+    return ResponseConstraint(gbnf=build_gbnf(shapes), json_schema=build_json_schema(shapes))
+
+
+# ----------------------------
+# Parse-failure stats
+# ----------------------------
+
+
+class ParseStats:
+    """Parse outcomes of model replies; a failure costs one more LLM call (a retry)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.failures = 0
+        self.turns = 0
+        self._turn_failures = 0
+        self.max_retries_per_turn = 0
+        self.by_error: Dict[str, int] = {}
+
+    def ok(self) -> None:
+        with self._lock:
+            self.parsed += 1
+
+    def failure(self, error: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self._turn_failures += 1
+            self.by_error[error] = self.by_error.get(error, 0) + 1
+
+    def finish_turn(self) -> None:
+        with self._lock:
+            self.turns += 1
+            self.max_retries_per_turn = max(self.max_retries_per_turn, self._turn_failures)
+            self._turn_failures = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.parsed + self.failures
+            return {
+                "replies": total,
+                "failures": self.failures,
+                "failure_rate": round(self.failures / total, 4) if total else 0.0,
+                "turns": self.turns,
+                "retries_per_turn": round(self.failures / self.turns, 3) if self.turns else 0.0,
+                "max_retries_per_turn": self.max_retries_per_turn,
+                "by_error": dict(self.by_error),
+            }
+
+
+PARSE_STATS = ParseStats()
+
+
+def error_kind(message: str) -> str:
+    """Stable bucket for a parse error message (drops the variable tail)."""
+    return (message or "unknown").split(":", 1)[0].strip()[:60]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Deadline:
+    """Absolute per-turn time budget (monotonic clock), carried in ExecutionContext."""
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, end: float, start: Optional[float] = None):
+        self.end = end
+        self.start = time.monotonic() if start is None else start
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        now = time.monotonic()
+        return cls(end=now + seconds, start=now)
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.end
+
+    def near(self, reserve_s: float) -> bool:
+        """True once less than reserve_s is left."""
+        return self.end - time.monotonic() < reserve_s
+
+    def timeout(self, default: float, *, floor_s: float = 0.5) -> float:
+        """Per-request timeout: the configured one, capped by what is left of the turn."""
+        return max(floor_s, min(default, self.remaining()))
+
+
+class DeadlineMetrics:
+    """Process-wide counters for turn budgets (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {"turns": 0, "misses": 0, "early_exits": 0, "fallbacks": 0, "skipped_calls": 0}
+        self.worst_overrun_s = 0.0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def finish_turn(self, deadline: Deadline) -> None:
+        overrun = time.monotonic() - deadline.end
+        with self._lock:
+            self._counts["turns"] += 1
+            if overrun > 0:
+                self._counts["misses"] += 1
+                self.worst_overrun_s = max(self.worst_overrun_s, overrun)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            out: Dict[str, float] = dict(self._counts)
+            out["worst_overrun_s"] = round(self.worst_overrun_s, 3)
+            return out
+
+
+DEADLINE_METRICS = DeadlineMetrics()
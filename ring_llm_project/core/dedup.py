@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, k: int = 3) -> FrozenSet[int]:
+    """Hashed word k-grams of text (case and punctuation insensitive)."""
+    words = [w.lower() for w in _WORD.findall(text or "")]
+    if not words:
+        return frozenset()
+    if len(words) < k:
+        return frozenset((zlib.crc32(" ".join(words).encode("utf-8")),))
+    return frozenset(
+        zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)
+    )
+
+
+def jaccard(a: str, b: str, k: int = 3) -> float:
+    """Exact shingle Jaccard similarity. Fine for a handful of short strings."""
+    sa, sb = shingles(a, k), shingles(b, k)
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+class MinHasher:
+    """One-permutation MinHash with rotation densification.
+
+    Each shingle is hashed once and routed to one of num_perm bins, so a
+    signature costs O(shingles) instead of O(shingles * num_perm); empty bins
+    borrow the value of the next non-empty bin (Shrivastava & Li, 2017).
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rnd = random.Random(seed)
+        self.num_perm = num_perm
+        self._a = rnd.randrange(1, _MERSENNE) | 1
+        self._b = rnd.randrange(0, _MERSENNE)
+
+    def signature(self, shingle_set: FrozenSet[int]) -> Tuple[int, ...]:
+        n = self.num_perm
+        if not shingle_set:
+            return (_MAX_HASH,) * n
+        a, b, p = self._a, self._b, _MERSENNE
+        bins: List[int] = [-1] * n
+        for x in shingle_set:
+            h = (a * x + b) % p
+            slot = h % n
+            v = (h // n) & _MAX_HASH
+            cur = bins[slot]
+            if cur < 0 or v < cur:
+                bins[slot] = v
+        if -1 in bins:
+            for i in range(n):
+                if bins[i] < 0:
+                    step = 1
+                    while bins[(i + step) % n] < 0:
+                        step += 1
+                    # offset by the distance so borrowed values stay distinguishable
+                    bins[i] = (bins[(i + step) % n] + step * 0x9E3779B1) & _MAX_HASH
+        return tuple(bins)
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return same / len(sig_a) if sig_a else 1.0
+
+
+@dataclass
+class DuplicateGroup:
+    """First occurrence of a near-duplicate cluster and how many items it absorbed."""
+
+    index: int
+    text: str
+    count: int = 1
+
+
+class NearDuplicateIndex:
+    """LSH-banded MinHash index. Candidate lookup is O(bands), not O(items)."""
+
+    def __init__(self, *, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, k: int = 3):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.k = k
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+        self._sigs: List[Tuple[int, ...]] = []
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def find(self, text: str) -> Optional[int]:
+        """Index of the first stored item near-identical to text, or None."""
+        return self._find(self._signature(text))
+
+    def add(self, text: str) -> Tuple[int, Optional[int]]:
+        """Store text; return (its index, index of the first near-duplicate or None)."""
+        sig = self._signature(text)
+        dup = self._find(sig)
+        idx = len(self._sigs)
+        self._sigs.append(sig)
+        rows = self.rows
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(sig[band * rows:(band + 1) * rows], []).append(idx)
+        return idx, dup
+
+    def _signature(self, text: str) -> Tuple[int, ...]:
+        return self.hasher.signature(shingles(text, self.k))
+
+    def _find(self, sig: Tuple[int, ...]) -> Optional[int]:
+        rows = self.rows
+        best: Optional[int] = None
+        for band, buckets in enumerate(self._buckets):
+            for cand in buckets.get(sig[band * rows:(band + 1) * rows], ()):
+                if best is not None and cand >= best:
+                    break
+                if MinHasher.similarity(sig, self._sigs[cand]) >= self.threshold:
+                    best = cand
+                    break
+        return best
+
+
+def collapse_near_duplicates(
+    items: Sequence[str],
+    *,
+    threshold: float = 0.8,
+    keep: Optional[Sequence[bool]] = None,
+    weights: Optional[Sequence[int]] = None,
+) -> List[DuplicateGroup]:
+    """Group near-identical items onto their first occurrence, preserving order.
+
+    keep[i] == True pins item i: it is never merged into another group
+    (it may still absorb later duplicates). weights[i] is what item i adds
+    to its group's count (default 1), for items that already stand for
+    several collapsed ones. Items without word shingles
+    (blank lines, rules like "---", punctuation-only rows) have nothing to
+    compare, so each stays its own group.
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    k = index.k
+    groups: List[DuplicateGroup] = []
+    group_of: Dict[int, DuplicateGroup] = {}
+    for i, text in enumerate(items):
+        w = weights[i] if weights is not None else 1
+        if not shingles(text, k):
+            groups.append(DuplicateGroup(index=i, text=text, count=w))
+            continue
+        pinned = bool(keep[i]) if keep is not None else False
+        idx, dup = index.add(text)
+        if dup is not None and not pinned and dup in group_of:
+            group_of[dup].count += w
+            group_of[idx] = group_of[dup]
+            continue
+        g = DuplicateGroup(index=i, text=text, count=w)
+        groups.append(g)
+        group_of[idx] = g
+    return groups
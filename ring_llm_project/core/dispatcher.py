@@ -5,6 +5,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, Optional
 
+from commands.manifest import CommandManifestEntry, LazyCommand
 from core.types import CommandCall, DispatchResult, ExecutionContext
 
 
@@ -19,11 +20,22 @@ class CommandRegistry:
             raise ValueError(f"Command {cmd!r} has invalid .name")
         self._cmds[name.upper()] = cmd
 
+    def register_lazy(self, entry: CommandManifestEntry) -> None:
+        # prompt_help comes from the manifest; the module is imported on first get()
+        self._cmds[entry.name.upper()] = LazyCommand(entry)
+
     def get(self, name: str) -> object:
         key = name.upper().strip()
         if key not in self._cmds:
             raise KeyError(f"Unknown command: {name}")
-        return self._cmds[key]
+        cmd = self._cmds[key]
+        if isinstance(cmd, LazyCommand):
+            cmd = self._cmds[key] = cmd.load()
+        return cmd
+
+    def all(self) -> Dict[str, object]:
+        """All commands; lazy ones stay as LazyCommand (name and prompt_help only)."""
+        return dict(self._cmds)
 
     def prompt_help_all(self) -> str:
         lines = []
@@ -3,25 +3,85 @@ from typing import Optional
 from .memory import Memory
 
 
-class Folder:
-    def __init__(self, keep_last_events: int = 30):
+class FoldTrigger:
+    """When to run a fold pass: memory past mem.max_chars, with hysteresis.
+
+    The trigger reads Memory's running size counters (O(1), no render).
+    Hysteresis: after a pass that gets the size under max_chars the trigger
+    is disarmed until the size drops below low_water * max_chars, so we
+    don't fold on every turn that sits just above the threshold. A pass
+    that cannot get under max_chars (BODY alone is too big, or there is no
+    old history to fold) disarms it only until the size has grown by
+    (1 - low_water) * max_chars past what the pass left, so HISTORY still
+    gets folded as it grows.
+
+    Call needs_fold before a pass and settle after it; any pass works
+    (Folder.fold, the S2 fold loop of AgentApp).
+    """
+
+    def __init__(self, low_water: float = 0.8):
+        if not 0.0 < low_water <= 1.0:
+            raise ValueError("low_water must be in (0, 1]")
+        self.low_water = low_water
+        self._armed = True
+        # set while disarmed after a pass that left memory above max_chars
+        self._retry_above: Optional[int] = None
+
+    def needs_fold(self, mem: Memory) -> bool:
+        size = mem.text_len()
+        if not self._armed:
+            if self._retry_above is not None:
+                if mem.max_chars < size <= self._retry_above:
+                    return False
+            elif size >= mem.max_chars * self.low_water:
+                return False
+            self._armed = True
+            self._retry_above = None
+        return size > mem.max_chars
+
+    def settle(self, mem: Memory) -> None:
+        """Hysteresis bookkeeping after a fold pass over mem (also for passes run on a clone)."""
+        size = mem.text_len()
+        self._armed = False
+        if size <= mem.max_chars:
+            self._retry_above = None
+        else:
+            self._retry_above = size + int(mem.max_chars * (1.0 - self.low_water))
+
+
+class Folder(FoldTrigger):
+    """Auto-folds old HISTORY when memory grows past mem.max_chars (see FoldTrigger).
+
+    compact_history=True also collapses near-duplicate HISTORY entries
+    (Memory.compact_history) before folding; off by default because it
+    rewrites entries the model may still refer to.
+    """
+
+    def __init__(self, keep_last_events: int = 30, low_water: float = 0.8, compact_history: bool = False):
+        super().__init__(low_water)
         self.keep_last_events = keep_last_events
+        self.compact_history = compact_history
 
     def auto_fold_if_needed(self, mem: Memory) -> Optional[str]:
-        text = mem.to_text(include_fill_line=False)
-        if len(text) <= mem.max_chars:
+        if not self.needs_fold(mem):
             return None
+        fold_id = self.fold(mem)
+        self.settle(mem)
+        return fold_id
+
+    def fold(self, mem: Memory) -> Optional[str]:
+        """Unconditional compaction pass (no trigger check, no hysteresis bookkeeping)."""
+        if self.compact_history:
+            # cheap first: collapse near-duplicate entries (no LLM)
+            mem.compact_history()
+            if mem.text_len() <= mem.max_chars:
+                return None
 
         # fold old history into one fold
-        if len(mem.history) <= self.keep_last_events:
+        n_old = len(mem.history) - self.keep_last_events
+        if n_old <= 0:
             return None
 
-        old = mem.history[:-self.keep_last_events]
-        keep = mem.history[-self.keep_last_events:]
-
-        folded_text = "\n".join(f"{int(e.ts)} {e.role.upper()}({e.kind}): {e.text}" for e in old)
-        fold = mem.create_fold(title="Auto-folded history", content=folded_text, parent_fold_id=None)
-
-        mem.history = keep
-        mem.add_event("system", f"Folded {len(old)} events into fold {fold.id}", kind="note", related_fold_id=fold.id)
-        return fold.id
+        fold_id = mem.fold_history(n_old, label="Auto-folded history")
+        mem.push_history(f"[AUTO_FOLD] folded {n_old} history entries into fold {fold_id}")
+        return fold_id
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from utils.text import CHARS_PER_TOKEN, estimate_tokens
+
+if TYPE_CHECKING:  # pragma: no cover
+    from core.memory import Fold
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN.findall(text or "")]
+
+
+@dataclass(frozen=True)
+class FoldHit:
+    fold_id: str
+    score: float
+
+
+class FoldIndex:
+    """Incremental BM25 inverted index over fold labels and contents.
+
+    Postings are term -> {fold_id: tf}. Labels are counted label_boost times,
+    so a label hit outweighs the same word buried in a long content.
+    IDF and average length are derived at query time, so add/remove are
+    O(unique terms of the fold) and never touch other folds.
+    """
+
+    def __init__(self, *, k1: float = 1.2, b: float = 0.75, label_boost: int = 3):
+        self.k1 = k1
+        self.b = b
+        self.label_boost = label_boost
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        # fold_id -> its terms, so remove() only visits that fold's postings
+        self._terms: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def __contains__(self, fold_id: str) -> bool:
+        return fold_id in self._doc_len
+
+    def add(self, fold: "Fold") -> None:
+        if fold.fold_id in self._doc_len:
+            self.remove(fold.fold_id)
+        tf = Counter(tokenize(fold.content))
+        for term in tokenize(fold.label):
+            tf[term] += self.label_boost
+        for term, n in tf.items():
+            self._postings.setdefault(term, {})[fold.fold_id] = n
+        self._terms[fold.fold_id] = list(tf)
+        length = sum(tf.values())
+        self._doc_len[fold.fold_id] = length
+        self._total_len += length
+
+    def remove(self, fold_id: str) -> None:
+        length = self._doc_len.pop(fold_id, None)
+        if length is None:
+            return
+        self._total_len -= length
+        for term in self._terms.pop(fold_id, ()):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(fold_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-able copy of the index, so a resumed session does not re-tokenize every fold."""
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "label_boost": self.label_boost,
+            "postings": {term: dict(posting) for term, posting in self._postings.items()},
+            "doc_len": dict(self._doc_len),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "FoldIndex":
+        idx = cls(k1=state["k1"], b=state["b"], label_boost=state["label_boost"])
+        idx._postings = state["postings"]
+        idx._doc_len = state["doc_len"]
+        idx._total_len = sum(idx._doc_len.values())
+        for term, posting in idx._postings.items():
+            for fold_id in posting:
+                idx._terms.setdefault(fold_id, []).append(term)
+        return idx
+
+    def query(self, text: str, top_k: int = 5, *, only: Optional[Iterable[str]] = None) -> List[FoldHit]:
+        """Top folds for text by BM25. With `only`, other folds are skipped before ranking.
+
+        Collection statistics (IDF, average length) still cover every fold.
+        """
+        allowed = set(only) if only is not None else None
+        n_docs = len(self._doc_len)
+        if n_docs == 0 or top_k < 1:
+            return []
+        avgdl = self._total_len / n_docs or 1.0
+        k1, b = self.k1, self.b
+        doc_len = self._doc_len
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(text)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for fold_id, tf in posting.items():
+                if allowed is not None and fold_id not in allowed:
+                    continue
+                norm = k1 * (1.0 - b + b * doc_len[fold_id] / avgdl)
+                scores[fold_id] = scores.get(fold_id, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:top_k]
+        return [FoldHit(fold_id=f, score=s) for f, s in best]
+
+    def select(
+        self,
+        text: str,
+        folds: Dict[str, "Fold"],
+        *,
+        top_k: int = 3,
+        budget_tokens: int = 800,
+        only: Iterable[str] = (),
+    ) -> List[Tuple["Fold", str]]:
+        """Top folds for text with their content, excerpted to fit budget_tokens in total.
+
+        If `only` is given, hits outside it are skipped (e.g. folds that are
+        already expanded in BODY do not need to be shown twice).
+        """
+        allowed = set(only)
+        out: List[Tuple["Fold", str]] = []
+        left = budget_tokens
+        terms = set(tokenize(text))
+        # filtered before ranking: higher-scoring folds outside `only` must not crowd out the allowed ones
+        for hit in self.query(text, top_k=top_k, only=allowed or None):
+            if len(out) >= top_k or left <= 0:
+                break
+            fold = folds.get(hit.fold_id)
+            if fold is None:
+                continue
+            snippet = fold.content
+            if estimate_tokens(snippet) > left:
+                snippet = excerpt(snippet, terms, left * CHARS_PER_TOKEN)
+            left -= estimate_tokens(snippet)
+            out.append((fold, snippet))
+        return out
+
+
+def excerpt(content: str, terms: Iterable[str], max_chars: int) -> str:
+    """Window of max_chars centered on the first query-term hit (or the head)."""
+    if len(content) <= max_chars:
+        return content
+    if max_chars <= 3:
+        return content[:max_chars]
+    lowered = content.lower()
+    hits = [i for i in (lowered.find(t) for t in terms) if i >= 0]
+    center = min(hits) if hits else 0
+    lo = max(0, min(center - max_chars // 3, len(content) - max_chars))
+    hi = lo + max_chars
+    s = content[lo:hi]
+    if lo > 0:
+        s = "…" + s[1:]
+    if hi < len(content):
+        s = s[:-1] + "…"
+    return s
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import bisect
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fallback for Memory.find_range when the model's START/END is not an exact
+# substring of BODY. Two passes, both over a normalized copy of the body
+# (whitespace runs -> one space, typographic quotes/dashes -> ASCII):
+#   1. exact find of the normalized token (whitespace / quote drift);
+#   2. bit-parallel approximate search (Myers' algorithm with transpositions,
+#      one Python int per bit vector) for small typos, with a confidence threshold and
+#      ambiguity detection. A candidate whose digits differ from the token's is
+#      rejected: "2026-03-07" must not resolve to "2026-03-01".
+# Pass 2 can be switched off per lookup (fuzzy=False); destructive commands do.
+# Offsets are mapped back to the original body.
+
+_TRANSLATE = {
+    "“": '"', "”": '"', "„": '"', "«": '"', "»": '"',
+    "‘": "'", "’": "'", "‚": "'", "`": "'",
+    "–": "-", "—": "-", "−": "-",
+    " ": " ",
+}
+
+_DIGITS = re.compile(r"\d+")
+
+
+class AmbiguousMatch(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class FuzzyConfig:
+    # max edits = ceil(max_error_rate * len(token)), never more than max_errors
+    max_error_rate: float = 0.2
+    max_errors: int = 8
+    # 1 - edits / len(token); below this the match is rejected
+    min_confidence: float = 0.8
+    # shorter tokens are too easy to match by accident: normalized exact only
+    min_fuzzy_len: int = 6
+
+
+@dataclass(frozen=True)
+class Match:
+    start: int  # original body offsets, end exclusive
+    end: int
+    edits: int
+    confidence: float
+    kind: str  # "normalized" | "fuzzy"
+
+
+class NormalizedText:
+    """Normalized copy of a text plus the map back to original offsets.
+
+    pos[k] is the original offset of normalized char k; pos[len] is len(original).
+    """
+
+    __slots__ = ("source", "text", "pos")
+
+    def __init__(self, source: str):
+        self.source = source
+        out: List[str] = []
+        pos: List[int] = []
+        in_space = False
+        for i, ch in enumerate(source):
+            ch = _TRANSLATE.get(ch, ch)
+            if ch.isspace():
+                if in_space:
+                    continue
+                in_space = True
+                ch = " "
+            else:
+                in_space = False
+            out.append(ch)
+            pos.append(i)
+        pos.append(len(source))
+        self.text = "".join(out)
+        self.pos = pos
+
+    def norm_offset(self, orig: int) -> int:
+        """First normalized index at or after original offset orig."""
+        return bisect.bisect_left(self.pos, orig)
+
+    def span(self, i: int, j: int) -> Tuple[int, int]:
+        """Original [start, end) of normalized [i, j)."""
+        if j <= i:
+            return self.pos[i], self.pos[i]
+        return self.pos[i], self.pos[j - 1] + 1
+
+
+def normalize(s: str) -> str:
+    return NormalizedText(s.strip()).text
+
+
+def myers_ends(text: str, pattern: str, k: int, start: int = 0) -> List[Tuple[int, int]]:
+    """(end_exclusive, edits) for every text position where pattern ends with <= k edits.
+
+    Semi-global edit distance with Myers' bit-vector recurrence and Hyyrö's
+    transposition term (an adjacent swap is one edit, not two): O(len(text))
+    big-int operations, independent of k.
+    """
+    m = len(pattern)
+    if m == 0:
+        return []
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(pattern):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    d0, prev_eq = 0, 0
+    out: List[Tuple[int, int]] = []
+    for j in range(start, len(text)):
+        eq = peq.get(text[j], 0)
+        tr = (((~d0) & eq) << 1) & prev_eq
+        d0 = ((((eq & pv) + pv) & full) ^ pv) | eq | mv | tr
+        ph = mv | (full ^ (d0 | pv))
+        mh = pv & d0
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (full ^ (d0 | ph))
+        mv = ph & d0
+        prev_eq = eq
+        if score <= k:
+            out.append((j + 1, score))
+    return out
+
+
+class FuzzyStats:
+    """Fallback outcomes; every successful fallback is one LLM retry not paid."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"normalized": 0, "fuzzy": 0, "ambiguous": 0, "rejected": 0, "retries_saved": 0}
+
+    def bump(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counts)
+
+
+FUZZY_STATS = FuzzyStats()
+
+
+class FuzzyMatcher:
+    def __init__(self, cfg: FuzzyConfig = FuzzyConfig()):
+        self.cfg = cfg
+        self._norm: Optional[NormalizedText] = None
+
+    def _normalized(self, body: str) -> NormalizedText:
+        # one body is searched repeatedly (START, then END); rebuild only when it changed
+        n = self._norm
+        if n is None or n.source is not body:
+            n = self._norm = NormalizedText(body)
+        return n
+
+    def find(self, body: str, token: str, pos: int = 0, *, fuzzy: bool = True) -> Optional[Match]:
+        """Approximate occurrence of token in body at or after pos, or None.
+
+        fuzzy=False stops after the normalized pass. Raises AmbiguousMatch if
+        the best approximate match is not unique.
+        """
+        needle = normalize(token)
+        if not needle:
+            return None
+        nt = self._normalized(body)
+        npos = nt.norm_offset(pos)
+
+        i = nt.text.find(needle, npos)
+        if i >= 0:
+            FUZZY_STATS.bump("normalized")
+            s, e = nt.span(i, i + len(needle))
+            return Match(s, e, 0, 1.0, "normalized")
+
+        cfg = self.cfg
+        m = len(needle)
+        if not fuzzy or m < cfg.min_fuzzy_len:
+            return None
+        k = min(cfg.max_errors, math.ceil(m * cfg.max_error_rate))
+        ends = myers_ends(nt.text, needle, k, npos)
+        if not ends:
+            FUZZY_STATS.bump("rejected")
+            return None
+        best = min(e for _, e in ends)
+        if 1.0 - best / m < cfg.min_confidence:
+            FUZZY_STATS.bump("rejected")
+            return None
+        # a run of adjacent end positions is one occurrence
+        runs: List[List[Tuple[int, int]]] = []
+        prev = -2
+        for end, edits in ends:
+            if end - prev > 1:
+                runs.append([])
+            runs[-1].append((end, edits))
+            prev = end
+        tied = [r for r in runs if min(e for _, e in r) == best]
+        if len(tied) > 1:
+            FUZZY_STATS.bump("ambiguous")
+            where = ", ".join(str(nt.pos[r[0][0] - 1]) for r in tied[:3])
+            raise AmbiguousMatch(f"token matches {len(tied)} places approximately (near offsets {where})")
+        # within the occurrence, of the equally good ends the one giving the longest match:
+        # a shorter one drops a char the model meant (e.g. "fx" matching "f" of "fox")
+        spans = []
+        for end, edits in tied[0]:
+            if edits == best:
+                start = self._start_of(nt.text, needle, end, best, k, npos)
+                spans.append((start, end))
+        start, end = max(spans, key=lambda sp: (sp[1] - sp[0], -sp[0]))
+        # a typo in prose is fine, a different date or amount is a different place
+        if _DIGITS.findall(nt.text[start:end]) != _DIGITS.findall(needle):
+            FUZZY_STATS.bump("rejected")
+            return None
+        FUZZY_STATS.bump("fuzzy")
+        s, e = nt.span(start, end)
+        return Match(s, e, best, 1.0 - best / m, "fuzzy")
+
+    @staticmethod
+    def _start_of(text: str, needle: str, end: int, edits: int, k: int, floor: int) -> int:
+        """Start of the best match ending at end: the same search, reversed, over the window before it."""
+        lo = max(floor, end - len(needle) - k)
+        window = text[lo:end][::-1]
+        cands = [(e, n) for e, n in myers_ends(window, needle[::-1], edits) if n == edits]
+        if not cands:
+            return max(floor, end - len(needle))
+        # of equally good starts, the one giving the longest match
+        span = max(c[0] for c in cands)
+        return end - span
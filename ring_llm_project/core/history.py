@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional, Union, overload
+
+
+class HistoryEvent:
+    """One HISTORY entry. __slots__ and interned role/kind keep it small."""
+
+    __slots__ = ("ts", "role", "kind", "text", "count")
+
+    def __init__(self, role: str, text: str, kind: str = "msg", ts: Optional[float] = None, count: int = 1):
+        self.ts = time.time() if ts is None else ts
+        self.role = sys.intern(role)
+        self.kind = sys.intern(kind)
+        self.text = text
+        # how many near-identical entries this one stands for (Memory.compact_history)
+        self.count = count
+
+    def render(self, *, with_count: bool = True) -> str:
+        # Command blocks are shown verbatim; everything else is tagged with role/kind.
+        if self.kind == "cmd":
+            out = self.text
+            sep = "\n"  # keep </CMD> alone on its line
+        else:
+            out = f"{self.role.upper()}({self.kind}): {self.text}"
+            sep = " "
+        if with_count and self.count > 1:
+            out += f"{sep}(x{self.count})"
+        return out
+
+    def __repr__(self) -> str:
+        return f"HistoryEvent(role={self.role!r}, kind={self.kind!r}, text={self.text!r}, count={self.count})"
+
+
+class HistoryRing:
+    """Fixed-capacity ring buffer of HistoryEvent, oldest first.
+
+    append/appendleft/drop are O(1) per event; a full ring overwrites its
+    oldest slot instead of re-slicing a list.
+    """
+
+    __slots__ = ("_buf", "_head", "_len")
+
+    def __init__(self, capacity: int, events: Iterable[HistoryEvent] = ()):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self._buf: List[Optional[HistoryEvent]] = [None] * capacity
+        self._head = 0
+        self._len = 0
+        for ev in events:
+            self.append(ev)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[HistoryEvent]:
+        buf, cap = self._buf, len(self._buf)
+        for i in range(self._len):
+            yield buf[(self._head + i) % cap]  # type: ignore[misc]
+
+    def __reversed__(self) -> Iterator[HistoryEvent]:
+        buf, cap = self._buf, len(self._buf)
+        for i in range(self._len - 1, -1, -1):
+            yield buf[(self._head + i) % cap]  # type: ignore[misc]
+
+    @overload
+    def __getitem__(self, idx: int) -> HistoryEvent: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[HistoryEvent]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[HistoryEvent, List[HistoryEvent]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._len))]
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("history index out of range")
+        return self._buf[(self._head + idx) % len(self._buf)]  # type: ignore[return-value]
+
+    def tail(self, n: int) -> Iterator[HistoryEvent]:
+        """Last n events, oldest first, without copying the buffer."""
+        n = max(0, min(n, self._len))
+        buf, cap = self._buf, len(self._buf)
+        start = self._head + self._len - n
+        for i in range(n):
+            yield buf[(start + i) % cap]  # type: ignore[misc]
+
+    def append(self, ev: HistoryEvent) -> Optional[HistoryEvent]:
+        """Add ev as newest; return the evicted oldest event if the ring was full."""
+        cap = len(self._buf)
+        if self._len < cap:
+            self._buf[(self._head + self._len) % cap] = ev
+            self._len += 1
+            return None
+        evicted = self._buf[self._head]
+        self._buf[self._head] = ev
+        self._head = (self._head + 1) % cap
+        return evicted
+
+    def appendleft(self, ev: HistoryEvent) -> None:
+        if self._len == len(self._buf):
+            raise OverflowError("history ring is full")
+        self._head = (self._head - 1) % len(self._buf)
+        self._buf[self._head] = ev
+        self._len += 1
+
+    def drop_oldest(self, n: int) -> None:
+        n = max(0, min(n, self._len))
+        cap = len(self._buf)
+        for _ in range(n):
+            self._buf[self._head] = None  # release the reference
+            self._head = (self._head + 1) % cap
+        self._len -= n
+
+    def clear(self) -> None:
+        self._buf = [None] * len(self._buf)
+        self._head = 0
+        self._len = 0
@@ -3,20 +3,40 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Sequence
+
+from .changefeed import MemoryDelta
 
 
 class IOAdapter:
+    # frontends that patch their memory view from deltas set this and override apply_deltas()
+    wants_deltas: bool = False
+
     def say(self, text: str) -> None:
         raise NotImplementedError
 
+    def show(self, text: str) -> None:
+        """Assistant text outside a command (steps call this; SAY calls say())."""
+        self.say(text)
+
     def ask(self, prompt: str) -> str:
         raise NotImplementedError
 
+    def apply_deltas(self, deltas: Sequence[MemoryDelta]) -> None:
+        """Consume memory changes in order. Deltas with op "reset" may arrive after a resync."""
+        return None
+
 
 @dataclass
 class ConsoleIO(IOAdapter):
     prefix_out: str = "ASSISTANT> "
     prefix_in: str = "YOU> "
+    # print a one-line summary per memory change instead of the whole memory
+    show_deltas: bool = False
+
+    @property
+    def wants_deltas(self) -> bool:  # type: ignore[override]
+        return self.show_deltas
 
     def say(self, text: str) -> None:
         print(f"{self.prefix_out}{text}")
@@ -24,3 +44,7 @@ class ConsoleIO(IOAdapter):
     def ask(self, prompt: str) -> str:
         print(f"{self.prefix_out}{prompt}")
         return input(self.prefix_in)
+
+    def apply_deltas(self, deltas: Sequence[MemoryDelta]) -> None:
+        for d in deltas:
+            print(f"  ~ {d.describe()}")
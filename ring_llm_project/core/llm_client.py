@@ -6,7 +6,9 @@ import json
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
-import requests
+from .budget import ChatResponse, GenerationBudget, restore_stop
+from .constraints import ResponseConstraint, json_to_cmd_block
+from .usage import server_usage
 
 
 @dataclass(frozen=True)
@@ -17,6 +19,8 @@ class LLMConfig:
     temperature: float = 0.2
     max_tokens: int = 1024
     timeout_s: float = 120.0
+    # how to send a ResponseConstraint: "none" | "gbnf" | "ollama" | "json_schema" (see core/constraints.py)
+    constraint: str = "none"
 
 
 class LLMClient:
@@ -25,7 +29,16 @@ class LLMClient:
     def __init__(self, cfg: LLMConfig):
         self.cfg = cfg
 
-    def chat(self, messages: List[Dict[str, str]]) -> str:
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        timeout_s: Optional[float] = None,
+        constraint: Optional[ResponseConstraint] = None,
+        budget: Optional[GenerationBudget] = None,
+    ) -> ChatResponse:
+        import requests  # deferred: ~100ms of imports that the first prompt doesn't need
+
         url = self.cfg.base_url.rstrip("/") + "/chat/completions"
         headers = {"Content-Type": "application/json"}
         if self.cfg.api_key:
@@ -38,9 +51,39 @@ class LLMClient:
             "max_tokens": self.cfg.max_tokens,
             "stream": False,
         }
+        if budget is not None:
+            if budget.max_tokens is not None:
+                payload["max_tokens"] = budget.max_tokens
+            if budget.temperature is not None:
+                payload["temperature"] = budget.temperature
+            if budget.stop:
+                payload["stop"] = list(budget.stop)
+        if constraint is not None:
+            constraint.apply(self.cfg.constraint, payload)
 
-        r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=self.cfg.timeout_s)
+        timeout = self.cfg.timeout_s if timeout_s is None else min(timeout_s, self.cfg.timeout_s)
+        r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout)
         r.raise_for_status()
         data = r.json()
         # OpenAI format
-        return data["choices"][0]["message"]["content"]
+        choice = data["choices"][0]
+        content = choice["message"]["content"] or ""
+        if constraint is not None and self.cfg.constraint in ("ollama", "json_schema"):
+            content = json_to_cmd_block(content)
+        finish_reason = choice.get("finish_reason")
+        if budget is not None and budget.stop and finish_reason == "stop":
+            content = restore_stop(content, budget.stop)
+        return ChatResponse(content, finish_reason=finish_reason, **server_usage(data))
+
+    def health(self, timeout_s: float = 2.0) -> bool:
+        """Cheap liveness probe: GET {base_url}/models (OpenAI-compatible servers)."""
+        import requests
+
+        headers = {}
+        if self.cfg.api_key:
+            headers["Authorization"] = f"Bearer {self.cfg.api_key}"
+        try:
+            r = requests.get(self.cfg.base_url.rstrip("/") + "/models", headers=headers, timeout=timeout_s)
+        except requests.RequestException:
+            return False
+        return r.status_code < 500
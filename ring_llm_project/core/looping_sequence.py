@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any, List, Optional
 
+from core.deadline import DEADLINE_METRICS
+from core.profiling import execute_step
 from core.sequence import Step
 from core.types import ExecutionContext, DispatchResult
 
@@ -25,6 +27,7 @@ class LoopingStepSequence:
         developer_notes: str = "",
         max_iterations: int = 25,
         on_max_iterations: str = "stop",  # "stop" | "raise"
+        deadline_reserve_s: float = 5.0,
     ) -> None:
         if max_iterations < 1:
             raise ValueError("max_iterations must be >= 1")
@@ -36,13 +39,18 @@ class LoopingStepSequence:
         self.developer_notes = developer_notes
         self.max_iterations = max_iterations
         self.on_max_iterations = on_max_iterations
+        self.deadline_reserve_s = deadline_reserve_s
 
     def run(self, memory: Any, ctx: ExecutionContext) -> Any:
         last_res: Optional[DispatchResult] = None
 
         for it in range(1, self.max_iterations + 1):
+            if ctx.out_of_time(self.deadline_reserve_s):
+                # best effort: return what the loop has produced so far
+                DEADLINE_METRICS.incr("early_exits")
+                return memory
             for step in self.loop_steps:
-                res = step.execute(memory, ctx)
+                res = execute_step(step, memory, ctx)
 
                 # Compatibility: step may return DispatchResult or Memory directly
                 if isinstance(res, DispatchResult):
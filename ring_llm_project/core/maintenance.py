@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .memory import Memory
+
+# job(memory_clone, cancel_event): mutate the clone; return early once cancel is set
+MaintenanceJob = Callable[[Memory, threading.Event], None]
+
+
+class MaintenanceWorker:
+    """Runs folding between user turns instead of in front of them.
+
+    When the user has been idle for idle_delay_s and needs_fold(memory) says
+    so, the job runs on a clone. The result is adopted under `lock` only if
+    the live memory has not changed in the meantime (Memory.version); a new
+    user message sets the cancel event so the job yields immediately and its
+    result is dropped.
+    """
+
+    def __init__(
+        self,
+        *,
+        lock: threading.RLock,
+        get_memory: Callable[[], Memory],
+        needs_fold: Callable[[Memory], bool],
+        job: MaintenanceJob,
+        idle_delay_s: float = 1.0,
+        poll_s: float = 0.5,
+        on_settled: Optional[Callable[[Memory], None]] = None,
+    ):
+        self.lock = lock
+        self.get_memory = get_memory
+        self.needs_fold = needs_fold
+        self.job = job
+        self.idle_delay_s = idle_delay_s
+        self.poll_s = poll_s
+        # called with the memory a job pass left behind (adopted, or unchanged); e.g. Folder.settle
+        self.on_settled = on_settled
+        self._cancel = threading.Event()
+        self._stop = threading.Event()
+        self._last_activity = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        # memory version after our last run: nothing new to do until it changes
+        self._settled_version: Optional[int] = None
+        self.runs = 0
+        self.applied = 0
+        self.stale = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.last_error = ""
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="memory-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._cancel.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def notify_user_activity(self) -> None:
+        """Call before handling a user message: preempts any running job."""
+        self._last_activity = time.monotonic()
+        self._cancel.set()
+
+    def run_pending(self) -> bool:
+        """One maintenance attempt (also used by the thread). Returns True if a result was applied."""
+        with self.lock:
+            mem = self.get_memory()
+            if mem.version == self._settled_version or not self.needs_fold(mem):
+                return False
+            self._cancel.clear()
+            base_version = mem.version
+            work = mem.clone()
+
+        self.runs += 1
+        try:
+            self.job(work, self._cancel)
+        except Exception as exc:  # keep the worker alive; the turn path never sees this
+            self.errors += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"[:200]
+            self._settled_version = base_version
+            return False
+
+        if self._cancel.is_set():
+            self.cancelled += 1
+            return False
+        if work.version == base_version:
+            # job found nothing to do; wait for the memory to change before retrying
+            self._settled_version = base_version
+            if self.on_settled is not None:
+                self.on_settled(work)
+            return False
+        with self.lock:
+            mem = self.get_memory()
+            if mem.adopt(work, base_version=base_version):
+                self._settled_version = mem.version
+                self.applied += 1
+                if self.on_settled is not None:
+                    self.on_settled(mem)
+                return True
+        self.stale += 1
+        return False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "runs": self.runs,
+            "applied": self.applied,
+            "stale": self.stale,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            if time.monotonic() - self._last_activity < self.idle_delay_s:
+                continue
+            self.run_pending()
@@ -3,19 +3,96 @@
 from __future__ import annotations
 
 import hashlib
+import re
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import changefeed as cf
+from .anchors import AnchorIndex, parse_anchor
+from .changefeed import ChangeFeed, MemoryDelta
+from .dedup import collapse_near_duplicates
+from .fold_index import FoldIndex
+from .fuzzy import FUZZY_STATS, FuzzyMatcher
+from .history import HistoryEvent, HistoryRing
+from . import undo as ud
+from .undo import UndoLog
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .types import CommandCall
 
 MEM_START = "===MEMORY==="
 MEM_END = "===END_MEMORY==="
+DEFAULT_SHARD = "main"
+
+_PLACEHOLDER_ID = re.compile(r"\[\[FOLD:([^|\]]+)\|")
 
 
 def _now_ts() -> int:
     return int(time.time())
 
 
+class _SizedDict(dict):
+    """dict[str, str] that keeps len of its "k=v" lines current on every mutation.
+
+    on_change(op, key, value) is called after each mutation (op is "set", "delete" or "reset").
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chars = 0
+        self.on_change: Optional[Callable[[str, str, str], None]] = None
+
+    @staticmethod
+    def _line_len(k: str, v: str) -> int:
+        return len(k) + len(str(v)) + 2  # "k=v\n"
+
+    def __setitem__(self, k: str, v: str) -> None:
+        if k in self:
+            self.chars -= self._line_len(k, super().__getitem__(k))
+        super().__setitem__(k, v)
+        self.chars += self._line_len(k, v)
+        if self.on_change is not None:
+            self.on_change(cf.SET, k, str(v))
+
+    def __delitem__(self, k: str) -> None:
+        self.chars -= self._line_len(k, super().__getitem__(k))
+        super().__delitem__(k)
+        if self.on_change is not None:
+            self.on_change(cf.DELETE, k, "")
+
+    def pop(self, k: str, *default: str) -> str:  # type: ignore[override]
+        if k in self:
+            v = super().__getitem__(k)
+            del self[k]
+            return v
+        return super().pop(k, *default)
+
+    def popitem(self) -> Tuple[str, str]:
+        k, v = super().popitem()
+        self.chars -= self._line_len(k, v)
+        if self.on_change is not None:
+            self.on_change(cf.DELETE, k, "")
+        return k, v
+
+    def setdefault(self, k: str, default: str = "") -> str:  # type: ignore[override]
+        if k not in self:
+            self[k] = default
+        return super().__getitem__(k)
+
+    def update(self, *args, **kwargs) -> None:  # type: ignore[override]
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self) -> None:
+        super().clear()
+        self.chars = 0
+        if self.on_change is not None:
+            self.on_change(cf.RESET, "", "")
+
+
 @dataclass
 class Fold:
     fold_id: str
@@ -29,6 +106,20 @@ class Fold:
         return f"[[FOLD:{self.fold_id}|{self.label}]]"
 
 
+@dataclass
+class Shard:
+    """An inactive body namespace, stashed with its own folds, index and line anchors."""
+
+    body: str
+    folds: Dict[str, Fold]
+    fold_index: FoldIndex
+    anchors: AnchorIndex
+    current_fold_id: Optional[str] = None
+
+    def copy(self) -> "Shard":
+        return Shard(self.body, dict(self.folds), self.fold_index, self.anchors.copy(), self.current_fold_id)
+
+
 class Memory:
     """Holds both service sections and the editable body.
 
@@ -42,14 +133,236 @@ class Memory:
     All folding/editing commands operate ONLY on the body.
     """
 
-    def __init__(self, *, history_limit: int = 20, body: str = ""):
-        self.state: Dict[str, str] = {}
-        self.history: List[str] = []
+    def __init__(self, *, history_limit: int = 20, body: str = "", max_chars: int = 20000):
+        # bumped on every STATE/BODY/HISTORY/CLIPBOARD mutation; background jobs compare it before applying
+        self.version = 0
+        # structured deltas for frontends (see core/changefeed.py)
+        self.changes = ChangeFeed()
+        self._feed_muted = False
+        # feed position right after clone(); None for memories that are not clones
+        self._clone_seq: Optional[int] = None
+        # undo/redo of BODY, CLIPBOARD and folds per command (see core/undo.py); attached below
+        self.undo: Optional[UndoLog] = None
+        self.max_chars = max_chars
+        # per-turn values handed from step to step (raw reply, command block); never rendered
+        self.vars: Dict[str, str] = {}
+        self.state: Dict[str, str] = _SizedDict()
+        self.state.on_change = self._state_changed
         self.history_limit = history_limit
-        self.clipboard: str = ""
-        self.body: str = body
+        self._history_window_chars = 0
+        self.history = []
+        self._clipboard_chars = 0
+        self.clipboard = ""
+        self._body_chars = 0
+        # stable line IDs for anchor addressing (see core/anchors.py)
+        self._body = body
+        self.anchors = AnchorIndex(body)
+        self.body = body
         self.folds: Dict[str, Fold] = {}
+        self.fold_index = FoldIndex()
         self.current_fold_id: Optional[str] = None
+        # folds made so far; salts fold ids so a replayed session gets the same ids
+        self.fold_seq = 0
+        # body/folds/fold_index/anchors above belong to the active shard; the others are stashed here
+        self.shard = DEFAULT_SHARD
+        self.shards: Dict[str, Shard] = {}
+        self.shard_summaries: Dict[str, str] = {}
+        # approximate START/END fallback for find_range (None = exact only)
+        self.matcher: Optional[FuzzyMatcher] = FuzzyMatcher()
+        self.undo = UndoLog()
+
+    # ----------------------------
+    # Sections with running size counters
+    # ----------------------------
+
+    @property
+    def body(self) -> str:
+        return self._body
+
+    @body.setter
+    def body(self, text: str) -> None:
+        if self.undo is not None and self.undo.recording:
+            self.undo.record((ud.BODY, self._body, text), len(self._body) + len(text))
+        self.anchors.rebase(self._body, text)
+        self._body = text
+        self._body_chars = len(text)
+        self.version += 1
+        self._emit(cf.BODY, cf.RESET, text=text)
+
+    def load_body(self, text: str, anchors: AnchorIndex) -> None:
+        """Set body and its saved line IDs as they are (checkpoint resume): no rebase, no undo record."""
+        self._body = text
+        self._body_chars = len(text)
+        self.anchors = anchors
+        self.version += 1
+        self._emit(cf.BODY, cf.RESET, text=text)
+
+    def _splice(self, i: int, j: int, text: str) -> None:
+        """body[i:j] = text. Every partial BODY edit goes through here so it reaches the change feed as a range."""
+        body = self._body
+        if self.undo is not None and self.undo.recording:
+            self.undo.record((ud.SPLICE, i, body[i:j], text), (j - i) + len(text))
+        self.anchors.splice(body, i, j, text)
+        self._body = body[:i] + text + body[j:]
+        self._body_chars += len(text) - (j - i)
+        self.version += 1
+        self._emit(cf.BODY, cf.REPLACE, i, j, text)
+
+    @property
+    def clipboard(self) -> str:
+        return self._clipboard
+
+    @clipboard.setter
+    def clipboard(self, text: str) -> None:
+        if self.undo is not None and self.undo.recording:
+            self.undo.record((ud.CLIPBOARD, self._clipboard, text), len(self._clipboard) + len(text))
+        self._clipboard = text
+        self._clipboard_chars = len(text)
+        self.version += 1
+        self._emit(cf.CLIPBOARD, cf.RESET, text=text)
+
+    @property
+    def history(self) -> HistoryRing:
+        return self._history
+
+    @history.setter
+    def history(self, entries: Iterable[Union[HistoryEvent, str]]) -> None:
+        ring = HistoryRing(max(self.history_limit * 3, 100))
+        for e in entries:
+            ring.append(e if isinstance(e, HistoryEvent) else HistoryEvent("assistant", str(e), kind="cmd"))
+        self._history = ring
+        self._recount_history_window()
+        self.version += 1
+        self._emit_history_reset()
+
+    def _recount_history_window(self) -> None:
+        # O(history_limit): only the rendered tail is counted.
+        self._history_window_chars = sum(len(e.render()) + 1 for e in self._history.tail(self.history_limit))
+
+    def _history_window_deltas(self) -> List[Tuple[str, str]]:
+        # entries may span lines, so a HISTORY reset is an empty RESET followed by one APPEND per entry
+        return [(cf.RESET, "")] + [(cf.APPEND, ev.render()) for ev in self._history.tail(self.history_limit)]
+
+    # ----------------------------
+    # Change feed
+    # ----------------------------
+
+    def _emit(self, section: str, op: str, start: int = 0, end: int = 0, text: str = "") -> None:
+        if not self._feed_muted:
+            self.changes.emit(section, op, start, end, text)
+
+    def _emit_history_reset(self) -> None:
+        for op, text in self._history_window_deltas():
+            self._emit(cf.HISTORY, op, text=text)
+
+    def _state_changed(self, op: str, key: str, value: str) -> None:
+        # STATE edits count as changes too, or adopt() would overwrite them with a clone's stale copy
+        self.version += 1
+        if op == cf.SET:
+            self._emit(cf.STATE, op, text=f"{key}={value}")
+        elif op == cf.DELETE:
+            self._emit(cf.STATE, op, text=key)
+        else:
+            self._emit(cf.STATE, cf.RESET)
+
+    def changes_since(self, seq: int) -> Optional[List[MemoryDelta]]:
+        """Deltas after feed position seq, or None if they were dropped (resync with snapshot_deltas())."""
+        return self.changes.changes_since(seq)
+
+    def snapshot_deltas(self) -> List[MemoryDelta]:
+        """RESET deltas rebuilding every section; all carry the current seq, so the consumer continues from there."""
+        seq = self.changes.seq
+        state = "\n".join(f"{k}={v}" for k, v in self.state.items())
+        return [
+            MemoryDelta(seq, cf.STATE, cf.RESET, text=state),
+            *(MemoryDelta(seq, cf.HISTORY, op, text=text) for op, text in self._history_window_deltas()),
+            MemoryDelta(seq, cf.CLIPBOARD, cf.RESET, text=self.clipboard),
+            MemoryDelta(seq, cf.BODY, cf.RESET, text=self.body),
+        ]
+
+    # ----------------------------
+    # Snapshots (background maintenance)
+    # ----------------------------
+
+    def clone(self) -> "Memory":
+        """Independent copy for off-thread work. Strings, events and folds are shared (never mutated)."""
+        other = Memory(history_limit=self.history_limit, body=self.body, max_chars=self.max_chars)
+        # background jobs are not undoable steps
+        other.undo = None
+        other.state.update(self.state)
+        other.history = list(self._history)
+        other.clipboard = self.clipboard
+        other.folds = dict(self.folds)
+        other.current_fold_id = self.current_fold_id
+        other.fold_seq = self.fold_seq
+        other.matcher = FuzzyMatcher(self.matcher.cfg) if self.matcher is not None else None
+        other.anchors = self.anchors.copy()
+        other.shard = self.shard
+        other.shards = {name: sh.copy() for name, sh in self.shards.items()}
+        other.shard_summaries = dict(self.shard_summaries)
+        # fold_index starts empty: adopt() indexes only the folds the job created
+        other.version = self.version
+        # adopt() replays the clone's deltas from here instead of resetting every section
+        other._clone_seq = other.changes.seq
+        return other
+
+    def adopt(self, other: "Memory", *, base_version: int) -> bool:
+        """Take over other's sections if self has not changed since base_version. Returns success."""
+        if self.version != base_version:
+            return False
+        new_folds = [f for fid, f in other.folds.items() if fid not in self.folds]
+        if self.undo is not None and other.body != self.body:
+            # recorded offsets no longer line up with the adopted body
+            self.undo.clear()
+        replay = other.changes_since(other._clone_seq) if other._clone_seq is not None else None
+        self._feed_muted = replay is not None
+        try:
+            self.state = other.state
+            if isinstance(self.state, _SizedDict):
+                self.state.on_change = self._state_changed
+            self.history = list(other.history)
+            self.clipboard = other.clipboard
+            self.body = other.body
+            self.anchors = other.anchors
+        finally:
+            self._feed_muted = False
+        for d in replay or ():
+            self.changes.emit(d.section, d.op, d.start, d.end, d.text)
+        if replay is None:
+            self._state_changed(cf.RESET, "", "")
+            for kv in self.state.items():
+                self._state_changed(cf.SET, *kv)
+        self.folds = other.folds
+        self.current_fold_id = other.current_fold_id
+        self.fold_seq = other.fold_seq
+        self.shard = other.shard
+        self.shards = other.shards
+        self.shard_summaries = other.shard_summaries
+        for fold in new_folds:
+            self.fold_index.add(fold)
+        return True
+
+    def text_len(self) -> int:
+        """O(1) length of to_text(), exact up to trailing newlines of CLIPBOARD/BODY."""
+        fixed = (
+            len("[STATE]\nmemory_fill=%\n\n[HISTORY]\n\n[CLIPBOARD]\n\n\n")
+            + len(str(self.memory_fill_percent()))
+            + len(MEM_START) + len(MEM_END) + 3
+        )
+        if self.current_fold_id:
+            fixed += len("current_fold=\n") + len(self.current_fold_id)
+        state_chars = getattr(self.state, "chars", None)
+        if state_chars is None:  # state was replaced by a plain dict
+            state_chars = sum(len(k) + len(str(v)) + 2 for k, v in self.state.items())
+        return fixed + state_chars + self._history_window_chars + self._clipboard_chars + self._body_chars
+
+    def section_sizes(self) -> Dict[str, int]:
+        return {
+            "state": getattr(self.state, "chars", 0),
+            "history": self._history_window_chars,
+            "clipboard": self._clipboard_chars,
+            "body": self._body_chars,
+        }
 
     # ----------------------------
     # Serialization
@@ -71,8 +384,8 @@ class Memory:
 
         # [HISTORY]
         lines.append("[HISTORY]")
-        for h in self.history[-self.history_limit :]:
-            lines.append(h.rstrip("\n"))
+        for ev in self._history.tail(self.history_limit):
+            lines.append(ev.render())
         lines.append("")
 
         # [CLIPBOARD]
@@ -94,8 +407,14 @@ class Memory:
     def set_body_text(self, text: str) -> None:
         self.body = text
 
-    def memory_fill_percent(self, *, max_chars: int = 20000) -> int:
-        n = len(self.body)
+    def append_body(self, text: str) -> None:
+        n = self._body_chars
+        self._splice(n, n, text)
+
+    def memory_fill_percent(self, *, max_chars: Optional[int] = None) -> int:
+        if max_chars is None:
+            max_chars = self.max_chars
+        n = self._body_chars
         return min(100, int((n / max_chars) * 100)) if max_chars > 0 else 0
 
     # ----------------------------
@@ -103,53 +422,186 @@ class Memory:
     # ----------------------------
 
     def push_history(self, cmd_block: str) -> None:
-        self.history.append(cmd_block.rstrip("\n"))
-        if len(self.history) > max(self.history_limit * 3, 100):
-            # prevent unbounded growth
-            self.history = self.history[-max(self.history_limit * 3, 100) :]
+        self.add_event("assistant", cmd_block.rstrip("\n"), kind="cmd")
+
+    @staticmethod
+    def format_cmd_block(call: "CommandCall") -> str:
+        """<CMD> block of a parsed command, as it is logged to HISTORY."""
+        lines = ["<CMD>", call.name]
+        if call.payload_text:
+            lines.append(call.payload_text)
+        lines.append("</CMD>")
+        return "\n".join(lines)
+
+    def add_history(self, entry: Union[str, "CommandCall"]) -> None:
+        """Log a command (or a one-line note about it) to HISTORY."""
+        self.push_history(entry if isinstance(entry, str) else self.format_cmd_block(entry))
+
+    def add_event(self, role: str, text: str, kind: str = "msg") -> HistoryEvent:
+        ev = HistoryEvent(role, text, kind=kind)
+        hist = self._history
+        # ring capacity >= 3 * history_limit, so eviction never touches the rendered window
+        hist.append(ev)
+        self.version += 1
+        self._history_window_chars += len(ev.render()) + 1
+        if len(hist) > self.history_limit:
+            # entry that just scrolled out of the rendered window
+            self._history_window_chars -= len(hist[-self.history_limit - 1].render()) + 1
+        # consumers keep the last history_limit entries of their view
+        self._emit(cf.HISTORY, cf.APPEND, text=ev.render())
+        return ev
+
+    def fold_history(self, count: int, label: str) -> Optional[str]:
+        """Move the oldest `count` HISTORY entries into a fold, leaving its placeholder in their place."""
+        count = min(count, len(self._history))
+        if count <= 0:
+            return None
+        content = "\n".join(ev.render() for ev in islice(self._history, count))
+        fold = Fold(
+            fold_id=self._make_fold_id(label, content),
+            label=label,
+            content=content,
+            created_ts=_now_ts(),
+            parent_fold_id=self.current_fold_id,
+        )
+        self.folds[fold.fold_id] = fold
+        self.fold_index.add(fold)
+        self._history.drop_oldest(count)
+        self._history.appendleft(HistoryEvent("system", fold.placeholder(), kind="fold"))
+        self._recount_history_window()
+        self.version += 1
+        self._emit_history_reset()
+        return fold.fold_id
 
     def set_clipboard(self, text: str) -> None:
         self.clipboard = text
 
+    # ----------------------------
+    # Near-duplicate compaction (no LLM call)
+    # ----------------------------
+
+    def compact_history(self, *, threshold: float = 0.85) -> int:
+        """Collapse near-identical HISTORY entries onto their first occurrence.
+
+        The kept entry's count becomes the total of the entries it absorbed
+        (rendered as "(xN)"); its text is unchanged, so compacting again
+        matches it like before. Returns how many entries were removed.
+        """
+        events = list(self._history)
+        groups = collapse_near_duplicates(
+            [ev.render(with_count=False) for ev in events],
+            threshold=threshold,
+            weights=[ev.count for ev in events],
+        )
+        removed = len(events) - len(groups)
+        if removed:
+            kept: List[HistoryEvent] = []
+            for g in groups:
+                ev = events[g.index]
+                if g.count != ev.count:
+                    ev = HistoryEvent(ev.role, ev.text, kind=ev.kind, ts=ev.ts, count=g.count)
+                kept.append(ev)
+            self.history = kept
+        return removed
+
+    def compact_body(self, *, threshold: float = 0.85) -> int:
+        """Collapse near-identical BODY paragraphs (blank-line separated) onto the first one.
+
+        Paragraphs holding fold placeholders are never dropped, otherwise the
+        fold would become unreachable. Returns how many paragraphs were removed.
+        """
+        paragraphs = self.body.split("\n\n")
+        pinned = [bool(_PLACEHOLDER_ID.search(p)) for p in paragraphs]
+        groups = collapse_near_duplicates(paragraphs, threshold=threshold, keep=pinned)
+        removed = len(paragraphs) - len(groups)
+        if removed:
+            self.body = "\n\n".join(
+                g.text if g.count == 1 else f"{g.text}\n[repeated x{g.count}]" for g in groups
+            )
+        return removed
+
     # ----------------------------
     # Body editing helpers
     # ----------------------------
 
-    def find_range(self, start: str, end: str) -> Tuple[int, int]:
-        """Return (i_start, i_end_exclusive) for the first occurrence.
+    def find_token(self, token: str, pos: int = 0, *, fuzzy: bool = True) -> Optional[Tuple[int, int]]:
+        """(i, j) of the first occurrence of token in body at or after pos, None if absent.
 
-        Range is INCLUSIVE of the end token.
+        Exact first; then, if a matcher is set, whitespace/quote-normalized
+        and (unless fuzzy=False) approximate matches (may raise
+        fuzzy.AmbiguousMatch).
+        """
+        i = self.body.find(token, pos)
+        if i >= 0:
+            return i, i + len(token)
+        if self.matcher is None:
+            return None
+        m = self.matcher.find(self.body, token, pos, fuzzy=fuzzy)
+        return (m.start, m.end) if m is not None else None
+
+    def find_spans(self, start: str, end: str, *, fuzzy: bool = True) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """Matched (i, j) of the first START and of the first END after it.
+
+        Each token is looked up once, so fuzzy outcomes are counted once per command.
+        fuzzy=False allows only exact and whitespace/quote-normalized matches.
         """
         if not start or not end:
             raise ValueError("start/end cannot be empty")
         body = self.body
-        i = body.find(start)
-        if i < 0:
+        exact = start in body
+        s = self.find_token(start, fuzzy=fuzzy)
+        if s is None:
             raise ValueError("start token not found in body")
-        j = body.find(end, i + len(start))
-        if j < 0:
+        exact = exact and body.find(end, s[1]) >= 0
+        e = self.find_token(end, s[1], fuzzy=fuzzy)
+        if e is None:
             raise ValueError("end token not found in body after start")
-        j2 = j + len(end)
-        return i, j2
+        if not exact:
+            # without the fallback this command would have failed and been retried
+            FUZZY_STATS.bump("retries_saved")
+        return s, e
+
+    def find_range(self, start: str, end: str, *, fuzzy: bool = True) -> Tuple[int, int]:
+        """Return (i_start, i_end_exclusive) for the first occurrence.
+
+        Range is INCLUSIVE of the end token.
+        """
+        s, e = self.find_spans(start, end, fuzzy=fuzzy)
+        return s[0], e[1]
+
+    def line_span(self, from_id: str, to_id: str) -> Tuple[int, int]:
+        """Return (i_start, i_end_exclusive) of body lines FROM..TO (anchor IDs like "L12"), inclusive."""
+        return self.anchors.span(self.body, parse_anchor(from_id), parse_anchor(to_id))
+
+    def annotated_body(self) -> str:
+        """Body with its stable line IDs, as shown to the model in anchor addressing mode."""
+        return self.anchors.render(self.body)
+
+    def delete_offsets(self, i: int, j: int) -> None:
+        if not (0 <= i <= j <= len(self.body)):
+            raise ValueError(f"invalid range: {i}..{j}")
+        self._splice(i, j, "")
+
+    def insert_at(self, at: int, text: str) -> None:
+        if not 0 <= at <= len(self.body):
+            raise ValueError(f"invalid offset: {at}")
+        self._splice(at, at, text)
 
     def extract_range(self, start: str, end: str) -> str:
         i, j = self.find_range(start, end)
         return self.body[i:j]
 
     def delete_range(self, start: str, end: str) -> None:
-        i, j = self.find_range(start, end)
-        self.body = self.body[:i] + self.body[j:]
+        i, j = self.find_range(start, end, fuzzy=False)
+        self._splice(i, j, "")
 
     def insert_between(self, start: str, end: str, text: str, *, position: str = "after_start") -> None:
         """Insert text either after start token or before end token, but only if end occurs after start."""
-        i, j = self.find_range(start, end)
-        if position == "after_start":
-            at = i + len(start)
-        elif position == "before_end":
-            at = j - len(end)
-        else:
+        if position not in ("after_start", "before_end"):
             raise ValueError("position must be after_start or before_end")
-        self.body = self.body[:at] + text + self.body[at:]
+        s, e = self.find_spans(start, end)
+        at = s[1] if position == "after_start" else e[0]
+        self._splice(at, at, text)
 
     # ----------------------------
     # Folding
@@ -160,11 +612,20 @@ class Memory:
         h.update(label.encode("utf-8"))
         h.update(b"\n")
         h.update(content.encode("utf-8"))
-        h.update(str(_now_ts()).encode("ascii"))
+        # the same label/content folded again (after an unfold) still gets a new id
+        self.fold_seq += 1
+        h.update(str(self.fold_seq).encode("ascii"))
         return h.hexdigest()[:16]
 
     def fold_by_range(self, start: str, end: str, label: str, fold_id: Optional[str] = None) -> str:
-        content = self.extract_range(start, end)
+        i, j = self.find_range(start, end, fuzzy=False)
+        return self.fold_by_offsets(i, j, label, fold_id=fold_id)
+
+    def fold_by_offsets(self, i: int, j: int, label: str, fold_id: Optional[str] = None) -> str:
+        """Fold body[i:j] into a placeholder. Offsets are absolute body positions."""
+        if not (0 <= i < j <= len(self.body)):
+            raise ValueError(f"invalid fold range: {i}..{j}")
+        content = self.body[i:j]
         if fold_id is None:
             fold_id = self._make_fold_id(label, content)
         if fold_id in self.folds:
@@ -174,9 +635,11 @@ class Memory:
 
         fold = Fold(fold_id=fold_id, label=label, content=content, created_ts=_now_ts(), parent_fold_id=self.current_fold_id)
         self.folds[fold_id] = fold
+        self.fold_index.add(fold)
+        if self.undo is not None:
+            self.undo.record((ud.FOLD, fold))
         # Replace the extracted content with placeholder
-        i, j = self.find_range(start, end)
-        self.body = self.body[:i] + fold.placeholder() + self.body[j:]
+        self._splice(i, j, fold.placeholder())
         return fold_id
 
     def unfold(self, fold_id: str) -> None:
@@ -184,10 +647,21 @@ class Memory:
         if not fold:
             raise ValueError(f"unknown fold_id: {fold_id}")
         ph = fold.placeholder()
-        if ph not in self.body:
+        i = self.body.find(ph)
+        if i < 0:
             # already unfolded or not in this body
             return
-        self.body = self.body.replace(ph, fold.content, 1)
+        self._splice(i, i + len(ph), fold.content)
+
+    def toggle_fold(self, fold_id: str) -> None:
+        """Unfold if the placeholder is in body, otherwise fold the content back."""
+        fold = self.folds.get(fold_id)
+        if not fold:
+            raise ValueError(f"unknown fold_id: {fold_id}")
+        if fold.placeholder() in self.body:
+            self.unfold(fold_id)
+        else:
+            self.refold(fold_id)
 
     def refold(self, fold_id: str) -> None:
         """Fold back a fold that was previously unfolded (replace exact content by placeholder)."""
@@ -197,7 +671,78 @@ class Memory:
         ph = fold.placeholder()
         if ph in self.body:
             return
-        if fold.content not in self.body:
+        i = self.body.find(fold.content)
+        if i < 0:
             raise ValueError("cannot refold: content not found in current body")
-        self.body = self.body.replace(fold.content, ph, 1)
+        self._splice(i, i + len(fold.content), ph)
+
+    def collapsed_fold_ids(self) -> List[str]:
+        """Folds whose placeholder is currently present in the body."""
+        return [fid for fid in _PLACEHOLDER_ID.findall(self.body) if fid in self.folds]
 
+    def relevant_folds(self, query: str, *, top_k: int = 3, budget_tokens: int = 800) -> List[Tuple[Fold, str]]:
+        """Collapsed folds ranked by BM25 against query, content excerpted to budget_tokens."""
+        collapsed = self.collapsed_fold_ids()
+        if not collapsed:
+            return []
+        return self.fold_index.select(query, self.folds, top_k=top_k, budget_tokens=budget_tokens, only=collapsed)
+
+    # ----------------------------
+    # Shards (named body namespaces)
+    # ----------------------------
+
+    def shard_names(self) -> List[str]:
+        return sorted({self.shard, *self.shards})
+
+    def switch_shard(self, name: str) -> bool:
+        """Make shard `name` the active body (created empty if new). False if it already is.
+
+        Only the active shard's body and folds are visible to edit commands
+        and to the prompt; the others keep their state untouched.
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("shard name cannot be empty")
+        if name == self.shard:
+            return False
+        if self.undo is not None:
+            self.undo.record((ud.SHARD, self.shard, name))
+        self.shards[self.shard] = Shard(self._body, self.folds, self.fold_index, self.anchors, self.current_fold_id)
+        target = self.shards.pop(name, None)
+        if target is None:
+            target = Shard("", {}, FoldIndex(), AnchorIndex())
+        self.shard = name
+        self._body = target.body
+        self._body_chars = len(target.body)
+        self.folds = target.folds
+        self.fold_index = target.fold_index
+        self.anchors = target.anchors
+        self.current_fold_id = target.current_fold_id
+        self.version += 1
+        self._emit(cf.BODY, cf.RESET, text=target.body)
+        return True
+
+    @contextmanager
+    def in_shard(self, name: str) -> Iterator["Memory"]:
+        """Temporarily make `name` the active shard."""
+        prev = self.shard
+        self.switch_shard(name)
+        try:
+            yield self
+        finally:
+            self.switch_shard(prev)
+
+    def shard_summary(self, name: str, width: int = 80) -> str:
+        """One line for shard `name`: its summary if set, else its first non-empty body line."""
+        if name == self.shard:
+            body, n_folds = self._body, len(self.folds)
+        else:
+            sh = self.shards[name]
+            body, n_folds = sh.body, len(sh.folds)
+        text = self.shard_summaries.get(name) or next((ln.strip() for ln in body.splitlines() if ln.strip()), "(empty)")
+        if len(text) > width:
+            text = text[: width - 3] + "..."
+        return f"{text} ({len(body)} chars, {n_folds} folds)"
+
+    def other_shard_lines(self, width: int = 80) -> List[str]:
+        return [f"{name}: {self.shard_summary(name, width)}" for name in sorted(self.shards)]
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, ContextManager, Dict, Iterator, Optional, Tuple
+
+from .anchors import AnchorIndex
+from .fold_index import FoldIndex
+from .fuzzy import FuzzyConfig, FuzzyMatcher
+from .history import HistoryEvent
+from .memory import Fold, Memory, Shard
+
+# Saved Memory, in two files next to each other:
+#   <path>               manifest (JSON): STATE, HISTORY, CLIPBOARD, every
+#                        shard's body, line IDs, fold metadata and fold index
+#                        postings, plus whatever the caller adds (core/checkpoint.py
+#                        adds the Process config and turn position)
+#   <path>.<gen>.folds   fold contents, UTF-8, addressed by (offset, length)
+# The fold store is append-only: a save writes only the folds created since
+# the last one, and starts a new generation when most of it is dead. The
+# manifest is replaced atomically after the store is synced, so a crash at
+# any point leaves the previous save readable.
+# Loading reads only the manifest; folds come back as PagedFold and read their
+# content from the store the first time something asks for it.
+CHECKPOINT_VERSION = 1
+
+FoldKey = Tuple[str, str]  # (shard, fold_id)
+Manifest = Dict[str, Any]
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+class FoldStore:
+    """Read side of one fold store file. Counts what a load paged in later."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_ms = 0.0
+
+    def read(self, offset: int, length: int) -> str:
+        t0 = time.perf_counter()
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        if len(data) != length:
+            raise CheckpointError(f"fold store {self.path} is truncated")
+        with self._lock:
+            self.loads += 1
+            self.load_ms += (time.perf_counter() - t0) * 1000.0
+        return data.decode("utf-8")
+
+
+class PagedFold(Fold):
+    """Fold restored from a save; content is read from the fold store on first access."""
+
+    def __init__(
+        self,
+        fold_id: str,
+        label: str,
+        created_ts: int,
+        parent_fold_id: Optional[str],
+        store: FoldStore,
+        offset: int,
+        length: int,
+    ):
+        self.fold_id = fold_id
+        self.label = label
+        self.created_ts = created_ts
+        self.parent_fold_id = parent_fold_id
+        self.store = store
+        self.offset = offset
+        self.length = length
+        self._content: Optional[str] = None
+
+    @property  # type: ignore[override]
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.store.read(self.offset, self.length)
+        return self._content
+
+    @content.setter
+    def content(self, text: str) -> None:
+        self._content = text
+
+    @property
+    def loaded(self) -> bool:
+        return self._content is not None
+
+    def __repr__(self) -> str:
+        return f"PagedFold(fold_id={self.fold_id!r}, label={self.label!r}, loaded={self.loaded})"
+
+
+@dataclass
+class SaveInfo:
+    path: str
+    folds_written: int
+    bytes_written: int
+    compacted: bool
+    ms: float
+
+
+@dataclass
+class ResumeInfo:
+    manifest_bytes: int
+    folds: int  # all shards
+    read_ms: float
+    build_ms: float
+
+    @property
+    def total_ms(self) -> float:
+        return self.read_ms + self.build_ms
+
+    def summary(self) -> str:
+        return (
+            f"resumed in {self.total_ms:.1f} ms (read {self.read_ms:.1f}, build {self.build_ms:.1f}): "
+            f"{self.manifest_bytes} manifest bytes, {self.folds} folds paged on demand"
+        )
+
+
+@dataclass
+class LoadedMemory:
+    mem: Memory
+    # the whole manifest, for callers that saved extra keys next to "memory"
+    manifest: Manifest
+    checkpointer: "MemoryCheckpointer"
+    info: ResumeInfo
+
+
+# ----------------------------
+# Atomic writes
+# ----------------------------
+
+
+def _fsync_dir(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # not supported (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".ckpt.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+# ----------------------------
+# Save
+# ----------------------------
+
+
+class MemoryCheckpointer:
+    """Saves a Memory to `path`, appending only new folds to the fold store.
+
+    Remembers where each fold already is in the store, so keep one instance
+    per path (load_memory returns one for the path it read). Not meant for
+    several writers on the same path. Folds are keyed by (shard, fold_id),
+    since shards may reuse an ID, and an entry is only reused while it holds
+    the very same Fold object (an ID freed by undo and folded again gets new
+    content).
+    """
+
+    def __init__(self, path: str, *, compact_min_bytes: int = 1 << 20):
+        self.path = os.path.abspath(path)
+        self.compact_min_bytes = compact_min_bytes
+        self._gen = 0
+        self._store_size = 0
+        self._stored: Dict[FoldKey, Tuple[Fold, int, int]] = {}
+        self._save_lock = threading.Lock()
+
+    def _store_path(self, gen: int) -> str:
+        return f"{self.path}.{gen}.folds"
+
+    def save_memory(
+        self,
+        mem: Memory,
+        *,
+        lock: Optional[ContextManager[Any]] = None,
+        extra: Optional[Callable[[], Manifest]] = None,
+    ) -> SaveInfo:
+        """Save mem. Only the snapshot runs under lock; extra() is called there too and its keys join the manifest."""
+        t0 = time.perf_counter()
+        with self._save_lock:
+            with lock if lock is not None else nullcontext():
+                memory, live = _snapshot(mem)
+                manifest: Manifest = {"version": CHECKPOINT_VERSION, "saved_at": time.time()}
+                if extra is not None:
+                    manifest.update(extra())
+                manifest["memory"] = memory
+            compacted, written, nbytes = self._write_folds(live)
+            manifest["store"] = {"file": os.path.basename(self._store_path(self._gen)), "size": self._store_size}
+            for shard, meta in _fold_metas(manifest):
+                _, offset, length = self._stored[(shard, meta["id"])]
+                meta["at"] = [offset, length]
+            data = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            _write_atomic(self.path, data)
+            self._remove_stale_stores()
+        return SaveInfo(self.path, written, nbytes + len(data), compacted, (time.perf_counter() - t0) * 1000.0)
+
+    def _is_stored(self, key: FoldKey, fold: Fold) -> bool:
+        entry = self._stored.get(key)
+        return entry is not None and entry[0] is fold
+
+    def _write_folds(self, live: Dict[FoldKey, Fold]) -> Tuple[bool, int, int]:
+        """Put every live fold into the store; returns (compacted, folds written, bytes written)."""
+        live_bytes = sum(self._stored[key][2] for key, fold in live.items() if self._is_stored(key, fold))
+        dead = self._store_size - live_bytes
+        compact = self._gen == 0 or not os.path.exists(self._store_path(self._gen)) or (
+            dead > live_bytes and dead > self.compact_min_bytes
+        )
+        if compact:
+            # a fresh file; writing a paged fold loads it, so the old generation can go after the manifest
+            todo = list(live.items())
+            self._gen = self._last_gen() + 1
+            self._stored = {}
+            mode = "wb"
+        else:
+            todo = [(key, fold) for key, fold in live.items() if not self._is_stored(key, fold)]
+            mode = "ab"
+        if not todo and not compact:
+            return False, 0, 0
+        written = 0
+        with open(self._store_path(self._gen), mode) as f:
+            f.seek(0, os.SEEK_END)  # after a torn append too: nothing references those bytes
+            pos = f.tell()
+            for key, fold in todo:
+                data = fold.content.encode("utf-8")
+                f.write(data)
+                self._stored[key] = (fold, pos, len(data))
+                pos += len(data)
+                written += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._store_size = pos
+        if compact:
+            _fsync_dir(os.path.dirname(self.path))
+        return compact, len(todo), written
+
+    def _store_files(self) -> Iterator[Tuple[int, str]]:
+        directory = os.path.dirname(self.path)
+        prefix = os.path.basename(self.path) + "."
+        for name in os.listdir(directory):
+            gen = name[len(prefix):-len(".folds")]
+            if name.startswith(prefix) and name.endswith(".folds") and gen.isdigit():
+                yield int(gen), os.path.join(directory, name)
+
+    def _last_gen(self) -> int:
+        return max([self._gen, *(gen for gen, _ in self._store_files())])
+
+    def _remove_stale_stores(self) -> None:
+        for gen, path in list(self._store_files()):
+            if gen != self._gen:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
+def _fold_meta(fold: Fold) -> Dict[str, Any]:
+    return {"id": fold.fold_id, "label": fold.label, "ts": fold.created_ts, "parent": fold.parent_fold_id}
+
+
+def _shard_state(
+    body: str, folds: Dict[str, Fold], index: FoldIndex, anchors: AnchorIndex, current: Optional[str]
+) -> Dict[str, Any]:
+    return {
+        "body": body,
+        "anchors": anchors.to_state(),
+        "folds": [_fold_meta(f) for f in folds.values()],
+        "index": index.to_state(),
+        "current_fold": current,
+    }
+
+
+def _fold_metas(manifest: Manifest) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(shard name, fold meta) for every fold of every shard."""
+    mem = manifest["memory"]
+    for name, sh in [(mem["shard"], mem["active"]), *mem["shards"].items()]:
+        for meta in sh["folds"]:
+            yield name, meta
+
+
+def _snapshot(mem: Memory) -> Tuple[Dict[str, Any], Dict[FoldKey, Fold]]:
+    """Memory section of the manifest (without store offsets) and every fold of every shard."""
+    live: Dict[FoldKey, Fold] = {(mem.shard, fid): f for fid, f in mem.folds.items()}
+    for name, sh in mem.shards.items():
+        live.update(((name, fid), f) for fid, f in sh.folds.items())
+    memory = {
+        "history_limit": mem.history_limit,
+        "max_chars": mem.max_chars,
+        "version": mem.version,
+        "fold_seq": mem.fold_seq,
+        "state": dict(mem.state),
+        "history": [[ev.role, ev.kind, ev.text, ev.ts, ev.count] for ev in mem.history],
+        "clipboard": mem.clipboard,
+        "matcher": asdict(mem.matcher.cfg) if mem.matcher is not None else None,
+        "shard": mem.shard,
+        "shard_summaries": dict(mem.shard_summaries),
+        "active": _shard_state(mem.body, mem.folds, mem.fold_index, mem.anchors, mem.current_fold_id),
+        "shards": {
+            name: _shard_state(sh.body, sh.folds, sh.fold_index, sh.anchors, sh.current_fold_id)
+            for name, sh in mem.shards.items()
+        },
+    }
+    return memory, live
+
+
+# ----------------------------
+# Load
+# ----------------------------
+
+
+def _restore_shard(state: Dict[str, Any], store: FoldStore) -> Shard:
+    folds: Dict[str, Fold] = {}
+    for m in state["folds"]:
+        offset, length = m["at"]
+        folds[m["id"]] = PagedFold(m["id"], m["label"], m["ts"], m["parent"], store, offset, length)
+    return Shard(
+        state["body"],
+        folds,
+        FoldIndex.from_state(state["index"]),
+        AnchorIndex.from_state(state["anchors"]),
+        state["current_fold"],
+    )
+
+
+def load_memory(path: str, *, checkpointer: Optional[MemoryCheckpointer] = None) -> LoadedMemory:
+    """Rebuild a Memory from a save without reading any fold content.
+
+    checkpointer (default: a new MemoryCheckpointer for path) is primed with
+    the store position, so its next save appends to the same store.
+    """
+    t0 = time.perf_counter()
+    path = os.path.abspath(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        manifest = json.loads(raw)
+    except ValueError as exc:
+        raise CheckpointError(f"{path}: not a checkpoint ({exc})") from None
+    if manifest.get("version") != CHECKPOINT_VERSION:
+        raise CheckpointError(f"{path}: unsupported checkpoint version {manifest.get('version')!r}")
+    t1 = time.perf_counter()
+
+    store_info = manifest["store"]
+    store = FoldStore(os.path.join(os.path.dirname(path), store_info["file"]))
+    m = manifest["memory"]
+    mem = Memory(history_limit=m["history_limit"], max_chars=m["max_chars"])
+    mem.state.update(m["state"])
+    mem.history = [
+        HistoryEvent(role, text, kind=kind, ts=ts, count=rest[0] if rest else 1)
+        for role, kind, text, ts, *rest in m["history"]
+    ]
+    mem.clipboard = m["clipboard"]
+    mem.matcher = FuzzyMatcher(FuzzyConfig(**m["matcher"])) if m["matcher"] is not None else None
+    active = _restore_shard(m["active"], store)
+    mem.load_body(active.body, active.anchors)
+    mem.folds = active.folds
+    mem.fold_index = active.fold_index
+    mem.current_fold_id = active.current_fold_id
+    mem.shard = m["shard"]
+    mem.shards = {name: _restore_shard(sh, store) for name, sh in m["shards"].items()}
+    mem.shard_summaries = dict(m["shard_summaries"])
+    mem.version = m["version"]
+    mem.fold_seq = m["fold_seq"]
+
+    ckpt = checkpointer if checkpointer is not None else MemoryCheckpointer(path)
+    ckpt._gen = int(store_info["file"].rsplit(".", 2)[-2])
+    ckpt._store_size = store_info["size"]
+    # the restored PagedFold objects are what the next save compares against
+    shards = {mem.shard: mem.folds, **{name: sh.folds for name, sh in mem.shards.items()}}
+    ckpt._stored = {}
+    n_folds = 0
+    for shard, meta in _fold_metas(manifest):
+        offset, length = meta["at"]
+        ckpt._stored[(shard, meta["id"])] = (shards[shard][meta["id"]], offset, length)
+        n_folds += 1
+    t2 = time.perf_counter()
+    info = ResumeInfo(len(raw), n_folds, (t1 - t0) * 1000.0, (t2 - t1) * 1000.0)
+    return LoadedMemory(mem, manifest, ckpt, info)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from utils.log import get_logger
+from utils.text import CHARS_PER_TOKEN, clamp, estimate_tokens
+
+from .fold_index import excerpt, tokenize
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .memory import Fold, Memory
+
+log = get_logger("packer")
+
+
+@dataclass(frozen=True)
+class PackConfig:
+    """Token budget and scoring weights for PromptPacker.
+
+    A fold is expanded only if its value (relevance_weight * BM25 score
+    normalized to the best hit + recency_weight * 1/(1 + age rank)) reaches
+    min_value, so with the defaults recency alone never expands a fold.
+    History entry k (0 = newest) is worth history_weight * history_decay**k
+    and history is always a contiguous run of the newest entries.
+    """
+
+    budget_tokens: int
+    max_expanded: int = 3  # 0 disables fold expansion
+    max_fold_tokens: int = 800  # larger folds are excerpted around the query terms
+    max_history: int = 20
+    relevance_weight: float = 1.0
+    recency_weight: float = 0.3
+    min_value: float = 0.35
+    history_weight: float = 0.5
+    history_decay: float = 0.85
+    max_candidates: int = 12
+    # DP granularity; item costs are rounded up to it, so the selection never exceeds the budget
+    quantum: int = 8
+    max_cells: int = 512
+
+
+@dataclass(frozen=True)
+class PackItem:
+    kind: str  # "fold" | "history"
+    key: str
+    text: str  # as rendered into the prompt, separator included
+    tokens: int
+    value: float
+
+
+@dataclass
+class PackedPrompt:
+    body: str
+    folds: List[Tuple["Fold", str]]  # expanded folds with the text shown for them
+    history: List[str]  # oldest first
+    tokens: int  # upper bound for body + folds + history
+    available: int  # what was left for them after the fixed part
+    body_truncated: bool = False
+    skipped_folds: List[str] = field(default_factory=list)
+    skipped_history: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"packed {self.tokens}/{self.available} tok: {len(self.folds)} folds expanded, "
+            f"{len(self.history)} history ({self.skipped_history} dropped), "
+            f"{len(self.skipped_folds)} folds left collapsed"
+            + (", body truncated" if self.body_truncated else "")
+        )
+
+
+def fit(text: str, max_tokens: int, count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """text cut to at most max_tokens (clamp's "...(+N)" marks the cut); "" if nothing fits."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    text = clamp(text, max_tokens * CHARS_PER_TOKEN)
+    # count_tokens may be a real tokenizer, denser than CHARS_PER_TOKEN; every pass is strictly shorter
+    while text and count_tokens(text) > max_tokens:
+        limit = len(text) - CHARS_PER_TOKEN * 8
+        text = clamp(text, limit) if limit > 0 else ""
+    return text
+
+
+FOLDS_HEADER = "\nRELEVANT FOLDS (auto-expanded, read-only; UNFOLD not needed to read them):\n\n"
+HISTORY_HEADER = "\nRECENT HISTORY (oldest first):\n"
+
+
+class PromptPacker:
+    """Chooses what goes into the prompt under a hard token budget, without touching Memory.
+
+    The body (with its fold placeholders) is mandatory and is clamped if it
+    alone does not fit. The rest of the budget goes to a knapsack over the
+    collapsed folds (0/1 items, at most max_expanded) and one multiple-choice
+    group for history (the newest k entries, for one k), maximizing value.
+    """
+
+    def __init__(self, cfg: PackConfig, count_tokens: Callable[[str], int] = estimate_tokens):
+        self.cfg = cfg
+        self.count_tokens = count_tokens
+
+    def pack(self, mem: "Memory", query: str, *, fixed_tokens: int, body: Optional[str] = None) -> PackedPrompt:
+        """fixed_tokens: cost of everything the caller renders around the packed sections.
+
+        body: the body as it should be shown (e.g. with line anchors); mem.body by default.
+        """
+        cfg = self.cfg
+        available = max(0, cfg.budget_tokens - fixed_tokens)
+        headers = self.count_tokens(FOLDS_HEADER) + self.count_tokens(HISTORY_HEADER)
+
+        body = (mem.body if body is None else body).rstrip("\n")
+        body_tokens = self.count_tokens(body)
+        room = available - headers
+        if room <= 0 and body_tokens:
+            # the caller's own text already fills the budget: BODY cannot be shown at all
+            log.warning(
+                "pack_no_room_for_body",
+                budget_tokens=cfg.budget_tokens,
+                fixed_tokens=fixed_tokens,
+                body_tokens=body_tokens,
+            )
+        if body_tokens > room:
+            body = fit(body, room, self.count_tokens)
+            return PackedPrompt(
+                body=body,
+                folds=[],
+                history=[],
+                tokens=self.count_tokens(body),
+                available=available,
+                body_truncated=True,
+                skipped_folds=mem.collapsed_fold_ids(),
+                skipped_history=min(len(mem.history), cfg.max_history),
+            )
+
+        folds = self._fold_items(mem, query)
+        history = self._history_items(mem, query)
+        capacity = room - body_tokens
+        chosen, k = select(folds, history, capacity, max_items=cfg.max_expanded, quantum=self._quantum(capacity))
+        picked = [folds[i] for i in chosen]
+        tokens = body_tokens + sum(it.tokens for it in picked) + sum(it.tokens for it in history[:k])
+        if picked or k:
+            tokens += headers
+
+        by_id = mem.folds
+        shown = {it.key for it in picked}
+        return PackedPrompt(
+            body=body,
+            folds=[(by_id[it.key], it.text.split("\n", 1)[1].rstrip("\n")) for it in picked],
+            history=[it.text.rstrip("\n") for it in reversed(history[:k])],
+            tokens=tokens,
+            available=available,
+            skipped_folds=[fid for fid in mem.collapsed_fold_ids() if fid not in shown],
+            skipped_history=len(history) - k,
+        )
+
+    # ----------------------------
+    # Candidates
+    # ----------------------------
+
+    def _quantum(self, capacity: int) -> int:
+        return max(self.cfg.quantum, math.ceil(max(capacity, 1) / self.cfg.max_cells))
+
+    def _fold_items(self, mem: "Memory", query: str) -> List[PackItem]:
+        cfg = self.cfg
+        if cfg.max_expanded < 1 or not query.strip():
+            return []
+        collapsed = mem.collapsed_fold_ids()
+        if not collapsed:
+            return []
+        allowed = set(collapsed)
+        hits = mem.fold_index.query(query, top_k=len(allowed), only=allowed)
+        if not hits:
+            return []
+        top = hits[0].score or 1.0
+        # age rank among the collapsed folds, newest = 0; folds keep creation order
+        # (created_ts is wall-clock seconds, so it ties and differs between replays)
+        made = {fid: n for n, fid in enumerate(mem.folds)}
+        newest = sorted(collapsed, key=lambda fid: -made[fid])
+        age = {fid: r for r, fid in enumerate(newest)}
+        terms = set(tokenize(query))
+
+        items: List[PackItem] = []
+        for h in hits:
+            value = cfg.relevance_weight * h.score / top + cfg.recency_weight / (1 + age[h.fold_id])
+            if value < cfg.min_value:
+                continue
+            fold = mem.folds[h.fold_id]
+            snippet = fold.content
+            if self.count_tokens(snippet) > cfg.max_fold_tokens:
+                snippet = excerpt(snippet, terms, cfg.max_fold_tokens * CHARS_PER_TOKEN)
+            text = f"{fold.placeholder()}\n{snippet}\n\n"
+            items.append(PackItem("fold", fold.fold_id, text, self.count_tokens(text), value))
+        items.sort(key=lambda it: -it.value)
+        return items[: cfg.max_candidates]
+
+    def _history_items(self, mem: "Memory", query: str) -> List[PackItem]:
+        """Newest first."""
+        cfg = self.cfg
+        events = list(mem.history.tail(cfg.max_history))[::-1]
+        # the final user message is sent as its own turn
+        if events and events[0].role == "user" and events[0].text == query:
+            events = events[1:]
+        items = []
+        for k, ev in enumerate(events):
+            text = ev.render() + "\n"
+            value = cfg.history_weight * cfg.history_decay ** k
+            items.append(PackItem("history", str(k), text, self.count_tokens(text), value))
+        return items
+
+
+def select(
+    folds: Sequence[PackItem],
+    history: Sequence[PackItem],
+    capacity: int,
+    *,
+    max_items: int,
+    quantum: int = 8,
+) -> Tuple[List[int], int]:
+    """Best (fold indexes, number of newest history entries) within capacity tokens.
+
+    best[n][c] is the top value using at most n folds and c cells; costs are
+    rounded up to whole cells of `quantum` tokens, so the chosen set's exact
+    cost is <= capacity. O(len(folds) * max_items * capacity / quantum).
+    """
+    cells = max(0, capacity) // quantum
+    if cells == 0:
+        return [], 0
+
+    def cost(it: PackItem) -> int:
+        return -(-it.tokens // quantum)
+
+    n_max = min(max_items, len(folds))
+    neg = float("-inf")
+    best = [[0.0] * (cells + 1)] + [[neg] * (cells + 1) for _ in range(n_max)]
+    take: List[Dict[Tuple[int, int], bool]] = []
+    for it in folds:
+        w = cost(it)
+        chosen: Dict[Tuple[int, int], bool] = {}
+        if w <= cells:
+            for n in range(n_max, 0, -1):
+                prev, cur = best[n - 1], best[n]
+                for c in range(cells, w - 1, -1):
+                    v = prev[c - w] + it.value
+                    if v > cur[c]:
+                        cur[c] = v
+                        chosen[(n, c)] = True
+        take.append(chosen)
+
+    # history: cumulative cost/value of the newest k entries
+    hist_cost, hist_value = [0], [0.0]
+    for it in history:
+        hist_cost.append(hist_cost[-1] + cost(it))
+        hist_value.append(hist_value[-1] + it.value)
+
+    top, top_n, top_c, top_k = neg, 0, 0, 0
+    for k in range(len(hist_cost)):
+        left = cells - hist_cost[k]
+        if left < 0:
+            break
+        for n in range(n_max + 1):
+            v = best[n][left]
+            if v + hist_value[k] > top:
+                top, top_n, top_c, top_k = v + hist_value[k], n, left, k
+
+    # walk the items backwards; take[i] marks the cells that item i improved when it was added
+    picked: List[int] = []
+    n, c = top_n, top_c
+    for i in range(len(folds) - 1, -1, -1):
+        if n == 0:
+            break
+        if take[i].get((n, c)):
+            picked.append(i)
+            n, c = n - 1, c - cost(folds[i])
+    picked.reverse()
+    return picked, top_k
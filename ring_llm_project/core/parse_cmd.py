@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List
 import re
 
 
@@ -35,7 +35,6 @@ class CommandParser:
             raise CommandParseError("Empty command block")
 
         # find header line
-        name: Optional[str] = None
         i = 0
         while i < len(lines) and not lines[i].strip():
             i += 1
@@ -49,22 +48,32 @@ class CommandParser:
         if i >= len(lines):
             raise CommandParseError("Missing command name")
 
-        name = lines[i].strip()
-        if not name:
-            raise CommandParseError("Empty command name")
-        i += 1
+        end = i
+        while end < len(lines) and not self._end.match(lines[end]):
+            end += 1
+        if end >= len(lines):
+            raise CommandParseError("Missing </CMD>")
+        return self._parse_lines(lines[i:end], block)
 
-        payload_lines = []
-        while i < len(lines):
-            line = lines[i].rstrip("\n")
-            if self._end.match(line):
-                break
-            payload_lines.append(lines[i])
-            i += 1
+    def parse_inner(self, inner: str, raw_block: str) -> ParsedCommand:
+        """Parse the content between the markers of a block the scanner already delimited.
 
-        if i >= len(lines) or not self._end.match(lines[i]):
-            raise CommandParseError("Missing </CMD>")
+        The markers are not searched again, so any configured pair works
+        (<CMD>...</CMD>, §§CMD_START§§...§§CMD_END§§).
+        """
+        lines = inner.splitlines()
+        while lines and not lines[0].strip():
+            lines.pop(0)
+        if not lines:
+            raise CommandParseError("Missing command name")
+        return self._parse_lines(lines, raw_block)
 
-        payload = "\n".join(payload_lines).rstrip()
+    @staticmethod
+    def _parse_lines(lines: List[str], raw_block: str) -> ParsedCommand:
+        # lines[0] is the command name, the rest is payload
+        name = lines[0].strip()
+        if not name:
+            raise CommandParseError("Empty command name")
+        payload = "\n".join(lines[1:]).rstrip()
         args: Dict[str, str] = {"payload": payload, "text": payload}
-        return ParsedCommand(name=name, args=args, raw_block=block)
+        return ParsedCommand(name=name, args=args, raw_block=raw_block)
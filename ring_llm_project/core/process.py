@@ -1,14 +1,38 @@
 from __future__ import annotations
+import threading
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional
 
 from .behavior import BehaviorModel
+from .constraints import PARSE_STATS
+from .deadline import DEADLINE_METRICS, Deadline
+from .maintenance import MaintenanceWorker
 from .memory import Memory
+from .profiling import Profiler
+from .replay import SessionRecorder
+from .types import ExecutionContext
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .checkpoint import Checkpointer
 
 
 @dataclass
 class ProcessConfig:
     control_llm_key: str
     auto_fold_keep_last_events: int = 30
+    # collapse near-duplicate HISTORY entries before each auto-fold pass
+    auto_fold_compact_history: bool = False
+    # fold in a MaintenanceWorker between turns instead of inline in FoldStep
+    background_fold: bool = False
+    # wall-clock budget per turn (None = unbounded); see ExecutionContext.deadline
+    turn_budget_s: Optional[float] = None
+    # cheaper model for the rest of a turn that is about to run out of time
+    fallback_llm_key: Optional[str] = None
+    fallback_below_s: float = 10.0
+    # control model context window; PromptBuilder packs the prompt to fit it
+    context_tokens: int = 8192
+    # how range commands address BODY: "substring" or opt-in "anchors" (line IDs); see PromptConfig
+    addressing: str = "substring"
 
 
 class Process:
@@ -17,13 +41,56 @@ class Process:
         cfg: ProcessConfig,
         mem: Memory,
         behavior: BehaviorModel,
+        maintenance: Optional[MaintenanceWorker] = None,
+        recorder: Optional[SessionRecorder] = None,
+        profiler: Optional[Profiler] = None,
     ):
         self.cfg = cfg
         self.mem = mem
         self.behavior = behavior
+        # held by turns and by the maintenance worker while it adopts results
+        self.lock = threading.RLock()
+        self.maintenance = maintenance
+        # set when the session is being recorded for replay (see core/replay.py)
+        self.recorder = recorder
+        self.profiler = profiler
+        # position in the session, saved by checkpoints: completed turns, and the
+        # user message whose turn has not finished yet (re-run after a resume)
+        self.turns = 0
+        self.pending_user: Optional[str] = None
+        # set by the first checkpoint save or by a resume; knows what the fold store already holds
+        self.checkpointer: Optional["Checkpointer"] = None
 
     def handle_user_message(self, text: str) -> None:
-        self.mem.add_event("user", text, kind="msg")
+        if self.maintenance is not None:
+            self.maintenance.notify_user_activity()
+        if self.recorder is not None:
+            self.recorder.user(text)
+        with self.lock:
+            self.mem.add_event("user", text, kind="msg")
+            self.pending_user = text
 
     def run_once(self) -> None:
-        self.mem = self.behavior.run(self.mem)
+        deadline = Deadline.after(self.cfg.turn_budget_s) if self.cfg.turn_budget_s else None
+        ctx = ExecutionContext(llm_pool={}, deadline=deadline, profiler=self.profiler)
+        if self.profiler is not None:
+            self.profiler.start_turn()
+        try:
+            with self.lock:
+                self.mem = self.behavior.run(self.mem, ctx)
+                self.turns += 1
+                self.pending_user = None
+        finally:
+            PARSE_STATS.finish_turn()
+            if self.profiler is not None:
+                self.profiler.end_turn()
+        if deadline is not None:
+            DEADLINE_METRICS.finish_turn(deadline)
+
+    def close(self) -> List[str]:
+        """End of session: stop the maintenance worker and finish the profiler. Returns profile files written."""
+        if self.maintenance is not None:
+            self.maintenance.stop()
+        if self.profiler is not None:
+            return self.profiler.finish()
+        return []
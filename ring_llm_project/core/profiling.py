@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Nothing here runs unless DebugFlags.profile_cpu / profile_alloc are set: the
+# process only creates a Profiler then, and every hook checks ctx.profiler for None.
+
+
+@dataclass
+class SectionStats:
+    calls: int = 0
+    time_ms: float = 0.0
+    # time spent in nested sections (self time = time_ms - child_ms)
+    child_ms: float = 0.0
+    alloc_kb: float = 0.0
+
+
+@dataclass
+class TurnProfile:
+    turn: int
+    wall_ms: float
+    # "step:FoldStep;cmd:FOLD" -> stats (nesting joined with ';')
+    sections: Dict[str, SectionStats]
+    # (function, ncalls, tottime_ms, cumtime_ms), by tottime; session totals so far with scope="session"
+    top_functions: List[Tuple[str, int, float, float]] = field(default_factory=list)
+    # (file:line, size_kb, count) allocated during the turn
+    top_allocations: List[Tuple[str, float, int]] = field(default_factory=list)
+    peak_kb: float = 0.0
+    files: List[str] = field(default_factory=list)
+
+    def format(self, top: int = 10) -> str:
+        lines = [f"turn {self.turn}: {self.wall_ms:.1f} ms wall" + (f", peak {self.peak_kb:.0f} KiB" if self.peak_kb else "")]
+        if self.sections:
+            lines.append("  by step/command (self ms / total ms / calls / alloc KiB):")
+            ranked = sorted(self.sections.items(), key=lambda kv: kv[1].time_ms - kv[1].child_ms, reverse=True)
+            for path, st in ranked[:top]:
+                lines.append(
+                    f"    {st.time_ms - st.child_ms:9.2f} {st.time_ms:9.2f} {st.calls:5d} {st.alloc_kb:9.1f}  {path}"
+                )
+        if self.top_functions:
+            lines.append("  hottest functions (tottime ms / cumtime ms / calls):")
+            for name, ncalls, tt, ct in self.top_functions[:top]:
+                lines.append(f"    {tt:9.2f} {ct:9.2f} {ncalls:7d}  {name}")
+        if self.top_allocations:
+            lines.append("  top allocations (KiB / blocks):")
+            for where, kb, count in self.top_allocations[:top]:
+                lines.append(f"    {kb:9.1f} {count:7d}  {where}")
+        for f in self.files:
+            lines.append(f"  wrote {f}")
+        return "\n".join(lines)
+
+
+class Profiler:
+    """cProfile + tracemalloc around a turn (scope="turn") or the whole session (scope="session").
+
+    Steps and commands report through section(); the result of each turn is
+    kept in `last` and, if out_dir is set, written as <name>.pstats (function
+    level, for snakeviz/pstats), <name>.collapsed (step/command stacks in
+    flamegraph.pl format, self time in microseconds) and, with alloc,
+    <name>.tracemalloc (tracemalloc.Snapshot.load). Each file depends only on
+    its own collector, so an alloc-only profile still writes its snapshot.
+    """
+
+    def __init__(
+        self,
+        *,
+        cpu: bool = True,
+        alloc: bool = False,
+        out_dir: Optional[str] = None,
+        scope: str = "turn",
+        top: int = 25,
+    ):
+        if scope not in ("turn", "session"):
+            raise ValueError("scope must be 'turn' or 'session'")
+        self.cpu = cpu
+        self.alloc = alloc
+        self.out_dir = out_dir
+        self.scope = scope
+        self.top = top
+        self.turns = 0
+        self.last: Optional[TurnProfile] = None
+        self._cprof: Any = None
+        self._stack: List[str] = []
+        self._sections: Dict[str, SectionStats] = {}
+        self._session_sections: Dict[str, SectionStats] = {}
+        self._t0 = 0.0
+        self._snap0: Any = None
+
+    # ----------------------------
+    # Turn / session boundaries
+    # ----------------------------
+
+    def start_turn(self) -> None:
+        self.turns += 1
+        self._sections = {}
+        self._stack = []
+        if self.alloc:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            tracemalloc.reset_peak()
+            self._snap0 = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        # enabled last so the snapshot above is not part of the profile
+        if self.cpu:
+            if self._cprof is None:
+                import cProfile
+
+                self._cprof = cProfile.Profile()
+            # scope="session": the same profile keeps accumulating, turn after turn
+            self._cprof.enable()
+        self._t0 = time.perf_counter()
+
+    def end_turn(self) -> TurnProfile:
+        wall_ms = (time.perf_counter() - self._t0) * 1000.0
+        prof = TurnProfile(turn=self.turns, wall_ms=wall_ms, sections=self._sections)
+        for path, st in self._sections.items():
+            acc = self._session_sections.setdefault(path, SectionStats())
+            acc.calls += st.calls
+            acc.time_ms += st.time_ms
+            acc.child_ms += st.child_ms
+            acc.alloc_kb += st.alloc_kb
+
+        if self._cprof is not None:
+            # also between turns of a session, so idle time is not profiled; reading the
+            # stats needs a disabled profiler anyway, and start_turn enables it again
+            self._cprof.disable()
+            prof.top_functions = self._top_functions(self._cprof)
+        snap: Any = None
+        if self.alloc:
+            import tracemalloc
+
+            snap = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+            prof.peak_kb = tracemalloc.get_traced_memory()[1] / 1024.0
+            diff = snap.compare_to(self._snap0, "lineno") if self._snap0 is not None else []
+            prof.top_allocations = [
+                (f"{d.traceback[0].filename}:{d.traceback[0].lineno}", d.size_diff / 1024.0, d.count_diff)
+                for d in diff[: self.top]
+                if d.size_diff > 0
+            ]
+            self._snap0 = None
+
+        if self.out_dir and self.scope == "turn":
+            prof.files = self._dump(f"turn-{self.turns:04d}", self._sections, snap)
+        if self.scope == "turn":
+            self._cprof = None
+        self.last = prof
+        return prof
+
+    def finish(self) -> List[str]:
+        """End of session: stop collectors and, for scope="session", write the session files."""
+        files: List[str] = []
+        if self._cprof is not None:
+            self._cprof.disable()
+        if self.scope == "session" and self.out_dir and (self.cpu or self.alloc):
+            snap: Any = None
+            if self.alloc:
+                import tracemalloc
+
+                if tracemalloc.is_tracing():
+                    snap = tracemalloc.take_snapshot().filter_traces(
+                        (tracemalloc.Filter(False, tracemalloc.__file__),)
+                    )
+            files = self._dump("session", self._session_sections, snap)
+        self._cprof = None
+        if self.alloc:
+            import tracemalloc
+
+            tracemalloc.stop()
+        return files
+
+    # ----------------------------
+    # Attribution
+    # ----------------------------
+
+    @contextmanager
+    def section(self, kind: str, name: str) -> Iterator[None]:
+        path = ";".join(self._stack + [f"{kind}:{name}"])
+        self._stack.append(f"{kind}:{name}")
+        alloc0 = 0
+        if self.alloc:
+            import tracemalloc
+
+            alloc0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            self._stack.pop()
+            st = self._sections.get(path)
+            if st is None:
+                st = self._sections[path] = SectionStats()
+            st.calls += 1
+            st.time_ms += ms
+            if self.alloc:
+                import tracemalloc
+
+                st.alloc_kb += (tracemalloc.get_traced_memory()[0] - alloc0) / 1024.0
+            if self._stack:
+                parent = self._sections.setdefault(";".join(self._stack), SectionStats())
+                parent.child_ms += ms
+
+    # ----------------------------
+    # Output
+    # ----------------------------
+
+    def _top_functions(self, cprof: Any) -> List[Tuple[str, int, float, float]]:
+        import pstats
+
+        stats = pstats.Stats(cprof).stats  # type: ignore[attr-defined]
+        rows = []
+        for (filename, lineno, func), (_cc, nc, tt, ct, _callers) in stats.items():
+            where = func if filename == "~" else f"{os.path.basename(filename)}:{lineno}({func})"
+            rows.append((where, nc, tt * 1000.0, ct * 1000.0))
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows[: self.top]
+
+    def _dump(self, name: str, sections: Dict[str, SectionStats], snapshot: Any = None) -> List[str]:
+        assert self.out_dir is not None
+        os.makedirs(self.out_dir, exist_ok=True)
+        files = []
+        if self._cprof is not None:
+            path = os.path.join(self.out_dir, name + ".pstats")
+            self._cprof.dump_stats(path)
+            files.append(path)
+        if snapshot is not None:
+            path = os.path.join(self.out_dir, name + ".tracemalloc")
+            snapshot.dump(path)
+            files.append(path)
+        path = os.path.join(self.out_dir, name + ".collapsed")
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, st in sorted(sections.items()):
+                self_us = int(max(0.0, st.time_ms - st.child_ms) * 1000.0)
+                if self_us:
+                    fh.write(f"{stack} {self_us}\n")
+        files.append(path)
+        return files
+
+
+def execute_step(step: Any, memory: Any, ctx: Any) -> Any:
+    """step.execute(memory, ctx), attributed to the step class when the turn is being profiled."""
+    prof = ctx.profiler if ctx is not None else None
+    if prof is None:
+        return step.execute(memory, ctx)
+    with prof.section("step", type(step).__name__):
+        return step.execute(memory, ctx)
@@ -1,13 +1,27 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List
-from ring_llm_project.core.memory import Memory
-from ring_llm_project.commands.registry import CommandRegistry
+from typing import Dict, List, Optional
+from core.memory import Memory
+from commands.registry import CommandRegistry
+
+from .packer import FOLDS_HEADER, HISTORY_HEADER, PackConfig, PackedPrompt, PromptPacker, fit
 
 
 @dataclass(frozen=True)
 class PromptConfig:
     system_role: str = "system"
+    # Collapsed folds relevant to the last user message are shown inline (0 disables).
+    retrieval_top_k: int = 3
+    # per expanded fold; larger folds are excerpted
+    retrieval_budget_tokens: int = 800
+    # model context window; the prompt never exceeds context_tokens - reserve_tokens (room for the reply)
+    context_tokens: int = 8192
+    reserve_tokens: int = 1024
+    history_entries: int = 20
+    # "substring": plain BODY, ranges by exact START/END text;
+    # "anchors" (opt-in, compare with core.anchors.ADDRESSING): BODY lines carry
+    # stable IDs (L12| ...) that range commands can use as FROM/TO
+    addressing: str = "substring"
 
 
 class PromptBuilder:
@@ -15,6 +29,16 @@ class PromptBuilder:
         self.cfg = cfg
         self.registry = registry
         self.validator_help = validator_help
+        self.packer = PromptPacker(
+            PackConfig(
+                budget_tokens=cfg.context_tokens - cfg.reserve_tokens,
+                max_expanded=cfg.retrieval_top_k,
+                max_fold_tokens=cfg.retrieval_budget_tokens,
+                max_history=cfg.history_entries,
+            )
+        )
+        # what the last build_messages() packed, for debugging/stats
+        self.last_pack: Optional[PackedPrompt] = None
 
     def build_messages(self, mem: Memory) -> List[Dict[str, str]]:
         # English-only system prompt
@@ -27,7 +51,31 @@ class PromptBuilder:
                 help_lines.append(cmd.prompt_fragment())
         cmd_help = "\n".join(help_lines)
 
-        system = (
+        # Last user message is already in memory history, but we pass explicit final user turn too:
+        last_user = ""
+        for ev in reversed(mem.history):
+            if ev.role == "user":
+                last_user = ev.text
+                break
+
+        body = None
+        body_header = "MEMORY BODY (read-only):\n"
+        if self.cfg.addressing == "anchors":
+            body = mem.annotated_body()
+            body_header = (
+                "MEMORY BODY (read-only; each line starts with its ID, e.g. \"L12| \", which is not part of the text;\n"
+                "range commands accept FROM/TO line IDs instead of START/END substrings):\n"
+            )
+        others = mem.other_shard_lines()
+        if others:
+            # only the active shard is shown in full; SHARD switches
+            body_header = (
+                "OTHER SHARDS (not shown; switch with SHARD):\n"
+                + "\n".join(f"- {line}" for line in others)
+                + f"\n\nACTIVE SHARD: {mem.shard}\n"
+                + body_header
+            )
+        head = (
             "You are a command-driven assistant.\n"
             "You may either:\n"
             "- Output normal assistant text (no command), OR\n"
@@ -36,18 +84,32 @@ class PromptBuilder:
             f"{self.validator_help}\n\n"
             "AVAILABLE COMMANDS:\n"
             f"{cmd_help}\n\n"
-            "MEMORY BODY (read-only):\n"
-            f"{mem.memory_body_text()}\n"
+            f"{body_header}"
         )
+        count = self.packer.count_tokens
+        # +1 per joint: token estimates are rounded per piece
+        fixed = count(head) + count(last_user) + 4
+        packed = self.packer.pack(mem, last_user, fixed_tokens=fixed, body=body)
+        self.last_pack = packed
 
-        # Last user message is already in memory history, but we pass explicit final user turn too:
-        last_user = ""
-        for ev in reversed(mem.history):
-            if ev.role == "user":
-                last_user = ev.text
-                break
+        system = head + packed.body + "\n"
+        if packed.folds:
+            system += FOLDS_HEADER + "\n\n".join(f"{fold.placeholder()}\n{text}" for fold, text in packed.folds) + "\n"
+        if packed.history:
+            system += HISTORY_HEADER + "\n".join(packed.history) + "\n"
+
+        # hard cap on the whole request, even when the fixed part or the user message alone is too big;
+        # the user message keeps at least half the budget if both have to give
+        budget = self.packer.cfg.budget_tokens
+        user = last_user
+        if count(system) + count(user) > budget:
+            user = fit(user, max(budget - count(system), budget // 2), count)
+            system = fit(system, budget - count(user), count)
 
         return [
             {"role": self.cfg.system_role, "content": system},
-            {"role": "user", "content": last_user},
+            {"role": "user", "content": user},
         ]
+
+    def prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self.packer.count_tokens(m["content"]) for m in messages)
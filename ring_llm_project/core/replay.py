@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from .budget import ChatResponse
+from .io import IOAdapter
+
+# Session log: JSON lines (gzip if the path ends with .gz). Every record has
+# "type" and "t" (seconds since the recorder started):
+#   header  {"version": 1, "started": <unix ts>}
+#   user    {"text"}                                   one per user turn
+#   llm     {"key", "req", "req_chars", "resp", "ms", "meta"}
+#           req = digest of the messages; meta = the ChatResponse fields
+#           (finish_reason, token counts, server timings), absent for a plain str reply
+#   llm_err {"key", "req", "error", "ms"}
+#   say     {"text"}
+#   ask     {"prompt", "answer"}
+LOG_VERSION = 1
+
+_RESPONSE_META = ("finish_reason", "prompt_tokens", "completion_tokens", "prompt_ms", "completion_ms")
+
+
+def request_digest(messages: List[Dict[str, str]]) -> str:
+    raw = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")  # type: ignore[return-value]
+    return open(path, mode, encoding="utf-8")
+
+
+class SessionRecorder:
+    """Append-only, thread-safe session log.
+
+    With store_requests=False (default) only a digest of each prompt is kept;
+    replay compares digests to report where behaviour diverged.
+    """
+
+    def __init__(self, path: str, *, store_requests: bool = False):
+        self.path = path
+        self.store_requests = store_requests
+        self._fh = _open(path, "w")
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self.write("header", version=LOG_VERSION, started=int(time.time()))
+
+    def write(self, type_: str, **fields: Any) -> None:
+        rec = {"type": type_, "t": round(time.monotonic() - self._t0, 4), **fields}
+        line = json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._fh.write(line + "\n")
+
+    def user(self, text: str) -> None:
+        self.write("user", text=text)
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+    def __enter__(self) -> "SessionRecorder":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    with _open(path, "r") as fh:
+        records = [json.loads(line) for line in fh if line.strip()]
+    if not records or records[0].get("type") != "header":
+        raise ValueError(f"not a session log: {path}")
+    if records[0].get("version") != LOG_VERSION:
+        raise ValueError(f"unsupported session log version: {records[0].get('version')}")
+    return records
+
+
+# ----------------------------
+# Recording wrappers
+# ----------------------------
+
+
+class RecordingLLMClient:
+    """Wraps an LLMClient (or EndpointPool) and logs every call."""
+
+    def __init__(self, inner: Any, key: str, recorder: SessionRecorder):
+        self.inner = inner
+        self.key = key
+        self.recorder = recorder
+
+    def chat(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        req = request_digest(messages)
+        extra: Dict[str, Any] = {"messages": messages} if self.recorder.store_requests else {}
+        t0 = time.perf_counter()
+        try:
+            resp = self.inner.chat(messages, **kwargs)
+        except Exception as exc:
+            ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            self.recorder.write("llm_err", key=self.key, req=req, error=f"{type(exc).__name__}: {exc}", ms=ms, **extra)
+            raise
+        ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        req_chars = sum(len(m.get("content", "")) for m in messages)
+        if isinstance(resp, ChatResponse):
+            # budgets and the usage ledger read these; replay must feed them the same numbers
+            extra["meta"] = {f: getattr(resp, f) for f in _RESPONSE_META}
+        self.recorder.write("llm", key=self.key, req=req, req_chars=req_chars, resp=str(resp), ms=ms, **extra)
+        return resp
+
+    def __getattr__(self, name: str) -> Any:
+        # health(), cfg, stats() ... go straight to the wrapped client
+        return getattr(self.inner, name)
+
+
+class RecordingIO(IOAdapter):
+    def __init__(self, inner: Any, recorder: SessionRecorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    def say(self, text: str) -> None:
+        self.recorder.write("say", text=text)
+        self.inner.say(text)
+
+    def show(self, text: str) -> None:
+        self.recorder.write("say", text=text)
+        self.inner.show(text)
+
+    def ask(self, prompt: str) -> str:
+        answer = self.inner.ask(prompt)
+        self.recorder.write("ask", prompt=prompt, answer=answer)
+        return answer
+
+    @property
+    def wants_deltas(self) -> bool:  # type: ignore[override]
+        return bool(getattr(self.inner, "wants_deltas", False))
+
+    def apply_deltas(self, deltas: Any) -> None:
+        self.inner.apply_deltas(deltas)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+
+def record_llms(llms: Dict[str, Any], recorder: SessionRecorder) -> Dict[str, Any]:
+    return {k: RecordingLLMClient(c, k, recorder) for k, c in llms.items()}
+
+
+# ----------------------------
+# Replay
+# ----------------------------
+
+
+class ReplayExhausted(RuntimeError):
+    """The pipeline asked for more LLM calls / answers than the log holds."""
+
+
+@dataclass
+class ReplayStats:
+    llm_calls: int = 0
+    mismatched_requests: int = 0
+    # (call index, key, recorded digest, replayed digest) of the first few divergences
+    first_mismatches: List[tuple] = field(default_factory=list)
+
+
+class ReplayLLMClient:
+    """Serves recorded responses for one key, in recorded order, with no latency."""
+
+    def __init__(self, key: str, records: List[Dict[str, Any]], stats: ReplayStats):
+        self.key = key
+        self._queue: Deque[Dict[str, Any]] = deque(r for r in records if r.get("key") == key)
+        self._stats = stats
+        self._lock = threading.Lock()
+
+    def chat(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        with self._lock:
+            if not self._queue:
+                raise ReplayExhausted(f"no recorded response left for llm key {self.key!r}")
+            rec = self._queue.popleft()
+            st = self._stats
+            st.llm_calls += 1
+            req = request_digest(messages)
+            if req != rec["req"]:
+                st.mismatched_requests += 1
+                if len(st.first_mismatches) < 10:
+                    st.first_mismatches.append((st.llm_calls, self.key, rec["req"], req))
+        if rec["type"] == "llm_err":
+            raise RuntimeError(f"[replayed] {rec['error']}")
+        meta = rec.get("meta")
+        if meta is not None:
+            return ChatResponse(rec["resp"], **{f: meta.get(f) for f in _RESPONSE_META})
+        return rec["resp"]
+
+    def health(self, timeout_s: float = 2.0) -> bool:
+        return True
+
+
+class ReplayIO(IOAdapter):
+    """Answers ASK from the log and collects everything the pipeline says."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self._answers: Deque[str] = deque(r["answer"] for r in records if r["type"] == "ask")
+        self.said: List[str] = []
+
+    def say(self, text: str) -> None:
+        self.said.append(text)
+
+    def show(self, text: str) -> None:
+        self.said.append(text)
+
+    def ask(self, prompt: str) -> str:
+        self.said.append(prompt)
+        if not self._answers:
+            raise ReplayExhausted("no recorded answer left for ASK")
+        return self._answers.popleft()
+
+
+@dataclass
+class ReplayReport:
+    turns: int
+    total_ms: float
+    turn_ms: List[float]
+    recorded_llm_ms: float
+    stats: ReplayStats
+    said: List[str]
+    # output of dump(process) after the last turn, for diffing across versions
+    final_memory: str = ""
+
+    def summary(self) -> Dict[str, Any]:
+        ms = sorted(self.turn_ms)
+        return {
+            "turns": self.turns,
+            "total_ms": round(self.total_ms, 1),
+            "avg_turn_ms": round(self.total_ms / self.turns, 2) if self.turns else 0.0,
+            "p95_turn_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 2) if ms else 0.0,
+            "recorded_llm_ms": round(self.recorded_llm_ms, 1),
+            "llm_calls": self.stats.llm_calls,
+            "mismatched_requests": self.stats.mismatched_requests,
+        }
+
+
+class Replayer:
+    """Feeds a recorded session back through a freshly built pipeline at full speed.
+
+    build(io, llms) must return an object with handle_user_message(text) and
+    run_once() (a Process, see main.create_process). Only CPU-side work is
+    timed: LLM calls return instantly from the log.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+
+    @classmethod
+    def from_file(cls, path: str) -> "Replayer":
+        return cls(load_session(path))
+
+    def llm_keys(self) -> List[str]:
+        return sorted({r["key"] for r in self.records if r["type"] in ("llm", "llm_err")})
+
+    def user_messages(self) -> Iterator[str]:
+        return (r["text"] for r in self.records if r["type"] == "user")
+
+    def run(
+        self,
+        build: Callable[[IOAdapter, Dict[str, Any]], Any],
+        *,
+        dump: Optional[Callable[[Any], str]] = None,
+    ) -> ReplayReport:
+        stats = ReplayStats()
+        llm_records = [r for r in self.records if r["type"] in ("llm", "llm_err")]
+        llms = {k: ReplayLLMClient(k, llm_records, stats) for k in self.llm_keys()}
+        io = ReplayIO(self.records)
+        process = build(io, llms)
+
+        turn_ms: List[float] = []
+        for text in self.user_messages():
+            t0 = time.perf_counter()
+            process.handle_user_message(text)
+            process.run_once()
+            turn_ms.append((time.perf_counter() - t0) * 1000.0)
+
+        return ReplayReport(
+            turns=len(turn_ms),
+            total_ms=sum(turn_ms),
+            turn_ms=turn_ms,
+            recorded_llm_ms=sum(r.get("ms", 0.0) for r in llm_records),
+            stats=stats,
+            said=io.said,
+            final_memory=dump(process) if dump is not None else "",
+        )
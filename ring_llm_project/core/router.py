@@ -1,14 +1,89 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+from .balancer import EndpointPool
+from .budget import BudgetController, GenerationBudget, chat_with_budget
+from .deadline import Deadline
 from .llm_client import LLMClient
+from .scheduler import LLMScheduler, Priority
+from .usage import UsageLedger, timed_chat
 
 
 @dataclass(frozen=True)
 class LLMRouter:
     llms: Dict[str, LLMClient]
+    # one logical key -> N endpoints (load balanced, health checked, circuit broken)
+    pools: Dict[str, EndpointPool] = field(default_factory=dict)
+    # optional central gate: concurrency caps + interactive-before-background ordering
+    scheduler: Optional[LLMScheduler] = None
+    # adapts GenerationBudget.max_tokens per step kind from observed reply lengths
+    budgets: Optional[BudgetController] = None
+    # token/timing accounting per session, step, key and resulting command
+    ledger: Optional[UsageLedger] = None
 
-    def get(self, key: str) -> LLMClient:
+    def __post_init__(self) -> None:
+        both = set(self.llms) & set(self.pools)
+        if both:
+            raise ValueError(f"LLM keys defined both as client and pool: {sorted(both)}")
+
+    def get(self, key: str) -> Union[LLMClient, EndpointPool]:
+        if key in self.pools:
+            return self.pools[key]
         if key not in self.llms:
-            raise KeyError(f"LLM key not found: {key}. Available: {list(self.llms.keys())}")
+            raise KeyError(f"LLM key not found: {key}. Available: {list(self.llms.keys()) + list(self.pools.keys())}")
         return self.llms[key]
+
+    def chat(
+        self,
+        key: str,
+        messages: List[Dict[str, str]],
+        *,
+        priority: Priority = Priority.INTERACTIVE,
+        session: str = "default",
+        budget: Optional[GenerationBudget] = None,
+        step: str = "",
+        deadline: Optional[Deadline] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Call the client for key, queued through the scheduler if one is configured.
+
+        step names the caller (usually the Step class) for the usage ledger.
+        With a deadline, the queue wait is bounded by it (scheduler.QueueTimeout)
+        and the request timeout is what is left once the call actually goes out.
+        """
+        llm = self.get(key)
+        default_max = getattr(getattr(llm, "cfg", None), "max_tokens", 1024)
+
+        def call() -> Any:
+            kw = kwargs
+            if deadline is not None:
+                kw = dict(kwargs, timeout_s=deadline.timeout(kwargs.get("timeout_s", float("inf"))))
+            return timed_chat(
+                lambda: chat_with_budget(llm.chat, budget, self.budgets, default_max, messages=messages, **kw),
+                self.ledger,
+                messages,
+                session=session,
+                step=step,
+                key=key,
+            )
+
+        if self.scheduler is None:
+            return call()
+        return self.scheduler.run(key, call, priority=priority, session=session, deadline=deadline)
+
+    def start_health_checks(self) -> None:
+        for pool in self.pools.values():
+            pool.start_health_checks()
+
+    def stop_health_checks(self) -> None:
+        for pool in self.pools.values():
+            pool.stop_health_checks()
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing decisions and endpoint health per pooled key, plus scheduler queues."""
+        out: Dict[str, Any] = {key: pool.stats() for key, pool in self.pools.items()}
+        if self.scheduler is not None:
+            out["scheduler"] = self.scheduler.stats()
+        if self.budgets is not None:
+            out["budgets"] = self.budgets.stats()
+        return out
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+COMMAND = "command"
+MESSAGE = "message"
+TEXT = "text"  # anything outside a delimiter pair (stray text)
+
+
+@dataclass(frozen=True)
+class DelimiterPair:
+    kind: str
+    start: str
+    end: str
+
+
+CMD_PAIR = DelimiterPair(COMMAND, "<CMD>", "</CMD>")
+
+
+@dataclass(frozen=True)
+class Span:
+    """Typed slice of model output. Offsets are absolute; end is exclusive.
+
+    For delimited spans [start, end) includes the markers and
+    [inner_start, inner_end) is the content between them. closed=False means
+    the output ended before the end marker.
+    """
+
+    kind: str
+    start: int
+    end: int
+    inner_start: int
+    inner_end: int
+    text: str
+    closed: bool = True
+
+    @property
+    def inner(self) -> str:
+        """Content between the markers (whole text for TEXT spans)."""
+        off = self.inner_start - self.start
+        return self.text[off: off + self.inner_end - self.inner_start]
+
+    def is_blank(self) -> bool:
+        return not self.text.strip()
+
+
+class StreamScanner:
+    """Incremental scanner: feed() chunks as they arrive, close() at the end.
+
+    Every configured start marker is matched by one regex alternation; inside
+    a pair only its end marker is searched, resuming where the previous chunk
+    stopped, so each character is examined a bounded number of times. Text is
+    held back only as long as it could still be the prefix of a start marker.
+    In streaming mode stray text may arrive as several adjacent TEXT spans.
+    """
+
+    def __init__(self, pairs: Sequence[DelimiterPair] = (CMD_PAIR,)):
+        if not pairs:
+            raise ValueError("need at least one delimiter pair")
+        for p in pairs:
+            if not p.start or not p.end:
+                raise ValueError(f"empty delimiter in pair {p.kind!r}")
+        self._by_start = {p.start: p for p in pairs}
+        # longest first so a marker that prefixes another doesn't shadow it
+        starts = sorted(self._by_start, key=len, reverse=True)
+        self._start_re = re.compile("|".join(re.escape(s) for s in starts))
+        self._hold = max(len(s) for s in starts) - 1
+        self._buf = ""
+        self._base = 0      # absolute offset of _buf[0]
+        self._pos = 0       # scan position in _buf
+        self._open: Optional[DelimiterPair] = None
+        self._open_at = 0   # _buf index of the open start marker
+        self._search = 0    # _buf index where the end-marker search resumes
+
+    def feed(self, chunk: str) -> List[Span]:
+        self._buf += chunk
+        out: List[Span] = []
+        buf = self._buf
+        while True:
+            if self._open is None:
+                m = self._start_re.search(buf, self._pos)
+                if m is None:
+                    safe = len(buf) - self._hold
+                    if safe > self._pos:
+                        out.append(self._text(self._pos, safe))
+                        self._pos = safe
+                    break
+                if m.start() > self._pos:
+                    out.append(self._text(self._pos, m.start()))
+                self._open = self._by_start[m.group(0)]
+                self._open_at = m.start()
+                self._pos = self._search = m.end()
+            else:
+                pair = self._open
+                j = buf.find(pair.end, self._search)
+                if j < 0:
+                    self._search = max(self._pos, len(buf) - len(pair.end) + 1)
+                    break
+                out.append(self._block(pair, self._open_at, self._pos, j, j + len(pair.end), True))
+                self._open = None
+                self._pos = j + len(pair.end)
+        self._compact()
+        return out
+
+    def close(self) -> List[Span]:
+        """Flush held-back text and any unterminated block."""
+        out: List[Span] = []
+        n = len(self._buf)
+        if self._open is not None:
+            out.append(self._block(self._open, self._open_at, self._pos, n, n, False))
+            self._open = None
+        elif n > self._pos:
+            out.append(self._text(self._pos, n))
+        self._pos = n
+        self._compact()
+        return out
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+
+    def _text(self, i: int, j: int) -> Span:
+        b = self._base
+        return Span(TEXT, b + i, b + j, b + i, b + j, self._buf[i:j])
+
+    def _block(self, pair: DelimiterPair, i: int, inner_i: int, inner_j: int, j: int, closed: bool) -> Span:
+        b = self._base
+        return Span(pair.kind, b + i, b + j, b + inner_i, b + inner_j, self._buf[i:j], closed)
+
+    def _compact(self) -> None:
+        # drop consumed text; an open block keeps its start marker
+        keep = self._open_at if self._open is not None else self._pos
+        if keep > 4096:
+            self._buf = self._buf[keep:]
+            self._base += keep
+            self._pos -= keep
+            self._search -= keep
+            self._open_at -= keep
+
+
+def scan(text: str, pairs: Sequence[DelimiterPair] = (CMD_PAIR,)) -> List[Span]:
+    """One pass over text; adjacent TEXT spans are merged."""
+    sc = StreamScanner(pairs)
+    raw = sc.feed(text) + sc.close()
+    out: List[Span] = []
+    for sp in raw:
+        if out and sp.kind == TEXT and out[-1].kind == TEXT:
+            prev = out.pop()
+            sp = Span(TEXT, prev.start, sp.end, prev.start, sp.end, prev.text + sp.text)
+        out.append(sp)
+    return out
+
+
+def commands(spans: Sequence[Span]) -> List[Span]:
+    return [sp for sp in spans if sp.kind == COMMAND and sp.closed]
+
+
+def has_stray_text(spans: Sequence[Span]) -> bool:
+    return any(sp.kind == TEXT and not sp.is_blank() for sp in spans)
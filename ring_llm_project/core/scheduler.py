@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .deadline import Deadline
+
+T = TypeVar("T")
+
+
+class QueueTimeout(TimeoutError):
+    """The caller's deadline passed while its request was still queued."""
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # user-facing turn (PromptAndCallStep)
+    BACKGROUND = 1   # maintenance (S2 fold loop, parallel folding)
+
+
+@dataclass(frozen=True)
+class LimiterConfig:
+    initial: int = 2
+    min_limit: int = 1
+    max_limit: int = 8
+    # multiplicative decrease on errors or when ms per completion token exceeds
+    # baseline * latency_tolerance
+    backoff: float = 0.5
+    latency_tolerance: float = 2.0
+    # shorter replies are dominated by prompt processing: no latency signal
+    min_tokens: int = 16
+
+
+class AIMDLimiter:
+    """Adaptive concurrency cap for one endpoint key.
+
+    Additive increase (+1 per `limit` healthy completions, i.e. about +1 per
+    round of requests) while the time per generated token stays near the
+    best observed; multiplicative decrease when it inflates (queueing in the
+    server / KV-cache thrash) or a call fails. End-to-end latency grows with
+    the reply length, so it is compared per completion token: a long
+    interactive reply after a few short fold calls is not a congestion
+    signal. Calls that report no token count only count for errors.
+    Throughput is tracked for the stats.
+    """
+
+    def __init__(self, cfg: LimiterConfig):
+        self.cfg = cfg
+        self.limit = float(cfg.initial)
+        self.in_flight = 0
+        self.min_ms_per_token: Optional[float] = None
+        self.completed = 0
+        self._window_start = time.monotonic()
+        self._window_done = 0
+        self.throughput_rps = 0.0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def on_complete(self, latency_ms: float, ok: bool, completion_tokens: Optional[int] = None) -> None:
+        cfg = self.cfg
+        self.completed += 1
+        self._window_done += 1
+        now = time.monotonic()
+        if now - self._window_start >= 5.0:
+            self.throughput_rps = self._window_done / (now - self._window_start)
+            self._window_start, self._window_done = now, 0
+
+        inflated = False
+        if ok and completion_tokens is not None and completion_tokens >= cfg.min_tokens:
+            per_token = latency_ms / completion_tokens
+            if self.min_ms_per_token is None or per_token < self.min_ms_per_token:
+                self.min_ms_per_token = per_token
+            inflated = per_token > self.min_ms_per_token * cfg.latency_tolerance
+        if not ok or inflated:
+            self.limit = max(float(cfg.min_limit), self.limit * cfg.backoff)
+            if self.min_ms_per_token is not None:
+                # let the baseline drift up slowly so one lucky fast call doesn't pin us low forever
+                self.min_ms_per_token *= 1.05
+        else:
+            self.limit = min(float(cfg.max_limit), self.limit + 1.0 / self.limit)
+
+
+class _Waiter:
+    __slots__ = ("priority", "session", "enqueued", "seq")
+
+    def __init__(self, priority: Priority, session: str, seq: int):
+        self.priority = priority
+        self.session = session
+        self.enqueued = time.monotonic()
+        self.seq = seq
+
+
+class _WaitStats:
+    def __init__(self, keep: int = 512):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent: Deque[float] = deque(maxlen=keep)
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recent.append(ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def pct(p: float) -> float:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 1) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class LLMScheduler:
+    """Central gate between steps and LLM clients.
+
+    Per endpoint key: an AIMD concurrency cap, strict priority between classes,
+    and round-robin across sessions within a class, so one session's fold
+    storm cannot starve another session's turn.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, LimiterConfig]] = None, default: LimiterConfig = LimiterConfig()):
+        self._cfg = dict(limits or {})
+        self._default = default
+        self._cond = threading.Condition()
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        # key -> priority -> session -> FIFO of waiters (session order = round-robin order)
+        self._queues: Dict[str, Dict[Priority, "OrderedDict[str, Deque[_Waiter]]"]] = {}
+        self._seq = itertools.count()
+        self._wait_stats: Dict[Priority, _WaitStats] = {p: _WaitStats() for p in Priority}
+        self._timeouts: Dict[Priority, int] = {p: 0 for p in Priority}
+
+    def _limiter(self, key: str) -> AIMDLimiter:
+        lim = self._limiters.get(key)
+        if lim is None:
+            lim = self._limiters[key] = AIMDLimiter(self._cfg.get(key, self._default))
+        return lim
+
+    def _head(self, key: str) -> Optional[_Waiter]:
+        for prio in sorted(self._queues.get(key, {})):
+            sessions = self._queues[key][prio]
+            if sessions:
+                return next(iter(sessions.values()))[0]
+        return None
+
+    def _dequeue(self, key: str, w: _Waiter) -> None:
+        sessions = self._queues[key][w.priority]
+        q = sessions[w.session]
+        q.popleft()
+        # served session goes to the back of the round-robin order
+        del sessions[w.session]
+        if q:
+            sessions[w.session] = q
+
+    def _abandon(self, key: str, w: _Waiter) -> None:
+        sessions = self._queues[key][w.priority]
+        q = sessions[w.session]
+        q.remove(w)
+        if not q:
+            del sessions[w.session]
+
+    def run(
+        self,
+        key: str,
+        fn: Callable[[], T],
+        *,
+        priority: Priority = Priority.INTERACTIVE,
+        session: str = "default",
+        deadline: Optional["Deadline"] = None,
+    ) -> T:
+        """fn() once key has a free slot and this request is first in line.
+
+        With a deadline the wait is bounded by it: QueueTimeout is raised
+        (and the request dropped from the queue) if it passes first. fn runs
+        only after the slot is acquired, so it should derive its own request
+        timeout from the deadline at that point.
+        """
+        w = _Waiter(priority, session, next(self._seq))
+        with self._cond:
+            lim = self._limiter(key)
+            by_prio = self._queues.setdefault(key, {})
+            by_prio.setdefault(priority, OrderedDict()).setdefault(session, deque()).append(w)
+            while not (self._head(key) is w and lim.has_capacity()):
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                left = deadline.remaining()
+                if left <= 0:
+                    self._abandon(key, w)
+                    self._timeouts[priority] += 1
+                    # whoever was behind us may be first now
+                    self._cond.notify_all()
+                    raise QueueTimeout(f"deadline passed after {time.monotonic() - w.enqueued:.2f}s in the {key!r} queue")
+                self._cond.wait(timeout=left)
+            self._dequeue(key, w)
+            lim.in_flight += 1
+            self._wait_stats[priority].add((time.monotonic() - w.enqueued) * 1000.0)
+            # the next waiter may also fit under the cap
+            self._cond.notify_all()
+
+        t0 = time.perf_counter()
+        ok = False
+        tokens: Optional[int] = None
+        try:
+            out = fn()
+            ok = True
+            # chat() returns a ChatResponse; other callables simply report no tokens
+            tokens = getattr(out, "completion_tokens", None)
+            return out
+        finally:
+            with self._cond:
+                lim.in_flight -= 1
+                lim.on_complete((time.perf_counter() - t0) * 1000.0, ok, tokens)
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            endpoints: Dict[str, Any] = {}
+            for key, lim in self._limiters.items():
+                queued: List[int] = [
+                    sum(len(q) for q in self._queues.get(key, {}).get(p, {}).values()) for p in Priority
+                ]
+                endpoints[key] = {
+                    "limit": round(lim.limit, 2),
+                    "in_flight": lim.in_flight,
+                    "completed": lim.completed,
+                    "throughput_rps": round(lim.throughput_rps, 2),
+                    "min_ms_per_token": (
+                        round(lim.min_ms_per_token, 2) if lim.min_ms_per_token is not None else None
+                    ),
+                    "queued": {p.name.lower(): n for p, n in zip(Priority, queued)},
+                }
+            return {
+                "endpoints": endpoints,
+                "queue_wait": {p.name.lower(): s.snapshot() for p, s in self._wait_stats.items()},
+                "queue_timeouts": {p.name.lower(): n for p, n in self._timeouts.items()},
+            }
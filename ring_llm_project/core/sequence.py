@@ -4,12 +4,17 @@ from typing import Any, List, Optional
 
 from core.types import DispatchResult, ExecutionContext
 from .memory import Memory
+from .profiling import execute_step
 from .step import Step, clear_stop, should_stop
 
 
 class StepSequence:
     """
     Deterministic ordered steps, no loops.
+
+    The turn deadline is not checked between steps: steps that would start
+    an LLM call check it themselves (PromptAndCallStep), and the steps after
+    a call must still run so a reply that arrived late is not thrown away.
     """
 
     def __init__(self, steps: List[Step], developer_notes: str = "") -> None:
@@ -21,7 +26,7 @@ class StepSequence:
         if isinstance(current, Memory):
             clear_stop(current)
         for step in self.steps:
-            res = step.execute(current, ctx)
+            res = execute_step(step, current, ctx)
             if isinstance(res, DispatchResult):
                 current = res.memory
             else:
@@ -9,6 +9,8 @@ from .memory import Memory
 RUNTIME_RAW_OUTPUT_KEY: Final[str] = "__runtime_raw_model_output"
 RUNTIME_NORMALIZED_OUTPUT_KEY: Final[str] = "__runtime_normalized_output"
 RUNTIME_COMMAND_BLOCK_KEY: Final[str] = "__runtime_command_block"
+# content between the block's markers, as delimited by the scanner
+RUNTIME_COMMAND_INNER_KEY: Final[str] = "__runtime_command_inner"
 RUNTIME_STOP_SEQUENCE_KEY: Final[str] = "__runtime_stop_sequence"
 
 
@@ -5,6 +5,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional
 
+from core.deadline import DEADLINE_METRICS
+from core.profiling import execute_step
 from core.types import DispatchResult, ExecutionContext
 from core.memory import Memory
 
@@ -23,13 +25,20 @@ class StepLoop:
     inner: Step
     max_iters: int = 20
     hide_internal_from_history: bool = True
+    # leave the loop (best effort so far) once less than this is left of the turn deadline
+    deadline_reserve_s: float = 5.0
 
     def execute(self, memory: Memory, ctx: ExecutionContext) -> DispatchResult:
         current = memory
         last_res: Optional[DispatchResult] = None
         for i in range(self.max_iters):
+            if ctx.cancelled():
+                break
+            if ctx.out_of_time(self.deadline_reserve_s):
+                DEADLINE_METRICS.incr("early_exits")
+                break
             ctx.debug(f"[StepLoop] iter={i+1}/{self.max_iters}")
-            res = self.inner.execute(current, ctx)
+            res = execute_step(self.inner, current, ctx)
             last_res = res
             current = res.memory
             if res.break_loop:
@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass, field
 from typing import Dict, Optional, Protocol, TYPE_CHECKING
 
 if TYPE_CHECKING:  # pragma: no cover
+    from core.deadline import Deadline
+    from core.profiling import Profiler
     from core.memory import Memory
 
 
@@ -55,12 +58,30 @@ class ExecutionContext:
     # IO interface (Console, Cherry Studio hook, etc.)
     io: Optional[object] = None
 
+    # Session id for fair sharing in the LLM scheduler
+    session_id: str = "default"
+
+    # Set by whoever owns the run (e.g. a user message arrived during background work)
+    cancel: Optional[threading.Event] = None
+
+    # Per-turn time budget; steps, loops and LLM calls all read it
+    deadline: Optional['Deadline'] = None
+
+    # Set only while a turn is profiled (DebugFlags.profile_cpu / profile_alloc)
+    profiler: Optional['Profiler'] = None
+
     # Debug flags
     debug_calls: bool = False
     debug_raw_llm: bool = False
     debug_cmd: bool = False
     debug_memory: bool = False
 
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    def out_of_time(self, reserve_s: float = 0.0) -> bool:
+        return self.deadline is not None and self.deadline.near(reserve_s)
+
 
 class Step(Protocol):
     def execute(self, memory: 'Memory', ctx: ExecutionContext) -> DispatchResult:
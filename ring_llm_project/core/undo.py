@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .memory import Fold, Memory
+
+# Undo/redo for BODY, CLIPBOARD, folds and the active shard, one step per dispatched command.
+# Memory reports each mutation while a step is open; a step stores only
+# what it needs to reverse itself (the replaced text of a splice, the old
+# clipboard, the folds it created), so undoing costs O(size of the edits).
+# HISTORY and STATE are a log of what happened and are never rewound.
+
+SPLICE = "splice"  # (i, old, new): body[i:i+len(old)] became new
+BODY = "body"  # (old, new): wholesale body replacement
+CLIPBOARD = "clipboard"  # (old, new)
+FOLD = "fold"  # (fold,): fold created
+SHARD = "shard"  # (old, new): active shard switched
+
+
+class UndoError(ValueError):
+    pass
+
+
+@dataclass
+class UndoStep:
+    label: str
+    ops: List[Tuple[Any, ...]] = field(default_factory=list)
+    chars: int = 0
+
+    def add(self, op: Tuple[Any, ...], chars: int) -> None:
+        self.ops.append(op)
+        self.chars += chars
+
+
+class UndoLog:
+    """Bounded undo/redo stacks of UndoStep. The oldest steps are dropped first.
+
+    Limits: max_steps undo steps and max_chars of stored text in total
+    (undo + redo). A single step larger than max_chars is not kept, and
+    the undo stack is cleared (older steps could not be reached anyway).
+    A step is undone or redone as a whole: if one of its ops conflicts, the
+    ops already applied are reverted and UndoError is raised with both
+    stacks unchanged.
+    """
+
+    def __init__(self, *, max_steps: int = 50, max_chars: int = 200_000):
+        self.max_steps = max_steps
+        self.max_chars = max_chars
+        self._undo: Deque[UndoStep] = deque()
+        self._redo: List[UndoStep] = []
+        self._chars = 0
+        self._open: Optional[UndoStep] = None
+        # set while undo()/redo() re-apply ops, which must not be recorded again
+        self._replaying = False
+        self.dropped = 0
+
+    # ----------------------------
+    # Recording (called by Memory)
+    # ----------------------------
+
+    @property
+    def recording(self) -> bool:
+        return self._open is not None and not self._replaying
+
+    def record(self, op: Tuple[Any, ...], chars: int = 0) -> None:
+        if self.recording:
+            self._open.add(op, chars)
+
+    @contextmanager
+    def step(self, label: str) -> Iterator[UndoStep]:
+        """Everything Memory reports inside the block becomes one undoable step."""
+        if self._open is not None:  # nested: part of the outer step
+            yield self._open
+            return
+        st = self._open = UndoStep(label)
+        try:
+            yield st
+        finally:
+            self._open = None
+            if st.ops:
+                self._push(st)
+
+    def _push(self, st: UndoStep) -> None:
+        for r in self._redo:
+            self._chars -= r.chars
+        self._redo.clear()
+        if st.chars > self.max_chars:
+            self.dropped += len(self._undo) + 1
+            self.clear()
+            return
+        self._undo.append(st)
+        self._chars += st.chars
+        while self._undo and (len(self._undo) > self.max_steps or self._chars > self.max_chars):
+            self._chars -= self._undo.popleft().chars
+            self.dropped += 1
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._chars = 0
+
+    # ----------------------------
+    # Undo / redo
+    # ----------------------------
+
+    def undo(self, mem: "Memory", steps: int = 1) -> List[str]:
+        """Revert up to `steps` steps, newest first. Returns their labels."""
+        done: List[str] = []
+        self._replaying = True
+        try:
+            for _ in range(steps):
+                if not self._undo:
+                    break
+                st = self._undo[-1]
+                _apply_step(mem, reversed(st.ops), inverse=True)
+                self._undo.pop()
+                self._redo.append(st)
+                done.append(st.label)
+        finally:
+            self._replaying = False
+        return done
+
+    def redo(self, mem: "Memory", steps: int = 1) -> List[str]:
+        done: List[str] = []
+        self._replaying = True
+        try:
+            for _ in range(steps):
+                if not self._redo:
+                    break
+                st = self._redo[-1]
+                _apply_step(mem, st.ops, inverse=False)
+                self._redo.pop()
+                self._undo.append(st)
+                done.append(st.label)
+        finally:
+            self._replaying = False
+        return done
+
+    def labels(self) -> Dict[str, List[str]]:
+        return {"undo": [s.label for s in self._undo], "redo": [s.label for s in reversed(self._redo)]}
+
+    def stats(self) -> Dict[str, int]:
+        return {"undo": len(self._undo), "redo": len(self._redo), "chars": self._chars, "dropped": self.dropped}
+
+
+def _apply_step(mem: "Memory", ops: Iterable[Tuple[Any, ...]], *, inverse: bool) -> None:
+    """Apply ops in order, all or nothing: if one fails, the ones already applied are reverted."""
+    done: List[Tuple[Any, ...]] = []
+    try:
+        for op in ops:
+            _apply(mem, op, inverse=inverse)
+            done.append(op)
+    except Exception:
+        for op in reversed(done):
+            _apply(mem, op, inverse=not inverse)
+        raise
+
+
+def _apply(mem: "Memory", op: Tuple[Any, ...], *, inverse: bool) -> None:
+    """Re-apply op (inverse=False) or its inverse. Memory must not record while this runs."""
+    kind = op[0]
+    if kind == SPLICE:
+        _, i, old, new = op
+        have, want = (new, old) if inverse else (old, new)
+        if mem.body[i:i + len(have)] != have:
+            raise UndoError("BODY was changed outside of undo tracking; cannot undo/redo this step")
+        mem._splice(i, i + len(have), want)
+    elif kind == BODY:
+        _, old, new = op
+        have, want = (new, old) if inverse else (old, new)
+        if mem.body != have:
+            raise UndoError("BODY was changed outside of undo tracking; cannot undo/redo this step")
+        mem.body = want
+    elif kind == CLIPBOARD:
+        _, old, new = op
+        mem.clipboard = old if inverse else new
+    elif kind == FOLD:
+        fold: "Fold" = op[1]
+        if inverse:
+            mem.folds.pop(fold.fold_id, None)
+            mem.fold_index.remove(fold.fold_id)
+        else:
+            mem.folds[fold.fold_id] = fold
+            mem.fold_index.add(fold)
+    elif kind == SHARD:
+        _, old, new = op
+        mem.switch_shard(old if inverse else new)
+    else:
+        raise UndoError(f"unknown undo op: {kind!r}")
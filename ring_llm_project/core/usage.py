@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from utils.text import estimate_tokens
+
+from .budget import command_of
+
+
+def timed_chat(
+    call: Callable[[], str],
+    ledger: Optional["UsageLedger"],
+    messages: List[Dict[str, str]],
+    *,
+    session: str = "default",
+    step: str = "",
+    key: str = "",
+) -> str:
+    """Run call() and, if a ledger is given, account for the reply."""
+    if ledger is None:
+        return call()
+    t0 = time.perf_counter()
+    reply = call()
+    ledger.record_reply(
+        reply, messages, latency_ms=(time.perf_counter() - t0) * 1000.0, session=session, step=step, key=key
+    )
+    return reply
+
+
+def server_usage(data: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Token counts and server-side timings from a chat response, whichever dialect the server speaks.
+
+    OpenAI: usage.prompt_tokens / completion_tokens. Ollama: prompt_eval_count,
+    eval_count and *_duration in ns. llama.cpp: timings.prompt_n / predicted_n
+    and prompt_ms / predicted_ms.
+    """
+    out: Dict[str, Optional[float]] = {
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "prompt_ms": None,
+        "completion_ms": None,
+    }
+    usage = data.get("usage") or {}
+    out["prompt_tokens"] = usage.get("prompt_tokens")
+    out["completion_tokens"] = usage.get("completion_tokens")
+
+    def fill(field: str, value: Any) -> None:
+        # first dialect that reports a field wins; 0 is a real value (e.g. a fully cached prompt)
+        if out[field] is None and value is not None:
+            out[field] = value
+
+    if "eval_count" in data or "prompt_eval_count" in data:
+        fill("prompt_tokens", data.get("prompt_eval_count"))
+        fill("completion_tokens", data.get("eval_count"))
+        if data.get("prompt_eval_duration") is not None:
+            fill("prompt_ms", data["prompt_eval_duration"] / 1e6)
+        if data.get("eval_duration") is not None:
+            fill("completion_ms", data["eval_duration"] / 1e6)
+
+    timings = data.get("timings") or {}
+    if timings:
+        fill("prompt_tokens", timings.get("prompt_n"))
+        fill("completion_tokens", timings.get("predicted_n"))
+        fill("prompt_ms", timings.get("prompt_ms"))
+        fill("completion_ms", timings.get("predicted_ms"))
+    return out
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    ts: float
+    session: str
+    step: str
+    key: str
+    command: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    # server-side, when the server reports them
+    prompt_ms: Optional[float] = None
+    completion_ms: Optional[float] = None
+    # token counts were estimated from text (server sent no usage)
+    estimated: bool = False
+
+
+class _Totals:
+    __slots__ = ("calls", "prompt_tokens", "completion_tokens", "latency_ms", "gen_tokens", "gen_ms")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+        # tokens/ms pairs for throughput; server generation time if known, else wall latency
+        self.gen_tokens = 0
+        self.gen_ms = 0.0
+
+    def add(self, r: UsageRecord) -> None:
+        self.calls += 1
+        self.prompt_tokens += r.prompt_tokens
+        self.completion_tokens += r.completion_tokens
+        self.latency_ms += r.latency_ms
+        self.gen_tokens += r.completion_tokens
+        self.gen_ms += r.completion_ms if r.completion_ms else r.latency_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_latency_ms": round(self.latency_ms / self.calls, 1) if self.calls else 0.0,
+            "tokens_per_s": round(self.gen_tokens / (self.gen_ms / 1000.0), 1) if self.gen_ms else 0.0,
+        }
+
+
+class UsageLedger:
+    """Token and timing accounting for every LLM call, attributed to session / step / key / command.
+
+    Totals are kept for the life of the process; only the last `keep` raw
+    records are retained.
+    """
+
+    DIMENSIONS = ("session", "step", "key", "command")
+
+    def __init__(self, keep: int = 5000):
+        self._lock = threading.Lock()
+        self.records: Deque[UsageRecord] = deque(maxlen=keep)
+        self._total = _Totals()
+        self._by: Dict[str, Dict[str, _Totals]] = {d: {} for d in self.DIMENSIONS}
+        self.estimated = 0
+
+    def add(self, r: UsageRecord) -> None:
+        with self._lock:
+            self.records.append(r)
+            self._total.add(r)
+            self.estimated += r.estimated
+            for dim in self.DIMENSIONS:
+                value = getattr(r, dim)
+                t = self._by[dim].get(value)
+                if t is None:
+                    t = self._by[dim][value] = _Totals()
+                t.add(r)
+
+    def record_reply(
+        self,
+        reply: str,
+        messages: List[Dict[str, str]],
+        *,
+        latency_ms: float,
+        session: str = "default",
+        step: str = "",
+        key: str = "",
+    ) -> UsageRecord:
+        """Build a record from a ChatResponse (plain str works too, with estimated tokens) and add it."""
+        prompt_tokens = getattr(reply, "prompt_tokens", None)
+        completion_tokens = getattr(reply, "completion_tokens", None)
+        estimated = prompt_tokens is None or completion_tokens is None
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(reply)
+        r = UsageRecord(
+            ts=time.time(),
+            session=session,
+            step=step or "-",
+            key=key or "-",
+            command=command_of(reply),
+            prompt_tokens=int(prompt_tokens),
+            completion_tokens=int(completion_tokens),
+            latency_ms=latency_ms,
+            prompt_ms=getattr(reply, "prompt_ms", None),
+            completion_ms=getattr(reply, "completion_ms", None),
+            estimated=estimated,
+        )
+        self.add(r)
+        return r
+
+    def totals(self, by: Optional[str] = None) -> Dict[str, Any]:
+        """Overall totals, or totals per value of one dimension (session, step, key, command)."""
+        with self._lock:
+            if by is None:
+                return self._total.snapshot()
+            if by not in self._by:
+                raise ValueError(f"unknown dimension {by!r}; use one of {self.DIMENSIONS}")
+            return {k: t.snapshot() for k, t in sorted(self._by[by].items())}
+
+    def report(self, by: Optional[List[str]] = None) -> str:
+        total = self.totals()
+        lines = [
+            f"LLM usage: {total['calls']} calls, {total['prompt_tokens']} prompt + "
+            f"{total['completion_tokens']} completion tokens, {total['tokens_per_s']} tok/s, "
+            f"avg {total['avg_latency_ms']} ms"
+        ]
+        for dim in by or list(self.DIMENSIONS):
+            rows = self.totals(dim)
+            if not rows:
+                continue
+            lines.append(f"  by {dim}:")
+            for name, t in rows.items():
+                lines.append(
+                    f"    {name:<24} {t['calls']:>5} calls {t['prompt_tokens']:>8} in {t['completion_tokens']:>7} out"
+                    f" {t['tokens_per_s']:>7} tok/s {t['avg_latency_ms']:>8} ms"
+                )
+        if self.estimated:
+            lines.append(f"  ({self.estimated} calls with estimated token counts: the server sent no usage)")
+        return "\n".join(lines)
+
+
+USAGE = UsageLedger()
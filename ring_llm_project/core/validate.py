@@ -1,6 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+from .scanner import COMMAND, MESSAGE, DelimiterPair, Span, has_stray_text, scan
 
 
 @dataclass(frozen=True)
@@ -16,11 +18,16 @@ class CommandFormat:
     start: str = "<CMD>"
     end: str = "</CMD>"
 
+    def pair(self) -> DelimiterPair:
+        return DelimiterPair(COMMAND, self.start, self.end)
+
 
 @dataclass(frozen=True)
 class ValidateConfig:
     mode: str = "extract_anywhere"  # "strict_only_command" | "extract_anywhere"
     fmt: CommandFormat = CommandFormat()
+    # further markers recognised in the same pass (e.g. AppConfig.delimiter_pairs())
+    pairs: Tuple[DelimiterPair, ...] = ()
 
 
 class CommandValidator:
@@ -44,25 +51,29 @@ class CommandValidator:
             "- If you are not issuing a command, output normal assistant text with no <CMD> block.\n"
         )
 
-    def extract_command_block(self, text: str) -> Tuple[bool, Optional[str]]:
-        if not text:
-            return False, None
-
-        s = self.cfg.fmt.start
-        e = self.cfg.fmt.end
+    def scan(self, text: str) -> List[Span]:
+        return scan(text, (self.cfg.fmt.pair(), *self.cfg.pairs))
 
+    def command_span(self, spans: List[Span]) -> Optional[Span]:
+        """The command span to dispatch, per cfg.mode, or None."""
+        first = next((sp for sp in spans if sp.kind == COMMAND and sp.closed), None)
+        if first is None:
+            return None
         if self.cfg.mode == "strict_only_command":
-            stripped = text.strip()
-            if not stripped.startswith(s) or not stripped.endswith(e):
-                return False, None
-            return True, stripped
+            # only whitespace (or message blocks) may surround the command block
+            if has_stray_text(spans) or any(not sp.closed for sp in spans):
+                return None
+        return first
+
+    @staticmethod
+    def messages(spans: List[Span]) -> List[str]:
+        """Contents of the message blocks, in order."""
+        return [sp.inner.strip() for sp in spans if sp.kind == MESSAGE and sp.inner.strip()]
 
-        # extract_anywhere
-        idx = text.find(s)
-        if idx < 0:
+    def extract_command_block(self, text: str) -> Tuple[bool, Optional[str]]:
+        if not text:
             return False, None
-        idx2 = text.find(e, idx)
-        if idx2 < 0:
+        span = self.command_span(self.scan(text))
+        if span is None:
             return False, None
-        block = text[idx: idx2 + len(e)]
-        return True, block
+        return True, span.text
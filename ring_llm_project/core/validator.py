@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
 
+from .scanner import CMD_PAIR, COMMAND, TEXT, DelimiterPair, Span, commands, scan
 
-CMD_OPEN = "<CMD>"
-CMD_CLOSE = "</CMD>"
+
+CMD_OPEN = CMD_PAIR.start
+CMD_CLOSE = CMD_PAIR.end
 
 
 @dataclass(frozen=True)
@@ -15,6 +17,8 @@ class CommandValidationResult:
     ok: bool
     error: Optional[str]
     cmd_blocks: List[str]
+    # every span of the response (commands, messages, stray text), from the same pass
+    spans: List[Span] = field(default_factory=list)
 
 
 class CommandValidator:
@@ -25,39 +29,29 @@ class CommandValidator:
       - mixed: return any <CMD> blocks embedded in text
     """
 
-    def __init__(self, mode: str = "strict"):
+    def __init__(self, mode: str = "strict", pairs: Sequence[DelimiterPair] = (CMD_PAIR,)):
         if mode not in ("strict", "mixed"):
             raise ValueError("mode must be 'strict' or 'mixed'")
         self.mode = mode
+        # extra pairs (e.g. AppConfig.delimiter_pairs()) are recognised in the same pass
+        self.pairs = tuple(pairs)
 
     def extract_blocks(self, text: str) -> List[str]:
-        blocks: List[str] = []
-        i = 0
-        while True:
-            start = text.find(CMD_OPEN, i)
-            if start < 0:
-                break
-            end = text.find(CMD_CLOSE, start + len(CMD_OPEN))
-            if end < 0:
-                break
-            inner = text[start + len(CMD_OPEN) : end]
-            blocks.append(inner.strip("\n\r\t "))
-            i = end + len(CMD_CLOSE)
-        return blocks
+        return [sp.inner.strip("\n\r\t ") for sp in commands(scan(text, self.pairs))]
 
     def validate(self, text: str) -> CommandValidationResult:
-        blocks = self.extract_blocks(text)
+        spans = scan(text, self.pairs)
+        blocks = [sp.inner.strip("\n\r\t ") for sp in commands(spans)]
         if not blocks:
-            return CommandValidationResult(False, "no_cmd_block", [])
+            return CommandValidationResult(False, "no_cmd_block", [], spans)
 
         if self.mode == "strict":
-            stripped = text.strip()
-            expected = f"{CMD_OPEN}{blocks[0]}{CMD_CLOSE}" if len(blocks) == 1 else None
-            # Rebuild a canonical single-block string and compare by removing outer whitespace/newlines
-            canonical = f"{CMD_OPEN}\n{blocks[0]}\n{CMD_CLOSE}".strip()
             if len(blocks) != 1:
-                return CommandValidationResult(False, "multiple_cmd_blocks_in_strict_mode", blocks)
-            if stripped != canonical:
-                return CommandValidationResult(False, "non_command_text_in_strict_mode", blocks)
-
-        return CommandValidationResult(True, None, blocks)
+                return CommandValidationResult(False, "multiple_cmd_blocks_in_strict_mode", blocks, spans)
+            if any(not sp.closed for sp in spans):
+                # a truncated trailing block, like core.validate's strict mode
+                return CommandValidationResult(False, "unclosed_cmd_block_in_strict_mode", blocks, spans)
+            if any(sp.kind != COMMAND and not (sp.kind == TEXT and sp.is_blank()) for sp in spans):
+                return CommandValidationResult(False, "non_command_text_in_strict_mode", blocks, spans)
+
+        return CommandValidationResult(True, None, blocks, spans)
@@ -1,32 +1,61 @@
 from __future__ import annotations
 
-from ring_llm_project.core.llm_client import LLMClient, LLMConfig
-from ring_llm_project.core.router import LLMRouter
-from ring_llm_project.core.memory import Memory
-from ring_llm_project.core.behavior import DebugFlags
-from ring_llm_project.core.consciousness_builder import ConsciousnessBuilder
-from ring_llm_project.core.process import Process, ProcessConfig
-from ring_llm_project.commands.registry import CommandRegistry
-from ring_llm_project.commands.say import SayCommand
-from ring_llm_project.commands.builtin_ask import AskCommand
-from ring_llm_project.commands.copy import CopyCommand
-from ring_llm_project.commands.fold import FoldCommand
-from ring_llm_project.commands.unfold import UnfoldCommand
-from ring_llm_project.commands.loop_done import LoopDoneCommand
-from ring_llm_project.commands.base import IOAdapter
+from core.llm_client import LLMClient, LLMConfig
+from core.router import LLMRouter
+from core.budget import BudgetController
+from core.checkpoint import Resumed
+from core.usage import USAGE
+from core.memory import Memory
+from core.behavior import DebugFlags
+from core.consciousness_builder import ConsciousnessBuilder
+from core.fold import Folder
+from core.maintenance import MaintenanceWorker
+from core.process import Process, ProcessConfig
+from core.profiling import Profiler
+from utils import log
+from core.replay import RecordingIO, ReplayReport, Replayer, SessionRecorder, record_llms
+from commands.registry import CommandRegistry
+from commands.manifest import load_manifest
+from commands.base import IOAdapter
+
+
+# (module, class) of every command plugin. Implementations are imported on first
+# dispatch; names and prompt help come from the cached manifest.
+COMMAND_PLUGINS = (
+    ("commands.say", "SayCommand"),
+    ("commands.builtin_ask", "AskCommand"),
+    ("commands.copy", "CopyCommand"),
+    ("commands.fold", "FoldCommand"),
+    ("commands.unfold", "UnfoldCommand"),
+    ("commands.loop_done", "LoopDoneCommand"),
+    ("commands.undo", "UndoCommand"),
+    ("commands.undo", "RedoCommand"),
+    ("commands.shard", "ShardCommand"),
+)
 
 
 def build_registry() -> CommandRegistry:
     reg = CommandRegistry()
-    reg.register(SayCommand())
-    reg.register(AskCommand())
-    reg.register(CopyCommand())
-    reg.register(FoldCommand())
-    reg.register(UnfoldCommand())
-    reg.register(LoopDoneCommand())
+    for entry in load_manifest(COMMAND_PLUGINS):
+        reg.register_lazy(entry)
     return reg
 
 
+def configure_logging(debug: DebugFlags | None = None) -> None:
+    """Start the process-wide log sink from debug's log_* fields.
+
+    Call once per program (cli.main, batch.main): the sink is global and
+    shared by every Process, so create_process leaves it alone.
+    """
+    debug = debug or DebugFlags()
+    log.configure(log.LogConfig(
+        level=debug.log_level,
+        path=debug.log_path,
+        json_lines=debug.log_json,
+        max_field_chars=debug.log_max_field_chars,
+    ))
+
+
 def create_process(
     *,
     io: IOAdapter,
@@ -34,6 +63,7 @@ def create_process(
     llms: dict[str, LLMClient] | None = None,
     process_cfg: ProcessConfig | None = None,
     debug: DebugFlags | None = None,
+    recorder: SessionRecorder | None = None,
 ) -> Process:
     # 1) Create any number of LLM clients with any keys you want
     llms = llms or {
@@ -47,21 +77,27 @@ def create_process(
         # "small": LLMClient(LLMConfig(base_url="http://127.0.0.1:1234", model="...", temperature=0.2)),
     }
 
-    router = LLMRouter(llms=llms)
+    if recorder is not None:
+        llms = record_llms(llms, recorder)
+        io = RecordingIO(io, recorder)
+
+    router = LLMRouter(llms=llms, budgets=BudgetController(), ledger=USAGE)
     registry = build_registry()
 
-    mem = mem or Memory(
-        goal="Design power electronics converters.",
-        vars={"controller": "TL494+ESP32"},
-        plan=[
-            "Collect constraints",
-            "Pick topology and frequency",
-            "Compute magnetics and currents",
-            "Select power stage and drivers",
-            "Protections + validation",
-        ],
-        max_chars=30_000,
-    )
+    if mem is None:
+        mem = Memory(
+            body="\n".join([
+                "Plan:",
+                "- Collect constraints",
+                "- Pick topology and frequency",
+                "- Compute magnetics and currents",
+                "- Select power stage and drivers",
+                "- Protections + validation",
+            ]) + "\n",
+            max_chars=30_000,
+        )
+        mem.state["goal"] = "Design power electronics converters."
+        mem.state["controller"] = "TL494+ESP32"
 
     process_cfg = process_cfg or ProcessConfig(control_llm_key="oss20b")
     debug = debug or DebugFlags(
@@ -78,13 +114,62 @@ def create_process(
         debug=debug,
     ).build()
 
-    return Process(
+    process = Process(
         cfg=process_cfg,
         mem=mem,
         behavior=behavior,
+        recorder=recorder,
     )
+    if debug.profile_cpu or debug.profile_alloc:
+        process.profiler = Profiler(
+            cpu=debug.profile_cpu,
+            alloc=debug.profile_alloc,
+            out_dir=debug.profile_dir,
+            scope=debug.profile_scope,
+        )
+    if process_cfg.background_fold:
+        folder = Folder(
+            keep_last_events=process_cfg.auto_fold_keep_last_events,
+            compact_history=process_cfg.auto_fold_compact_history,
+        )
+        process.maintenance = MaintenanceWorker(
+            lock=process.lock,
+            get_memory=lambda: process.mem,
+            needs_fold=folder.needs_fold,
+            job=lambda work, cancel: folder.fold(work),
+            on_settled=folder.settle,
+        )
+        process.maintenance.start()
+    return process
 
 
 def run_once(process: Process, user_message: str) -> None:
     process.handle_user_message(user_message)
     process.run_once()
+
+
+def replay_session(path: str, **kwargs) -> ReplayReport:
+    """Re-run a session recorded with create_process(recorder=...) without any LLM latency.
+
+    kwargs go to create_process (process_cfg, debug, mem); background folding
+    is not replayable, so keep it off.
+    """
+    return Replayer.from_file(path).run(
+        lambda io, llms: create_process(io=io, llms=llms, **kwargs),
+        dump=lambda process: process.mem.to_text(),
+    )
+
+
+def resume_process(resumed: Resumed, *, io: IOAdapter, **kwargs) -> Process:
+    """Process for a checkpoint read with core.checkpoint.load_checkpoint.
+
+    kwargs go to create_process (llms, debug, recorder). Fold contents stay
+    in the fold store until something reads them. A turn that was in flight
+    when the checkpoint was taken is left pending (process.pending_user);
+    call process.run_once() to finish it.
+    """
+    process = create_process(io=io, mem=resumed.mem, process_cfg=resumed.cfg, **kwargs)
+    process.turns = resumed.turns
+    process.pending_user = resumed.pending_user
+    process.checkpointer = resumed.checkpointer
+    return process
@@ -39,8 +39,9 @@ def main() -> None:
             break
 
         out_text = app.run_once(user_text)
-        # printing full memory each time can be noisy; keep it but you can disable.
-        print(io.prefix_out + "\n" + out_text)
+        # printing full memory each time can be noisy; ConsoleIO(show_deltas=True) prints changes only.
+        if out_text:
+            print(io.prefix_out + "\n" + out_text)
 
 
 if __name__ == "__main__":
@@ -3,12 +3,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Optional, Sequence
 
+from core.budget import BudgetController
+from core.constraints import ResponseConstraint, build_constraint
 from core.dispatcher import CommandDispatcher
 from core.llm_client import LLMClient
 from core.memory import Memory
+from core.scheduler import LLMScheduler
 from core.step_loop import StepLoop
 from core.types import DispatchResult, ExecutionContext
+from core.usage import UsageLedger
+from scenarios.day.parallel_fold import ParallelFolder
 from scenarios.day.s2_fold_loop import S2FoldLoopStep
 
 
@@ -16,8 +22,54 @@ from scenarios.day.s2_fold_loop import S2FoldLoopStep
 class DayEngine:
     dispatcher: CommandDispatcher
     llm: LLMClient
+    scheduler: Optional[LLMScheduler] = None
+    # pool key of `llm` (the one interactive turns use for it), so S2 calls queue behind
+    # interactive ones on the same scheduler key; None = looked up in ctx.llm_pool
+    llm_key: Optional[str] = None
+    # grammar/schema for S2 and parallel-fold replies; built from the dispatcher's registry when not given
+    constraint: Optional[ResponseConstraint] = None
+    # shared with the interactive router, so fold budgets adapt from observed reply lengths
+    budgets: Optional[BudgetController] = None
+    # S2 and parallel-fold calls are recorded here (e.g. core.usage.USAGE, the router's ledger)
+    ledger: Optional[UsageLedger] = None
+
+    def __post_init__(self) -> None:
+        if self.constraint is None:
+            self.constraint = build_constraint(self.dispatcher.registry)
 
     def run_s2_fold_loop(self, memory: Memory, ctx: ExecutionContext, max_iters: int = 50) -> DispatchResult:
-        inner = S2FoldLoopStep(dispatcher=self.dispatcher, llm=self.llm)
+        inner = S2FoldLoopStep(
+            dispatcher=self.dispatcher,
+            llm=self.llm,
+            scheduler=self.scheduler,
+            llm_key=self.llm_key,
+            constraint=self.constraint,
+            budgets=self.budgets,
+            ledger=self.ledger,
+        )
         loop = StepLoop(inner_step=inner, max_iters=max_iters)
         return loop.execute(memory, ctx)
+
+    def run_parallel_fold(
+        self,
+        memory: Memory,
+        ctx: ExecutionContext,
+        keys: Optional[Sequence[str]] = None,
+        max_workers: int = 4,
+        max_region_chars: int = 6000,
+    ) -> DispatchResult:
+        """One map-reduce pass: BODY regions are folded concurrently across ctx.llm_pool keys."""
+        folder = ParallelFolder(
+            llm_pool=ctx.llm_pool,
+            keys=tuple(keys or ()),
+            max_workers=max_workers,
+            max_region_chars=max_region_chars,
+            scheduler=self.scheduler,
+            session=ctx.session_id,
+            budgets=self.budgets,
+            ledger=self.ledger,
+            deadline=ctx.deadline,
+            constraint=self.constraint,
+        )
+        folder.run(memory)
+        return DispatchResult(memory=memory)
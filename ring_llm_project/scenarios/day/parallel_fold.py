@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.budget import BudgetController, GenerationBudget, chat_with_budget
+from core.constraints import PARSE_STATS, ResponseConstraint, error_kind
+from core.deadline import DEADLINE_METRICS, Deadline
+from core.llm_client import LLMClient
+from core.memory import Memory
+from core.normalizer import NormalizeConfig, strip_leading_thoughts
+from core.parser import ParseError, parse_command_block
+from core.scheduler import LLMScheduler, Priority, QueueTimeout
+from core.usage import UsageLedger, timed_chat
+from core.validator import CommandValidator
+
+
+@dataclass(frozen=True)
+class BodyRegion:
+    """Independent slice of BODY sent to one LLM call. Offsets are absolute."""
+
+    index: int
+    start: int
+    end: int
+    text: str
+
+
+@dataclass(frozen=True)
+class FoldProposal:
+    """FOLD returned by a region worker, already mapped to absolute body offsets."""
+
+    region_index: int
+    start: int
+    end: int
+    label: str
+    llm_key: str
+
+
+def partition_body(body: str, max_region_chars: int = 6000) -> List[BodyRegion]:
+    """Split BODY into regions on paragraph boundaries.
+
+    Paragraphs are packed greedily up to max_region_chars. A single paragraph
+    that is longer than the limit is cut at the last newline before the limit.
+    """
+    if max_region_chars < 1:
+        raise ValueError("max_region_chars must be >= 1")
+
+    regions: List[BodyRegion] = []
+    n = len(body)
+    pos = 0
+    while pos < n:
+        limit = min(n, pos + max_region_chars)
+        if limit == n:
+            cut = n
+        else:
+            cut = body.rfind("\n\n", pos, limit)
+            if cut > pos:
+                cut += 2
+            else:
+                cut = body.rfind("\n", pos, limit)
+                cut = cut + 1 if cut > pos else limit
+        regions.append(BodyRegion(index=len(regions), start=pos, end=cut, text=body[pos:cut]))
+        pos = cut
+    return regions
+
+
+def merge_proposals(proposals: Sequence[FoldProposal]) -> List[FoldProposal]:
+    """Resolve overlapping proposals deterministically.
+
+    Order: earliest start wins, then the longer range, then the lower region
+    index, then the label. Anything overlapping an accepted range is dropped.
+    """
+    ordered = sorted(proposals, key=lambda p: (p.start, -(p.end - p.start), p.region_index, p.label))
+    accepted: List[FoldProposal] = []
+    last_end = -1
+    for p in ordered:
+        if p.start < last_end:
+            continue
+        accepted.append(p)
+        last_end = p.end
+    return accepted
+
+
+@dataclass
+class ParallelFolder:
+    """Map-reduce folding: regions are folded concurrently, proposals merged, applied once.
+
+    Regions are assigned to llm keys round-robin by region index, so the same
+    body and key list always produce the same assignment. With a deadline,
+    regions that have not started when it passes are skipped, and the
+    scheduler wait and request timeout of the others are bounded by it.
+    """
+
+    llm_pool: Dict[str, LLMClient]
+    keys: Sequence[str] = ()
+    max_workers: int = 4
+    max_region_chars: int = 6000
+    max_folds_per_region: int = 3
+    normalize_cfg: NormalizeConfig = field(default_factory=NormalizeConfig)
+    scheduler: Optional[LLMScheduler] = None
+    session: str = "default"
+    # several <CMD> blocks per region, so no stop string
+    budget: GenerationBudget = GenerationBudget(kind="parallel_fold", max_tokens=768, temperature=0.1)
+    budgets: Optional[BudgetController] = None
+    ledger: Optional[UsageLedger] = None
+    deadline: Optional[Deadline] = None
+    # grammar/schema from the registry (see LLMConfig.constraint); it allows one block per
+    # reply, so with a constraining server each region proposes at most one fold
+    constraint: Optional[ResponseConstraint] = None
+
+    def __post_init__(self) -> None:
+        if not self.keys:
+            self.keys = tuple(self.llm_pool.keys())
+        missing = [k for k in self.keys if k not in self.llm_pool]
+        if missing:
+            raise KeyError(f"LLM keys not found: {missing}. Available: {list(self.llm_pool.keys())}")
+        if not self.keys:
+            raise ValueError("ParallelFolder needs at least one llm key")
+        if self.max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+
+    def run(self, memory: Memory) -> List[str]:
+        """Fold memory.body in place and return the created fold ids (body order)."""
+        proposals, errors = self.propose(memory.body_text())
+        for err in errors:
+            memory.push_history(err)
+
+        merged = merge_proposals(proposals)
+        # Apply back-to-front so earlier offsets stay valid.
+        fold_ids: List[str] = []
+        for p in reversed(merged):
+            fold_ids.append(memory.fold_by_offsets(p.start, p.end, p.label))
+        fold_ids.reverse()
+        return fold_ids
+
+    def propose(self, body: str) -> Tuple[List[FoldProposal], List[str]]:
+        regions = partition_body(body, self.max_region_chars)
+        if not regions:
+            return [], []
+
+        workers = min(self.max_workers, len(regions))
+        # regions beyond the first `workers` wait in the pool; _fold_region drops them once the deadline passed
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fold") as pool:
+            futures = [
+                pool.submit(self._fold_region, region, self.keys[region.index % len(self.keys)])
+                for region in regions
+            ]
+            results = [f.result() for f in futures]
+
+        proposals: List[FoldProposal] = []
+        errors: List[str] = []
+        for region_props, err in results:
+            proposals.extend(region_props)
+            if err:
+                errors.append(err)
+        return proposals, errors
+
+    # ----------------------------
+    # Region worker
+    # ----------------------------
+
+    def _fold_region(self, region: BodyRegion, key: str) -> Tuple[List[FoldProposal], Optional[str]]:
+        deadline = self.deadline
+        if deadline is not None and deadline.expired():
+            DEADLINE_METRICS.incr("skipped_calls")
+            return [], None
+        messages = [
+            {"role": "system", "content": "Return only <CMD> blocks."},
+            {"role": "user", "content": self._region_prompt(region)},
+        ]
+        llm = self.llm_pool[key]
+        default_max = getattr(getattr(llm, "cfg", None), "max_tokens", 1024)
+
+        def ask_llm() -> str:
+            kw = {} if self.constraint is None else {"constraint": self.constraint}
+            if deadline is not None:
+                # timeout from what is left of the deadline once the call leaves the scheduler queue
+                kw["timeout_s"] = deadline.timeout(float("inf"))
+            return timed_chat(
+                lambda: chat_with_budget(llm.chat, self.budget, self.budgets, default_max, messages=messages, **kw),
+                self.ledger,
+                messages,
+                session=self.session,
+                step=type(self).__name__,
+                key=key,
+            )
+
+        try:
+            if self.scheduler is not None:
+                raw = self.scheduler.run(
+                    key, ask_llm, priority=Priority.BACKGROUND, session=self.session, deadline=deadline
+                )
+            else:
+                raw = ask_llm()
+        except QueueTimeout:
+            return [], None
+        except Exception as exc:  # one dead endpoint must not sink the other regions
+            return [], f"[PARALLEL_FOLD_ERROR] region={region.index} key={key} {type(exc).__name__}: {exc}"
+
+        cleaned = strip_leading_thoughts(raw, self.normalize_cfg)
+        v = CommandValidator(mode="mixed").validate(cleaned)
+        if not v.ok:
+            PARSE_STATS.failure(error_kind(v.error or "invalid"))
+            return [], None
+
+        proposals: List[FoldProposal] = []
+        parsed = 0
+        parse_error = ""
+        for block in v.cmd_blocks[: self.max_folds_per_region]:
+            try:
+                call = parse_command_block(block)
+            except ParseError as exc:
+                parse_error = parse_error or str(exc)
+                continue
+            parsed += 1
+            if call.name != "FOLD":
+                continue
+            start = call.payload.get("START", "")
+            end = call.payload.get("END", "")
+            label = call.payload.get("LABEL", "").strip()
+            if not start or not end or not label:
+                continue
+            i = region.text.find(start)
+            if i < 0:
+                continue
+            j = region.text.find(end, i + len(start))
+            if j < 0:
+                continue
+            proposals.append(FoldProposal(
+                region_index=region.index,
+                start=region.start + i,
+                end=region.start + j + len(end),
+                label=label,
+                llm_key=key,
+            ))
+        # one outcome per reply, like S2: a reply with no usable block costs a retry
+        if parsed:
+            PARSE_STATS.ok()
+        else:
+            PARSE_STATS.failure(error_kind(parse_error))
+        return proposals, None
+
+    def _region_prompt(self, region: BodyRegion) -> str:
+        return (
+            "You are a memory manager. You see ONE REGION of the memory BODY. "
+            "Your job is to reduce noise/length by folding chunks into folds.\n\n"
+            "Rules:\n"
+            f"- Output up to {self.max_folds_per_region} FOLD <CMD> blocks and nothing else.\n"
+            "- Folds must not overlap.\n"
+            "- For FOLD, START and END must be exact substrings of REGION, END after START.\n"
+            "- If nothing in REGION should be folded, output LOOP DONE.\n\n"
+            "Format:\n"
+            "<CMD>\nFOLD\nLABEL:\n...\nSTART:\n...\nEND:\n...\n</CMD>\n\n"
+            "REGION:\n"
+            "-----\n"
+            f"{region.text}\n"
+            "-----\n"
+        )
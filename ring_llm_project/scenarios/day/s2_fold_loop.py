@@ -3,17 +3,27 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Dict, Optional
 
+from core.budget import FOLD_BUDGET, BudgetController, GenerationBudget, chat_with_budget
+from core.constraints import PARSE_STATS, ResponseConstraint, error_kind
 from core.dispatcher import CommandDispatcher
 from core.llm_client import LLMClient
 from core.memory import Memory
 from core.normalizer import NormalizeConfig, strip_leading_thoughts
 from core.parser import parse_command_block
+from core.scheduler import LLMScheduler, Priority, QueueTimeout
 from core.step_loop import Step
+from core.usage import UsageLedger, timed_chat
 from core.types import DispatchResult, ExecutionContext
 from core.validator import CommandValidator
 
 
+def pool_key(llm_pool: Dict[str, object], llm: object) -> Optional[str]:
+    """Key under which llm is registered in llm_pool, if it is."""
+    return next((k for k, v in llm_pool.items() if v is llm), None)
+
+
 @dataclass
 class S2FoldLoopStep(Step):
     """Iteratively folds noisy/long parts of BODY until the model responds with LOOP DONE."""
@@ -22,6 +32,17 @@ class S2FoldLoopStep(Step):
     llm: LLMClient
     normalize_cfg: NormalizeConfig = NormalizeConfig()
     max_body_chars: int = 6000  # just to keep prompts bounded
+    # background priority: queued behind interactive turns when a scheduler is shared
+    scheduler: Optional[LLMScheduler] = None
+    # pool key of `llm`: the scheduler queue it shares with interactive calls to the same endpoint
+    # (None = looked up in ctx.llm_pool, "fold" if it is not there)
+    llm_key: Optional[str] = None
+    # grammar/schema from the registry, so malformed blocks can't be sampled (see LLMConfig.constraint)
+    constraint: Optional[ResponseConstraint] = None
+    # one short <CMD> block: small max_tokens, stop at </CMD>; narrowed further by `budgets`
+    budget: GenerationBudget = FOLD_BUDGET
+    budgets: Optional[BudgetController] = None
+    ledger: Optional[UsageLedger] = None
 
     def execute(self, memory: Memory, ctx: ExecutionContext) -> DispatchResult:
         body = memory.body_text()
@@ -48,19 +69,51 @@ class S2FoldLoopStep(Step):
             "-----\n"
         )
 
-        raw = self.llm.chat([
+        messages = [
             {"role": "system", "content": "Return only a <CMD> block."},
             {"role": "user", "content": prompt},
-        ])
+        ]
+        kwargs = {}
+        if ctx.deadline is not None and ctx.deadline.expired():
+            return DispatchResult(memory=memory, break_loop=True)
+        if self.constraint is not None:
+            kwargs["constraint"] = self.constraint
+        default_max = getattr(getattr(self.llm, "cfg", None), "max_tokens", 1024)
+
+        key = self.llm_key or pool_key(ctx.llm_pool, self.llm) or "fold"
+
+        def ask_llm() -> str:
+            # timeout from what is left of the deadline once the call leaves the scheduler queue
+            kw = kwargs if ctx.deadline is None else dict(kwargs, timeout_s=ctx.deadline.timeout(float("inf")))
+            return timed_chat(
+                lambda: chat_with_budget(self.llm.chat, self.budget, self.budgets, default_max, messages=messages, **kw),
+                self.ledger,
+                messages,
+                session=ctx.session_id,
+                step=type(self).__name__,
+                key=key,
+            )
+
+        if self.scheduler is not None:
+            try:
+                raw = self.scheduler.run(
+                    key, ask_llm, priority=Priority.BACKGROUND, session=ctx.session_id, deadline=ctx.deadline
+                )
+            except QueueTimeout:
+                return DispatchResult(memory=memory, break_loop=True)
+        else:
+            raw = ask_llm()
         cleaned = strip_leading_thoughts(raw, self.normalize_cfg)
 
-        validator = CommandValidator(strict=True)
+        validator = CommandValidator(mode="strict")
         v = validator.validate(cleaned)
         if not v.ok:
+            PARSE_STATS.failure(error_kind(v.error or "invalid"))
             # keep raw assistant message for debugging, but do not break execution
             memory.add_history(f"[S2_PARSE_ERROR] {v.error}\nRAW:\n{raw}")
             return DispatchResult(memory=memory, output_text=None)
 
+        PARSE_STATS.ok()
         block = v.cmd_blocks[0]
         call = parse_command_block(block)
 
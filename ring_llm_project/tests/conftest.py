@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Tests import the project the way run_from_pycharm.py and cli.py do: from ring_llm_project/."""
+
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def stub_llm():
+    """start(replies) -> (base_url, StubLLM): an OpenAI-compatible stub answering replies in order."""
+    from bench.stub_llm_server import make_server
+
+    servers = []
+
+    def start(replies):
+        server, stub = make_server(malformed=0.0, replies=replies)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", stub
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
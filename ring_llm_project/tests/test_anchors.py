@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from core.anchors import AddressingStats, AnchorIndex, parse_anchor
+
+
+def _body(n, tag="line"):
+    return "".join(f"{tag} {k}\n" for k in range(n))
+
+
+def test_splice_keeps_ids_outside_the_edit():
+    rng = random.Random(11)
+    body = _body(12)
+    idx = AnchorIndex(body)
+    seen = set(idx.ids)
+    for step in range(400):
+        i = rng.randint(0, len(body))
+        j = min(len(body), i + rng.choice([0, 0, 3, 10, 30]))
+        text = rng.choice(["", "x", "new\n", f"a{step}\nb{step}\n", "tail\nhead"])
+        a, b = body.count("\n", 0, i), body.count("\n", 0, j)
+        before, after = idx.ids[:a], idx.ids[b + 1:]
+        idx.splice(body, i, j, text)
+        body = body[:i] + text + body[j:]
+        assert len(idx.ids) == body.count("\n") + 1
+        assert len(set(idx.ids)) == len(idx.ids)
+        assert idx.ids[:a] == before
+        assert idx.ids[len(idx.ids) - len(after):] == after
+        fresh = set(idx.ids) - seen
+        assert all(x > max(seen) for x in fresh)
+        seen |= fresh
+
+
+def test_whole_line_edits():
+    body = _body(4)
+    idx = AnchorIndex(body)
+    i = body.index("line 1")
+    j = body.index("line 3")
+    idx.splice(body, i, j, "x\n")  # lines 1 and 2 -> one new line
+    assert idx.ids == [1, 6, 4, 5]
+    body = body[:i] + "x\n" + body[j:]
+    i = body.index("x")
+    idx.splice(body, i, i + 1, "y")  # edit inside a line keeps its id
+    assert idx.ids == [1, 6, 4, 5]
+
+
+def test_rebase_matches_unchanged_lines():
+    old = _body(6)
+    idx = AnchorIndex(old)
+    new = "inserted\n" + old.replace("line 2\n", "changed\n") + "more\n"
+    idx.rebase(old, new)
+    lines = new.split("\n")
+    by_text = dict(zip(lines, idx.ids))
+    assert by_text["line 0"] == 1 and by_text["line 5"] == 6
+    assert by_text["inserted"] > 7 and by_text["changed"] > 7 and by_text["more"] > 7
+    assert len(idx.ids) == len(lines)
+    idx.rebase(new, new)
+    assert dict(zip(lines, idx.ids)) == by_text
+
+
+def test_span_render_and_state():
+    body = _body(3)
+    idx = AnchorIndex(body)
+    assert idx.render(body) == "L1| line 0\nL2| line 1\nL3| line 2"
+    assert body[slice(*idx.span(body, 2, 3))] == "line 1\nline 2\n"
+    assert body[slice(*idx.span(body, 4, 4))] == ""
+    with pytest.raises(ValueError):
+        idx.span(body, 3, 2)
+    with pytest.raises(ValueError):
+        idx.line_of(99)
+    copy = AnchorIndex.from_state(idx.to_state())
+    copy.splice(body, 0, 0, "top\n")
+    assert idx.ids == [1, 2, 3, 4] and copy.ids == [5, 1, 2, 3, 4]
+
+
+def test_parse_anchor():
+    assert parse_anchor(" L12 ") == 12
+    with pytest.raises(ValueError):
+        parse_anchor("line 12")
+
+
+def test_addressing_stats():
+    stats = AddressingStats()
+    stats.record("anchor", address="L1 L4", ok=True, substring_equiv=20)
+    stats.record("anchor", address="L9 L9", ok=False, substring_equiv=10)
+    stats.record("substring", address="Vin 12 V ... ripple", ok=True)
+    snap = stats.snapshot()
+    assert snap["anchor"]["calls"] == 2 and snap["anchor"]["failure_rate"] == 0.5
+    assert snap["anchor"]["avg_substring_equiv_tokens"] == 15.0
+    assert snap["substring"]["failure_rate"] == 0.0
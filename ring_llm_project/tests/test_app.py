@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from app import AgentApp
+from core.dispatcher import CommandDispatcher, CommandRegistry
+from core.memory import Memory
+from core.types import DispatchResult
+
+
+class _TrimEngine:
+    """Stands in for DayEngine: the "fold loop" cuts BODY down to `keep` chars."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.runs = 0
+
+    def run_s2_fold_loop(self, memory, ctx, max_iters=50):
+        self.runs += 1
+        memory.body = memory.body[-self.keep:]
+        return DispatchResult(memory=memory)
+
+
+def test_background_folding_uses_fold_hysteresis():
+    mem = Memory(max_chars=2_000)
+    base = mem.text_len()
+    engine = _TrimEngine(keep=1_700 - base)  # a pass leaves memory at 85% of max_chars
+    app = AgentApp(llm_pool={}, dispatcher=CommandDispatcher(CommandRegistry()), day_engine=engine, memory=mem)
+    app.start_background_folding(idle_delay_s=3600)
+    app.maintenance.stop()  # drive it by hand
+
+    mem.body = "x" * (2_100 - base)
+    assert app.maintenance.run_pending()
+    assert engine.runs == 1 and 1_600 < mem.text_len() < 1_800
+
+    # just above max_chars again, but the pass above never got below low water: no new pass
+    mem.append_body("y" * 350)
+    assert mem.text_len() > mem.max_chars
+    assert not app.maintenance.run_pending()
+    assert engine.runs == 1
+
+    # below low water re-arms the trigger
+    mem.body = "z" * (1_000 - base)
+    assert not app.maintenance.run_pending()
+    mem.append_body("w" * 1_200)
+    assert app.maintenance.run_pending()
+    assert engine.runs == 2
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pytest
+
+from core.balancer import EndpointPool, PoolConfig
+
+
+class _Client:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+        self.healthy = True
+
+    def chat(self, messages, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return self.name
+
+    def health(self):
+        return self.healthy
+
+
+def _pool(**cfg):
+    a, b = _Client("a"), _Client("b")
+    return EndpointPool({"a": a, "b": b}, PoolConfig(probe_interval_s=0, **cfg)), a, b
+
+
+def _breaker(pool, name):
+    return pool.stats()["endpoints"][name]["breaker"]
+
+
+def test_least_outstanding_then_lowest_latency():
+    pool, a, b = _pool()
+    first = pool._acquire([])
+    second = pool._acquire([])
+    assert {first.name, second.name} == {"a", "b"}  # a busy endpoint is avoided
+    pool._release(first, 50.0, None)
+    pool._release(second, 10.0, None)
+    assert {pool.chat([]) for _ in range(5)} == {second.name}
+
+
+def test_ewma_strategy_weighs_latency_by_load():
+    pool, a, b = _pool(strategy="ewma")
+    ea, eb = pool.endpoints
+    ea.ewma_ms, eb.ewma_ms = 10.0, 25.0
+    ea.in_flight = 2  # (10 + 1) * 3 > (25 + 1) * 1
+    assert pool.chat([]) == "b"
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_over():
+    pool, a, b = _pool(failure_threshold=2, cooldown_s=60)
+    a.fail = True
+    assert {pool.chat([]) for _ in range(4)} == {"b"}
+    assert _breaker(pool, "a") == "open"
+    assert pool.stats()["failovers"] == 2
+    calls = a.calls
+    for _ in range(5):
+        assert pool.chat([]) == "b"
+    assert a.calls == calls  # ejected endpoints get no traffic
+
+
+def test_half_open_trial_closes_or_reopens():
+    pool, a, b = _pool(failure_threshold=1, cooldown_s=0.05)
+    a.fail = True
+    pool.chat([])
+    pool.chat([])
+    assert _breaker(pool, "a") == "open"
+    time.sleep(0.06)
+    assert _breaker(pool, "a") == "half_open"
+    calls = a.calls
+    for _ in range(2):
+        pool.chat([])
+    assert a.calls == calls + 1  # one trial; it failed, so the breaker opened again
+    assert _breaker(pool, "a") == "open"
+    time.sleep(0.06)
+    a.fail = False
+    for _ in range(4):
+        pool.chat([])
+    assert _breaker(pool, "a") == "closed"
+    assert pool.stats()["endpoints"]["a"]["ok"] >= 1
+
+
+def test_all_endpoints_down():
+    pool, a, b = _pool(failure_threshold=1, cooldown_s=60)
+    a.fail = b.fail = True
+    with pytest.raises(ConnectionError):
+        pool.chat([])
+    with pytest.raises(RuntimeError):
+        pool.chat([])
+    assert pool.stats()["rejected"] == 1
+
+
+def test_probe_takes_unhealthy_endpoints_out():
+    pool, a, b = _pool()
+    b.healthy = False
+    pool.probe()
+    assert {pool.chat([]) for _ in range(4)} == {"a"}
+    b.healthy = True
+    pool.probe()
+    assert pool.chat([]) == "b"  # no latency yet: scores as fast
+
+
+def test_bad_config():
+    with pytest.raises(ValueError):
+        EndpointPool({})
+    with pytest.raises(ValueError):
+        EndpointPool({"a": _Client("a")}, PoolConfig(strategy="random"))
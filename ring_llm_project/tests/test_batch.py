@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import batch
+
+
+def _ask(q):
+    return f"<CMD>\nASK\n{q}\n</CMD>"
+
+
+def _say(text):
+    return f"<CMD>\nSAY\nTEXT:\n{text}\n</CMD>"
+
+
+def _run(tmp_path, url, sessions):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    src.write_text("\n".join(json.dumps(s) for s in sessions) + "\n", encoding="utf-8")
+    # one worker: the stub's replies are consumed in session order
+    status = batch.main([str(src), "-o", str(dst), "-w", "1", "--llm-url", url, "--model", "stub", "--dump-memory"])
+    return status, [json.loads(line) for line in dst.read_text(encoding="utf-8").splitlines()]
+
+
+def test_two_sessions(tmp_path, stub_llm):
+    # one control call per turn
+    url, stub = stub_llm([_ask("Topology?"), _say("noted"), _ask("Frequency?"), _ask("Ripple?")])
+    status, records = _run(tmp_path, url, [
+        {"session": "s1", "turns": ["hi", "thanks"], "answers": ["buck"]},
+        {"session": "s2", "turns": [{"user": "go", "answers": ["100 kHz"]}, "and?"], "answers": ["1%"]},
+    ])
+
+    assert status == 0
+    assert stub.requests == 4
+    assert [(r["type"], r["session"], r.get("turn")) for r in records] == [
+        ("turn", "s1", 0), ("turn", "s1", 1), ("session", "s1", None),
+        ("turn", "s2", 0), ("turn", "s2", 1), ("session", "s2", None),
+    ]
+    turns = [r for r in records if r["type"] == "turn"]
+    assert [r["user"] for r in turns] == ["hi", "thanks", "go", "and?"]
+    assert [r["said"] for r in turns] == [["Topology?"], ["noted"], ["Frequency?"], ["Ripple?"]]
+    assert all(r["error"] is None for r in turns)
+
+    s1, s2 = records[2], records[5]
+    assert (s1["turns"], s1["asked"], s1["error"]) == (2, 1, None)
+    assert (s2["turns"], s2["asked"], s2["error"]) == (2, 2, None)
+    # the turn's own answers are used before the session-wide ones
+    mem = s2["memory"]
+    assert mem.index("USER(answer): 100 kHz") < mem.index("USER(answer): 1%")
+    assert "USER(answer): buck" in s1["memory"]
+
+
+def test_unscripted_ask_fails_the_session(tmp_path, stub_llm):
+    url, _ = stub_llm([_ask("Topology?"), _say("ok")])
+    status, records = _run(tmp_path, url, [
+        {"session": "s1", "turns": ["hi", "never run"]},
+    ])
+
+    assert status == 1
+    assert [r["type"] for r in records] == ["turn", "session"]
+    assert records[0]["error"].startswith("ScriptExhausted")
+    assert records[1]["turns"] == 1
+    assert records[1]["error"].startswith("turn 0: ScriptExhausted")
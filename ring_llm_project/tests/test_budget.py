@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from core.budget import (
+    FOLD_BUDGET,
+    INTERACTIVE_BUDGET,
+    BudgetController,
+    ChatResponse,
+    chat_with_budget,
+    restore_stop,
+)
+
+
+def _reply(tokens, cmd="FOLD", finish="stop"):
+    return ChatResponse(f"<CMD>\n{cmd}\n</CMD>", finish_reason=finish, completion_tokens=tokens)
+
+
+def test_interactive_keeps_configured_cap():
+    bc = BudgetController(min_samples=4)
+    for _ in range(20):
+        bc.observe(INTERACTIVE_BUDGET, _reply(40, "SAY"))
+    assert bc.resolve(INTERACTIVE_BUDGET, 1024).max_tokens == 1024
+    assert bc.stats()["interactive"]["commands"]["SAY"]["calls"] == 20
+
+
+def test_background_kind_narrows_to_observed_lengths():
+    bc = BudgetController(min_samples=4, headroom=1.25, margin_tokens=16)
+    assert bc.resolve(FOLD_BUDGET, 1024).max_tokens == 384  # too few samples: declared
+    for _ in range(10):
+        bc.observe(FOLD_BUDGET, _reply(80))
+    resolved = bc.resolve(FOLD_BUDGET, 1024)
+    assert resolved.max_tokens == int(80 * 1.25) + 16
+    assert resolved.stop == FOLD_BUDGET.stop
+
+
+def test_truncation_boost_never_exceeds_declared():
+    bc = BudgetController(min_samples=4)
+    for _ in range(10):
+        bc.observe(FOLD_BUDGET, _reply(80))
+    narrowed = bc.resolve(FOLD_BUDGET, 1024).max_tokens
+    bc.observe(FOLD_BUDGET, _reply(narrowed, finish="length"))
+    assert narrowed < bc.resolve(FOLD_BUDGET, 1024).max_tokens <= 384
+    for _ in range(5):
+        bc.observe(FOLD_BUDGET, _reply(384, finish="length"))
+    assert bc.resolve(FOLD_BUDGET, 1024).max_tokens == 384
+
+
+def test_chat_with_budget_resolves_and_observes():
+    bc = BudgetController(min_samples=1)
+    sent = []
+
+    def chat(budget, messages):
+        sent.append(budget.max_tokens)
+        return _reply(50)
+
+    for _ in range(2):
+        chat_with_budget(chat, FOLD_BUDGET, bc, 1024, messages=[])
+    assert sent == [384, int(50 * 1.25) + 16]
+
+
+def test_restore_stop_closes_open_block():
+    assert restore_stop("<CMD>\nSAY\nhi", ("</CMD>",)) == "<CMD>\nSAY\nhi\n</CMD>"
+    assert restore_stop("<CMD>\nSAY\n</CMD>", ("</CMD>",)) == "<CMD>\nSAY\n</CMD>"
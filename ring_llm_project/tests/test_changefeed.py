@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from core import changefeed as cf
+from core.changefeed import ChangeFeed, MemoryView
+from core.memory import Memory
+
+
+def test_changes_since_is_contiguous_and_bounded():
+    feed = ChangeFeed(maxlen=3)
+    assert feed.changes_since(0) == []
+    for k in range(5):
+        feed.emit(cf.CLIPBOARD, cf.RESET, text=str(k))
+    assert [d.seq for d in feed.changes_since(2)] == [3, 4, 5]
+    assert [d.text for d in feed.changes_since(3)] == ["3", "4"]
+    assert feed.changes_since(5) == []
+    assert feed.changes_since(1) is None  # 2 has fallen off the log
+
+
+def _mirror(mem):
+    return (mem.body, [e.render() for e in mem.history.tail(mem.history_limit)], mem.clipboard, dict(mem.state))
+
+
+def _view(view):
+    return (view.body, view.history, view.clipboard, view.state)
+
+
+def _mutate(mem, rng, k):
+    op = rng.randrange(6)
+    if op == 0 or not mem.body:
+        mem.insert_at(rng.randint(0, len(mem.body)), f"line {k}\n")
+    elif op == 1:
+        i = rng.randint(0, len(mem.body))
+        mem.delete_offsets(i, min(len(mem.body), i + rng.randint(0, 12)))
+    elif op == 2:
+        mem.add_event(rng.choice(["user", "assistant"]), f"event {k}")
+    elif op == 3:
+        mem.state[f"k{rng.randrange(4)}"] = str(k)
+    elif op == 4:
+        mem.state.pop(f"k{rng.randrange(4)}", None)
+    else:
+        mem.clipboard = f"clip {k}"
+
+
+def test_view_follows_memory_through_deltas():
+    rng = random.Random(3)
+    mem = Memory(history_limit=5, body="start\n", max_chars=100_000)
+    view = MemoryView(history_limit=5)
+    view.apply(mem.snapshot_deltas())
+    for k in range(300):
+        _mutate(mem, rng, k)
+        if rng.random() < 0.3:
+            view.apply(mem.changes_since(view.seq))
+            assert _view(view) == _mirror(mem)
+    view.apply(mem.changes_since(view.seq))
+    assert _view(view) == _mirror(mem)
+    assert view.seq == mem.changes.seq
+
+
+def test_lagging_view_resyncs_from_snapshot():
+    mem = Memory(history_limit=5, body="a\n", max_chars=100_000)
+    mem.changes = ChangeFeed(maxlen=4)
+    view = MemoryView(history_limit=5)
+    view.apply(mem.snapshot_deltas())
+    for k in range(10):
+        mem.add_event("user", f"event {k}")
+    assert mem.changes_since(view.seq) is None
+    view.apply(mem.snapshot_deltas())
+    assert _view(view) == _mirror(mem)
+    mem.insert_at(0, "b\n")
+    view.apply(mem.changes_since(view.seq))
+    assert view.body == "b\na\n"
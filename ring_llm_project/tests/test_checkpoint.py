@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from core.checkpoint import CheckpointError, Checkpointer, load_checkpoint, save_checkpoint
+from core.memory import Memory
+from core.memory_store import MemoryCheckpointer
+from core.process import Process, ProcessConfig
+
+
+def test_process_position_round_trip(tmp_path):
+    path = str(tmp_path / "session.ckpt")
+    mem = Memory(body="Specs:\nVin 12 V\n")
+    cfg = ProcessConfig(control_llm_key="main", turn_budget_s=30.0, addressing="anchors")
+    process = Process(cfg, mem, behavior=None)
+    process.turns = 4
+    process.pending_user = "fold the specs"
+    save_checkpoint(process, path)
+
+    resumed = load_checkpoint(path)
+    assert resumed.cfg == cfg
+    assert (resumed.turns, resumed.pending_user) == (4, "fold the specs")
+    assert resumed.mem.to_text() == mem.to_text()
+    assert isinstance(resumed.checkpointer, Checkpointer)
+    assert resumed.checkpointer.save(process).folds_written == 0
+
+
+def test_memory_save_is_not_a_process_checkpoint(tmp_path):
+    path = str(tmp_path / "mem.ckpt")
+    MemoryCheckpointer(path).save_memory(Memory(body="x\n"))
+    with pytest.raises(CheckpointError):
+        load_checkpoint(path)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+
+import pytest
+
+from core.constraints import (
+    CommandShape,
+    ParseStats,
+    build_constraint,
+    build_gbnf,
+    build_json_schema,
+    command_fields,
+    error_kind,
+    json_to_cmd_block,
+)
+from core.parser import parse_command_block
+from main import build_registry
+
+SHAPES = [CommandShape("FOLD", ("LABEL", "START", "END")), CommandShape("LOOP DONE", ())]
+
+
+def _rules(gbnf):
+    defs = {}
+    for line in gbnf.strip().splitlines():
+        name, _, rhs = line.partition(" ::= ")
+        defs[name] = rhs
+    return defs
+
+
+def test_command_fields_in_first_seen_order():
+    help_text = "FOLD\nLABEL:\n<label>\nSTART:\n...\nEND:\n...\nLABEL:\nagain\nnot a key: x\n"
+    assert command_fields(help_text) == ("LABEL", "START", "END")
+    assert command_fields("") == ()
+
+
+def test_gbnf_defines_every_rule_it_references():
+    defs = _rules(build_gbnf(SHAPES))
+    assert defs["command"] == "cmd-fold | cmd-loop-done"
+    assert defs["cmd-fold"] == '"FOLD\\n" ("LABEL:\\n" line+)? ("START:\\n" line+)? ("END:\\n" line+)?'
+    assert defs["cmd-loop-done"] == '"LOOP DONE\\n" line*'
+    for rhs in defs.values():
+        bare = re.sub(r'"(?:\\.|[^"\\])*"|\[[^\]]*\]', " ", rhs)
+        for ref in re.findall(r"[a-z][a-z0-9-]*", bare):
+            assert ref in defs, ref
+    with pytest.raises(ValueError):
+        build_gbnf([])
+
+
+def test_json_reply_maps_back_to_a_parseable_block():
+    schema = build_json_schema(SHAPES)
+    assert schema["properties"]["command"]["enum"] == ["FOLD", "LOOP DONE"]
+    assert set(schema["properties"]) == {"command", "LABEL", "START", "END", "text"}
+    reply = json.dumps({"command": "FOLD", "LABEL": "Old notes", "START": "Specs: Vin", "END": "0.5%\n", "text": ""})
+    block = json_to_cmd_block(reply)
+    assert block.startswith("<CMD>\n") and block.endswith("\n</CMD>")
+    call = parse_command_block(block[len("<CMD>"):-len("</CMD>")])
+    assert call.name == "FOLD"
+    assert call.payload == {"LABEL": "Old notes", "START": "Specs: Vin", "END": "0.5%"}
+    say = json_to_cmd_block(json.dumps({"command": "SAY", "text": "hello\nthere"}))
+    assert say == "<CMD>\nSAY\nhello\nthere\n</CMD>"
+
+
+def test_non_json_replies_pass_through():
+    for raw in ("<CMD>\nSAY\n</CMD>", "{not json", '{"text": "no command"}', "[1, 2]"):
+        assert json_to_cmd_block(raw) == raw
+
+
+def test_constraint_from_the_real_registry_and_apply_modes():
+    constraint = build_constraint(build_registry())
+    assert "cmd-fold" in _rules(constraint.gbnf)
+    assert "FOLD" in constraint.json_schema["properties"]["command"]["enum"]
+    payloads = {}
+    for mode in ("none", "gbnf", "ollama", "json_schema"):
+        payloads[mode] = {}
+        constraint.apply(mode, payloads[mode])
+    assert payloads["none"] == {}
+    assert payloads["gbnf"]["grammar"] == constraint.gbnf
+    assert payloads["ollama"]["format"] is constraint.json_schema
+    assert payloads["json_schema"]["response_format"]["json_schema"]["schema"] is constraint.json_schema
+    with pytest.raises(ValueError):
+        constraint.apply("xml", {})
+
+
+def test_parse_stats_and_error_kind():
+    stats = ParseStats()
+    stats.ok()
+    stats.failure(error_kind("Unknown command: FOO"))
+    stats.failure(error_kind("Unknown command: BAR"))
+    stats.finish_turn()
+    stats.ok()
+    stats.finish_turn()
+    snap = stats.snapshot()
+    assert snap["replies"] == 4 and snap["failure_rate"] == 0.5
+    assert snap["by_error"] == {"Unknown command": 2}
+    assert snap["max_retries_per_turn"] == 2 and snap["retries_per_turn"] == 1.0
+    assert error_kind("") == "unknown"
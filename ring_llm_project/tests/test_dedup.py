@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+
+import pytest
+
+from core.dedup import MinHasher, NearDuplicateIndex, collapse_near_duplicates, jaccard, shingles
+from core.memory import Memory
+from core.memory_store import MemoryCheckpointer, load_memory
+
+_WORDS = "buck boost flyback inductor ripple mosfet gate driver snubber diode capacitor thermal".split()
+
+
+def _sentence(rng, n=30):
+    return " ".join(rng.choice(_WORDS) + str(rng.randrange(50)) for _ in range(n))
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Vin = 12 V, ripple 1%") == shingles("vin 12 v ripple 1")
+    assert shingles("--- ...") == frozenset()
+    assert len(shingles("two words")) == 1
+    assert jaccard("", "") == 1.0
+
+
+def test_minhash_estimates_jaccard():
+    rng = random.Random(5)
+    hasher = MinHasher(num_perm=256)
+    errors = []
+    for _ in range(40):
+        a = _sentence(rng, 60)
+        words = a.split()
+        for i in rng.sample(range(len(words)), rng.randrange(0, 20)):
+            words[i] = "changed" + str(i)
+        b = " ".join(words)
+        est = MinHasher.similarity(hasher.signature(shingles(a)), hasher.signature(shingles(b)))
+        errors.append(abs(est - jaccard(a, b)))
+    assert sum(errors) / len(errors) < 0.06
+
+
+def test_signature_of_tiny_sets_fills_every_bin():
+    sig = MinHasher(num_perm=64).signature(frozenset({1, 2}))
+    assert len(sig) == 64 and all(0 <= v for v in sig)
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=64, bands=10)
+
+
+def test_index_finds_the_first_near_duplicate_only():
+    rng = random.Random(9)
+    index = NearDuplicateIndex(threshold=0.8)
+    base = _sentence(rng, 40)
+    others = [_sentence(rng, 40) for _ in range(20)]
+    assert index.add(base) == (0, None)
+    for k, text in enumerate(others, start=1):
+        assert index.add(text) == (k, None)
+    assert index.add(base + " extra") == (21, 0)
+    assert index.find(base.upper()) == 0
+    assert index.find(_sentence(rng, 40)) is None
+    assert len(index) == 22
+
+
+def test_collapse_preserves_order_pins_and_blank_items():
+    a = "the converter ran at 400 kHz with 1% ripple on the output rail"
+    b = "thermal test: mosfet case reached 71 C after ten minutes at full load"
+    items = [a, "", b, a + ".", "", b, a]
+    groups = collapse_near_duplicates(items, keep=[False, False, False, False, False, True, False])
+    assert [(g.index, g.count) for g in groups] == [(0, 3), (1, 1), (2, 1), (4, 1), (5, 1)]
+
+
+def _memory_with_repeats():
+    mem = Memory(max_chars=100_000)
+    for _ in range(3):
+        mem.add_event("system", "tool call failed: connection refused by the stub endpoint", kind="note")
+    mem.add_event("user", "what is the ripple at 400 kHz?")
+    return mem
+
+
+def test_compact_history_keeps_the_count_outside_the_text():
+    mem = _memory_with_repeats()
+    assert mem.compact_history() == 2
+    first, second = list(mem.history)
+    assert first.text == "tool call failed: connection refused by the stub endpoint"
+    assert first.count == 3
+    assert first.render().endswith(" (x3)")
+    assert second.count == 1 and "(x" not in second.render()
+
+
+def test_compacting_again_adds_up_counts():
+    mem = _memory_with_repeats()
+    mem.compact_history()
+    mem.add_event("system", "tool call failed: connection refused by the stub endpoint", kind="note")
+    assert mem.compact_history() == 1
+    ev = list(mem.history)[0]
+    assert ev.count == 4
+    assert ev.render().count("(x") == 1
+
+
+def test_history_window_counts_the_rendered_count():
+    mem = _memory_with_repeats()
+    mem.compact_history()
+    assert mem._history_window_chars == sum(len(e.render()) + 1 for e in mem.history)
+
+
+def test_count_survives_a_save(tmp_path):
+    mem = _memory_with_repeats()
+    mem.compact_history()
+    path = os.path.join(tmp_path, "mem.ckpt")
+    MemoryCheckpointer(path).save_memory(mem)
+    loaded = load_memory(path).mem
+    assert [(e.text, e.count) for e in loaded.history] == [(e.text, e.count) for e in mem.history]
+
+
+def test_compact_body_keeps_fold_placeholders():
+    para = "the converter ran at 400 kHz with 1% ripple on the output rail"
+    mem = Memory(body=f"{para}\n\n{para}\n\nnotes: {para}\n\n{para}\n", max_chars=100_000)
+    i = mem.body.index("notes:")
+    fid = mem.fold_by_offsets(i, i + len("notes:"), "label")
+    assert mem.compact_body() == 2
+    assert "[repeated x3]" in mem.body
+    assert fid in mem.body
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import math
+import random
+from collections import Counter
+
+from core.fold_index import FoldIndex, excerpt, tokenize
+from core.memory import Fold
+from utils.text import estimate_tokens
+
+_WORDS = "buck boost flyback inductor ripple mosfet gate driver snubber diode capacitor thermal loop".split()
+
+
+def _folds(rng, n):
+    return [
+        Fold(f"f{k}", rng.choice(_WORDS), " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 60))), k)
+        for k in range(n)
+    ]
+
+
+def _bm25(folds, query, k1=1.2, b=0.75, boost=3):
+    tfs = {}
+    for f in folds:
+        tf = Counter(tokenize(f.content))
+        for t in tokenize(f.label):
+            tf[t] += boost
+        tfs[f.fold_id] = tf
+    avgdl = sum(sum(tf.values()) for tf in tfs.values()) / len(tfs)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(1 for tf in tfs.values() if term in tf)
+        if not df:
+            continue
+        idf = math.log(1 + (len(tfs) - df + 0.5) / (df + 0.5))
+        for fid, tf in tfs.items():
+            if term in tf:
+                norm = k1 * (1 - b + b * sum(tf.values()) / avgdl)
+                scores[fid] = scores.get(fid, 0.0) + idf * tf[term] * (k1 + 1) / (tf[term] + norm)
+    return scores
+
+
+def test_query_matches_reference_bm25_after_adds_and_removes():
+    rng = random.Random(2)
+    folds = _folds(rng, 30)
+    index = FoldIndex()
+    for f in folds:
+        index.add(f)
+    for f in folds[::3]:
+        index.remove(f.fold_id)
+    index.remove("missing")
+    live = [f for f in folds if f.fold_id in index]
+    assert len(index) == len(live) == 20
+    for query in ("ripple inductor", "gate driver loop", "thermal"):
+        want = _bm25(live, query)
+        hits = index.query(query, top_k=len(live))
+        assert {h.fold_id for h in hits} == set(want)
+        for h in hits:
+            assert math.isclose(h.score, want[h.fold_id])
+        assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+
+
+def test_re_adding_a_fold_replaces_its_postings():
+    index = FoldIndex()
+    index.add(Fold("a", "notes", "ripple ripple", 0))
+    index.add(Fold("a", "notes", "thermal", 0))
+    assert index.query("ripple") == []
+    assert [h.fold_id for h in index.query("thermal")] == ["a"]
+
+
+def test_label_outweighs_content_and_only_filters_before_ranking():
+    index = FoldIndex()
+    index.add(Fold("a", "ripple", "measurements of the output stage " * 3, 0))
+    index.add(Fold("b", "misc", "ripple was fine, see the output stage notes " * 3, 1))
+    index.add(Fold("c", "misc", "unrelated text", 2))
+    assert [h.fold_id for h in index.query("ripple")] == ["a", "b"]
+    assert [h.fold_id for h in index.query("ripple", top_k=1, only={"b"})] == ["b"]
+
+
+def test_state_round_trip():
+    rng = random.Random(4)
+    index = FoldIndex()
+    for f in _folds(rng, 10):
+        index.add(f)
+    copy = FoldIndex.from_state(index.to_state())
+    assert copy.query("ripple mosfet", top_k=10) == index.query("ripple mosfet", top_k=10)
+    copy.remove("f0")
+    assert "f0" not in copy and len(copy) == 9
+
+
+def test_select_fits_the_budget_and_excerpts_around_terms():
+    content = "filler " * 400 + "the snubber value is 22 ohm " + "filler " * 400
+    fold = Fold("a", "notes", content, 0)
+    index = FoldIndex()
+    index.add(fold)
+    [(got, snippet)] = index.select("snubber", {"a": fold}, budget_tokens=50)
+    assert got is fold
+    assert estimate_tokens(snippet) <= 50
+    assert "snubber" in snippet
+    assert index.select("snubber", {"a": fold}, only={"other"}) == []
+
+
+def test_excerpt():
+    assert excerpt("short", ["x"], 10) == "short"
+    text = "a" * 100 + "needle" + "b" * 100
+    s = excerpt(text, ["needle"], 40)
+    assert len(s) == 40 and "needle" in s and s.startswith("…") and s.endswith("…")
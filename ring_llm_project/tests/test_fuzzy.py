@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from core.fuzzy import AmbiguousMatch, FuzzyMatcher, NormalizedText, myers_ends
+
+
+def _osa_ends(text, pattern, k):
+    """Reference: semi-global optimal-string-alignment distance, one DP column per text char."""
+    m = len(pattern)
+    prev2, prev = None, list(range(m + 1))
+    out = []
+    for j in range(1, len(text) + 1):
+        cur = [0] * (m + 1)
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == text[j - 1] else 1
+            cur[i] = min(prev[i] + 1, cur[i - 1] + 1, prev[i - 1] + cost)
+            if i > 1 and j > 1 and pattern[i - 1] == text[j - 2] and pattern[i - 2] == text[j - 1]:
+                cur[i] = min(cur[i], prev2[i - 2] + 1)
+        if cur[m] <= k:
+            out.append((j, cur[m]))
+        prev2, prev = prev, cur
+    return out
+
+
+def test_myers_matches_reference_dp():
+    rng = random.Random(1)
+    for _ in range(300):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        pattern = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 8)))
+        k = rng.randint(0, 3)
+        assert myers_ends(text, pattern, k) == _osa_ends(text, pattern, k), (text, pattern, k)
+
+
+def test_transposition_is_one_edit():
+    assert min(e for _, e in myers_ends("the inductor ripple", "inudctor", 2)) == 1
+    body = "the inductor ripple at full load\n"
+    m = FuzzyMatcher().find(body, "the inudctor ripple")
+    assert m.kind == "fuzzy" and m.edits == 1
+    assert body[m.start:m.end] == "the inductor ripple"
+
+
+def test_normalized_match_maps_back_to_original_offsets():
+    body = "Vin:   12 V\n“quoted”  —  text"
+    nt = NormalizedText(body)
+    assert nt.text == 'Vin: 12 V "quoted" - text'
+    m = FuzzyMatcher().find(body, '"quoted" - text')
+    assert (m.kind, m.edits) == ("normalized", 0)
+    assert body[m.start:m.end] == "“quoted”  —  text"
+    assert FuzzyMatcher().find(body, "Vin: 12", pos=1, fuzzy=False) is None
+
+
+def test_digit_guard_rejects_a_different_number():
+    body = "measured on 2026-03-01: ripple 1.2%\n"
+    assert FuzzyMatcher().find(body, "measured on 2026-03-07") is None
+    assert FuzzyMatcher().find(body, "mesured on 2026-03-01") is not None
+
+
+def test_ambiguous_and_disabled_fuzzy():
+    body = "output ripple low\nnoise\noutput ripple low\n"
+    with pytest.raises(AmbiguousMatch):
+        FuzzyMatcher().find(body, "outptu ripple low")
+    assert FuzzyMatcher().find(body, "outptu ripple low", fuzzy=False) is None
+    m = FuzzyMatcher().find(body, "outptu ripple low", pos=body.index("noise"))
+    assert m.start == body.rindex("output")
+
+
+def test_short_or_far_tokens_are_not_guessed():
+    body = "gate driver fault\n"
+    assert FuzzyMatcher().find(body, "gaet") is None  # shorter than min_fuzzy_len
+    assert FuzzyMatcher().find(body, "snubber diode") is None
+    assert FuzzyMatcher().find(body, "   ") is None
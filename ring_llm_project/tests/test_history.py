@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+
+import pytest
+
+from core.history import HistoryEvent, HistoryRing
+
+
+def _ev(k):
+    return HistoryEvent("user", f"msg {k}", ts=float(k))
+
+
+def _texts(events):
+    return [e.text for e in events]
+
+
+def test_ring_matches_a_bounded_deque():
+    ring, ref = HistoryRing(5), deque(maxlen=5)
+    for k in range(13):
+        evicted = ring.append(_ev(k))
+        assert (evicted.text if evicted else None) == (ref[0].text if len(ref) == 5 else None)
+        ref.append(_ev(k))
+        assert _texts(ring) == _texts(ref)
+        assert _texts(reversed(ring)) == _texts(reversed(ref))
+    assert len(ring) == 5 and ring.capacity == 5
+
+
+def test_indexing_slicing_and_tail_after_wraparound():
+    ring = HistoryRing(4, (_ev(k) for k in range(7)))  # holds 3..6
+    assert ring[0].text == "msg 3" and ring[-1].text == "msg 6"
+    assert _texts(ring[1:3]) == ["msg 4", "msg 5"]
+    assert _texts(ring.tail(2)) == ["msg 5", "msg 6"]
+    assert _texts(ring.tail(10)) == _texts(ring)
+    assert list(ring.tail(0)) == []
+    with pytest.raises(IndexError):
+        ring[4]
+    with pytest.raises(IndexError):
+        ring[-5]
+
+
+def test_appendleft_and_drop_oldest():
+    ring = HistoryRing(3, [_ev(1), _ev(2)])
+    ring.appendleft(_ev(0))
+    assert _texts(ring) == ["msg 0", "msg 1", "msg 2"]
+    with pytest.raises(OverflowError):
+        ring.appendleft(_ev(-1))
+    ring.drop_oldest(2)
+    assert _texts(ring) == ["msg 2"]
+    ring.drop_oldest(5)
+    assert len(ring) == 0 and list(ring) == []
+    ring.append(_ev(9))
+    assert _texts(ring) == ["msg 9"]
+
+
+def test_clear_and_capacity_check():
+    ring = HistoryRing(2, [_ev(1), _ev(2), _ev(3)])
+    ring.clear()
+    assert len(ring) == 0 and ring.capacity == 2
+    with pytest.raises(ValueError):
+        HistoryRing(0)
+
+
+def test_event_render():
+    assert HistoryEvent("user", "hi").render() == "USER(msg): hi"
+    cmd = HistoryEvent("assistant", "<CMD>\nSAY\n</CMD>", kind="cmd", count=2)
+    assert cmd.render() == "<CMD>\nSAY\n</CMD>\n(x2)"
+    assert cmd.render(with_count=False) == "<CMD>\nSAY\n</CMD>"
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+from core.behavior import DebugFlags
+from core.io import IOAdapter
+from core.llm_client import LLMClient, LLMConfig
+from core.process import ProcessConfig
+from main import configure_logging, create_process
+from utils import log
+
+
+class _QuietIO(IOAdapter):
+    def say(self, text):
+        pass
+
+    def ask(self, prompt):
+        return ""
+
+
+def test_one_import_root():
+    # a second copy of utils.log would have its own sink that configure_logging never sees
+    assert not [m for m in sys.modules if m.startswith("ring_llm_project.")]
+    assert sys.modules["core.behavior"].get_logger is log.get_logger
+
+
+def test_step_log_reaches_sink_once(tmp_path, stub_llm):
+    path = tmp_path / "run.log"
+    url, _ = stub_llm(["<CMD>\nSAY\nTEXT:\nmarker-reply\n</CMD>"])
+    debug = DebugFlags(show_raw_model_output=True, show_extracted_command=False, log_level="DEBUG", log_path=str(path))
+    configure_logging(debug)
+    try:
+        process = create_process(
+            io=_QuietIO(),
+            llms={"stub": LLMClient(LLMConfig(base_url=url, model="stub"))},
+            process_cfg=ProcessConfig(control_llm_key="stub"),
+            debug=debug,
+        )
+        process.handle_user_message("hi")
+        process.run_once()
+        process.close()
+        log.flush()
+    finally:
+        log.shutdown()
+
+    lines = [line for line in path.read_text(encoding="utf-8").splitlines() if "marker-reply" in line]
+    assert len(lines) == 1
+    assert "raw_model_output" in lines[0]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import pytest
+
+from commands import manifest
+from commands.manifest import load_manifest
+
+PLUGINS = (("commands.say", "SayCommand"), ("commands.loop_done", "LoopDoneCommand"))
+
+
+def test_cache_is_written_and_reused(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    entries = load_manifest(PLUGINS, cache_path=path)
+    assert [e.name for e in entries] == ["SAY", "LOOP DONE"]
+    with open(path, encoding="utf-8") as f:
+        assert [c["name"] for c in json.load(f)["commands"]] == ["SAY", "LOOP DONE"]
+    assert load_manifest(PLUGINS, cache_path=path) == entries
+    assert os.listdir(tmp_path) == ["manifest.json"]
+
+
+def _failing_replace(exc):
+    def replace(src, dst):
+        raise exc
+
+    return replace
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest.os, "replace", _failing_replace(OSError("disk full")))
+    entries = load_manifest(PLUGINS, cache_path=str(tmp_path / "manifest.json"))
+    assert [e.name for e in entries] == ["SAY", "LOOP DONE"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_unexpected_error_is_raised_after_cleanup(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest.os, "replace", _failing_replace(RuntimeError("boom")))
+    with pytest.raises(RuntimeError):
+        load_manifest(PLUGINS, cache_path=str(tmp_path / "manifest.json"))
+    assert os.listdir(tmp_path) == []
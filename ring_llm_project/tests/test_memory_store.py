@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from core.memory import Memory
+from core.memory_store import CheckpointError, MemoryCheckpointer, PagedFold, load_memory
+
+
+def _lines(prefix, n):
+    return "".join(f"{prefix} line {k}: Vin 12 V, ripple 0.{k}%\n" for k in range(n))
+
+
+def _fold(mem, start, end, label):
+    i, j = mem.find_range(start, end, fuzzy=False)
+    return mem.fold_by_offsets(i, j, label)
+
+
+def _memory():
+    mem = Memory(body=_lines("main", 20), max_chars=100_000)
+    mem.state["goal"] = "buck converter"
+    mem.add_event("user", "hi", kind="msg")
+    mem.clipboard = "copied"
+    a = _fold(mem, "main line 2:", "ripple 0.4%", "early lines")
+    b = _fold(mem, "main line 10:", "ripple 0.12%", "middle lines")
+    mem.switch_shard("notes")
+    mem.body = _lines("notes", 8)
+    n = _fold(mem, "notes line 1:", "ripple 0.3%", "notes")
+    mem.switch_shard("main")
+    return mem, {("main", a), ("main", b), ("notes", n)}
+
+
+def _fold_contents(mem):
+    out = {(mem.shard, fid): f.content for fid, f in mem.folds.items()}
+    for name, sh in mem.shards.items():
+        out.update(((name, fid), f.content) for fid, f in sh.folds.items())
+    return out
+
+
+def test_round_trip_with_shards_and_paged_folds(tmp_path):
+    path = str(tmp_path / "mem.ckpt")
+    mem, keys = _memory()
+    info = MemoryCheckpointer(path).save_memory(mem)
+    assert (info.folds_written, info.compacted) == (3, True)
+
+    loaded = load_memory(path)
+    back = loaded.mem
+    assert back.to_text() == mem.to_text()
+    assert back.annotated_body() == mem.annotated_body()
+    assert back.shard == "main" and sorted(back.shards) == ["notes"]
+    assert back.shards["notes"].body == mem.shards["notes"].body
+    assert (back.version, back.fold_seq) == (mem.version, mem.fold_seq)
+    assert loaded.info.folds == 3
+
+    # nothing is read from the fold store until a fold's content is needed
+    paged = [back.folds[fid] for _, fid in sorted(keys) if fid in back.folds]
+    assert all(isinstance(f, PagedFold) and not f.loaded for f in paged)
+    store = paged[0].store
+    assert store.loads == 0
+    back.unfold(paged[0].fold_id)
+    assert store.loads == 1 and paged[0].loaded
+    back.refold(paged[0].fold_id)
+    assert set(_fold_contents(back)) == keys
+    assert _fold_contents(back) == _fold_contents(mem)
+
+
+def test_saves_append_then_compact(tmp_path):
+    path = str(tmp_path / "mem.ckpt")
+    mem, _ = _memory()
+    ckpt = MemoryCheckpointer(path, compact_min_bytes=0)
+    ckpt.save_memory(mem)
+    assert os.path.exists(path + ".1.folds")
+
+    # unchanged folds are not written again
+    info = ckpt.save_memory(mem)
+    assert (info.folds_written, info.compacted) == (0, False)
+
+    # a new fold is appended to the same generation
+    with mem.undo.step("FOLD"):
+        _fold(mem, "main line 15:", "ripple 0.16%", "late lines")
+    info = ckpt.save_memory(mem)
+    assert (info.folds_written, info.compacted) == (1, False)
+    size = os.path.getsize(path + ".1.folds")
+
+    # once most of the store is dead, the next save starts generation 2 and drops generation 1
+    for fid in list(mem.folds):
+        mem.folds.pop(fid)
+        mem.fold_index.remove(fid)
+    info = ckpt.save_memory(mem)
+    assert info.compacted and info.folds_written == 1
+    assert not os.path.exists(path + ".1.folds")
+    assert os.path.getsize(path + ".2.folds") < size
+
+    # the loaded checkpointer keeps appending to generation 2
+    loaded = load_memory(path)
+    assert _fold_contents(loaded.mem) == _fold_contents(mem)
+    with loaded.mem.undo.step("FOLD"):
+        _fold(loaded.mem, "main line 0:", "ripple 0.0%", "first line")
+    info = loaded.checkpointer.save_memory(loaded.mem)
+    assert (info.folds_written, info.compacted) == (1, False)
+    assert _fold_contents(load_memory(path).mem) == _fold_contents(loaded.mem)
+
+
+def test_not_a_checkpoint(tmp_path):
+    path = tmp_path / "mem.ckpt"
+    path.write_text("{broken", encoding="utf-8")
+    with pytest.raises(CheckpointError):
+        load_memory(str(path))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import random
+
+from core import packer
+from core.memory import Memory
+from core.packer import PackConfig, PackItem, PromptPacker, select
+
+
+def _items(rng, kind, n):
+    return [PackItem(kind, str(i), "x", rng.randint(1, 90), rng.random()) for i in range(n)]
+
+
+def _brute_force(folds, history, capacity, max_items, quantum):
+    def cost(it):
+        return -(-it.tokens // quantum)
+
+    cells = capacity // quantum
+    best = 0.0
+    for k in range(len(history) + 1):
+        hc = sum(cost(it) for it in history[:k])
+        hv = sum(it.value for it in history[:k])
+        for n in range(min(max_items, len(folds)) + 1):
+            for combo in itertools.combinations(folds, n):
+                if hc + sum(cost(it) for it in combo) <= cells:
+                    best = max(best, hv + sum(it.value for it in combo))
+    return best
+
+
+def test_select_stays_within_capacity_and_is_optimal():
+    rng = random.Random(7)
+    for _ in range(200):
+        folds, history = _items(rng, "fold", rng.randint(0, 6)), _items(rng, "history", rng.randint(0, 5))
+        capacity, quantum, max_items = rng.randint(0, 300), rng.choice([1, 4, 8, 16]), rng.randint(0, 3)
+        picked, k = select(folds, history, capacity, max_items=max_items, quantum=quantum)
+        assert len(picked) <= max_items and len(set(picked)) == len(picked)
+        cost = sum(folds[i].tokens for i in picked) + sum(it.tokens for it in history[:k])
+        assert cost <= capacity
+        value = sum(folds[i].value for i in picked) + sum(it.value for it in history[:k])
+        assert abs(value - _brute_force(folds, history, capacity, max_items, quantum)) < 1e-9
+
+
+def test_pack_fits_the_budget():
+    mem = Memory(body="".join(f"line {k}: Vin 12 V\n" for k in range(40)), max_chars=100_000)
+    for k in range(30):
+        mem.add_event("user", f"question {k} about the buck converter ripple")
+    p = PromptPacker(PackConfig(budget_tokens=400))
+    packed = p.pack(mem, "ripple", fixed_tokens=100)
+    assert packed.available == 300
+    assert packed.tokens <= packed.available
+    assert not packed.body_truncated
+    assert 0 < len(packed.history) < 30
+
+
+class _Recorder:
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, event, **fields):
+        self.warnings.append((event, fields))
+
+
+def test_pack_warns_when_fixed_part_fills_the_budget(monkeypatch):
+    rec = _Recorder()
+    monkeypatch.setattr(packer, "log", rec)
+    warnings = rec.warnings
+    mem = Memory(body="line 1: Vin 12 V\n", max_chars=100_000)
+    packed = PromptPacker(PackConfig(budget_tokens=200)).pack(mem, "", fixed_tokens=250)
+    assert packed.body == "" and packed.body_truncated
+    assert [e for e, _ in warnings] == ["pack_no_room_for_body"]
+    assert warnings[0][1]["fixed_tokens"] == 250
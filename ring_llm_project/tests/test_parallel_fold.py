@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from core.constraints import PARSE_STATS
+from core.deadline import DEADLINE_METRICS, Deadline
+from core.dispatcher import CommandDispatcher
+from core.memory import Memory
+from core.types import ExecutionContext
+from main import build_registry
+from scenarios.day.engine import DayEngine
+from scenarios.day.parallel_fold import ParallelFolder
+
+
+class _SlowLLM:
+    """Folds the first line of each region after `delay` seconds; records request timeouts."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def chat(self, messages, timeout_s=None, **kwargs):
+        with self._lock:
+            self.timeouts.append(timeout_s)
+        time.sleep(self.delay)
+        region = messages[-1]["content"].split("-----\n")[1]
+        first = region.splitlines()[0]
+        return f"<CMD>\nFOLD\nLABEL:\n{first[:12]}\nSTART:\n{first[:10]}\nEND:\n{first[-6:]}\n</CMD>"
+
+
+def _body(regions):
+    return "".join(f"region {k} notes: ripple and switching losses\n\n" for k in range(regions))
+
+
+def test_without_deadline_every_region_is_folded():
+    llm = _SlowLLM(0.0)
+    mem = Memory(body=_body(4))
+    folder = ParallelFolder(llm_pool={"a": llm}, max_workers=2, max_region_chars=50)
+    assert len(folder.run(mem)) == 4
+    assert llm.timeouts == [None] * 4
+
+
+def test_deadline_stops_scheduling_and_bounds_timeouts():
+    llm = _SlowLLM(0.3)
+    mem = Memory(body=_body(6))
+    skipped = DEADLINE_METRICS.snapshot().get("skipped_calls", 0)
+    deadline = Deadline.after(0.45)
+    folder = ParallelFolder(llm_pool={"a": llm}, max_workers=1, max_region_chars=50, deadline=deadline)
+    fold_ids = folder.run(mem)
+
+    # one worker: regions 0 and 1 start before the deadline, the rest never reach the model
+    assert len(llm.timeouts) == 2
+    assert all(t is not None and t <= 0.5 for t in llm.timeouts)
+    assert len(fold_ids) == 2
+    assert DEADLINE_METRICS.snapshot()["skipped_calls"] - skipped == 4
+
+
+class _ScriptedLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.kwargs = []
+
+    def chat(self, messages, **kwargs):
+        self.kwargs.append(kwargs)
+        return self.replies.pop(0)
+
+
+def test_engine_threads_constraint_and_records_parse_stats():
+    replies = [
+        "<CMD>\nFOLD\nLABEL:\nfirst\nSTART:\nregion 0\nEND:\nlosses\n</CMD>",
+        "Nothing to fold here.",
+        "<CMD>\n\n</CMD>",
+    ]
+    llm = _ScriptedLLM(replies)
+    engine = DayEngine(dispatcher=CommandDispatcher(build_registry()), llm=llm)
+    mem = Memory(body=_body(3))
+    before = PARSE_STATS.snapshot()
+
+    engine.run_parallel_fold(mem, ExecutionContext(llm_pool={"a": llm}), max_workers=1, max_region_chars=50)
+
+    assert [kw["constraint"] for kw in llm.kwargs] == [engine.constraint] * 3
+    assert mem.collapsed_fold_ids() and "region 0" not in mem.body
+    after = PARSE_STATS.snapshot()
+    assert after["replies"] - before["replies"] == 3
+    assert after["failures"] - before["failures"] == 2
+    errors = after["by_error"]
+    assert errors.get("no_cmd_block", 0) - before["by_error"].get("no_cmd_block", 0) == 1
+    assert errors.get("Empty command block", 0) - before["by_error"].get("Empty command block", 0) == 1
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import time
+import tracemalloc
+
+import pytest
+
+from core.profiling import Profiler
+
+MODES = [(True, False), (False, True), (True, True)]
+
+
+def _turn(prof):
+    prof.start_turn()
+    with prof.section("step", "PromptAndCallStep"):
+        time.sleep(0.002)
+        with prof.section("cmd", "FOLD"):
+            junk = [str(k) * 10 for k in range(5_000)]
+            time.sleep(0.002)
+    del junk
+    return prof.end_turn()
+
+
+def _exts(files):
+    return sorted(os.path.basename(f) for f in files)
+
+
+def _expected(name, cpu, alloc):
+    return sorted([f"{name}.collapsed"] + [f"{name}.pstats"] * cpu + [f"{name}.tracemalloc"] * alloc)
+
+
+def _check_files(out, name, cpu, alloc):
+    collapsed = (out / f"{name}.collapsed").read_text(encoding="utf-8").splitlines()
+    stacks = {line.rsplit(" ", 1)[0] for line in collapsed}
+    assert stacks == {"step:PromptAndCallStep", "step:PromptAndCallStep;cmd:FOLD"}
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in collapsed)
+    if cpu:
+        assert pstats.Stats(str(out / f"{name}.pstats")).total_calls > 0
+    if alloc:
+        snap = tracemalloc.Snapshot.load(str(out / f"{name}.tracemalloc"))
+        assert snap.statistics("filename")
+
+
+@pytest.mark.parametrize("cpu,alloc", MODES)
+def test_turn_scope(tmp_path, cpu, alloc):
+    prof = Profiler(cpu=cpu, alloc=alloc, out_dir=str(tmp_path), scope="turn")
+    first = _turn(prof)
+    second = _turn(prof)
+    assert prof.finish() == []
+
+    assert _exts(first.files) == _expected("turn-0001", cpu, alloc)
+    assert _exts(second.files) == _expected("turn-0002", cpu, alloc)
+    assert sorted(os.listdir(tmp_path)) == sorted(_expected("turn-0001", cpu, alloc) + _expected("turn-0002", cpu, alloc))
+    _check_files(tmp_path, "turn-0002", cpu, alloc)
+
+    st = second.sections["step:PromptAndCallStep;cmd:FOLD"]
+    assert st.calls == 1 and st.time_ms >= 2.0
+    assert second.sections["step:PromptAndCallStep"].child_ms == st.time_ms
+    assert bool(second.top_functions) == cpu
+    assert (second.peak_kb > 0) == alloc
+    assert bool(second.top_allocations) == alloc
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.parametrize("cpu,alloc", MODES)
+def test_session_scope(tmp_path, cpu, alloc):
+    prof = Profiler(cpu=cpu, alloc=alloc, out_dir=str(tmp_path), scope="session")
+    turns = [_turn(prof), _turn(prof)]
+    assert all(t.files == [] for t in turns)
+    assert os.listdir(tmp_path) == []
+
+    files = prof.finish()
+    assert _exts(files) == _expected("session", cpu, alloc)
+    assert sorted(os.listdir(tmp_path)) == _expected("session", cpu, alloc)
+    _check_files(tmp_path, "session", cpu, alloc)
+    if cpu:
+        # one profile for both turns: sleep ran twice per turn
+        stats = pstats.Stats(str(tmp_path / "session.pstats")).stats
+        assert [row[1] for (_, _, func), row in stats.items() if "time.sleep" in func] == [4]
+    assert not tracemalloc.is_tracing()
+
+
+def test_no_out_dir_writes_nothing(tmp_path):
+    prof = Profiler(cpu=True, alloc=True, scope="session")
+    assert _turn(prof).files == []
+    assert prof.finish() == []
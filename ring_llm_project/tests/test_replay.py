@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from core.budget import ChatResponse
+from core.io import IOAdapter
+from core.llm_client import LLMClient, LLMConfig
+from core.memory import Memory
+from core.process import ProcessConfig
+from core.replay import (
+    RecordingLLMClient,
+    ReplayLLMClient,
+    ReplayStats,
+    SessionRecorder,
+    load_session,
+    request_digest,
+)
+from main import create_process, replay_session
+
+
+class _ScriptIO(IOAdapter):
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.said = []
+
+    def say(self, text):
+        self.said.append(text)
+
+    def ask(self, prompt):
+        self.said.append(prompt)
+        return self.answers.pop(0)
+
+
+class _FixedLLM:
+    def __init__(self, resp):
+        self.resp = resp
+
+    def chat(self, messages, **kwargs):
+        return self.resp
+
+
+def _memory():
+    return Memory(body="Specs:\nVin 12 V\n", max_chars=30_000)
+
+
+def test_chat_response_round_trip(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    resp = ChatResponse(
+        "<CMD>\nSAY\nTEXT:\nhi\n</CMD>",
+        finish_reason="length",
+        prompt_tokens=812,
+        completion_tokens=64,
+        prompt_ms=120.5,
+        completion_ms=930.25,
+    )
+    messages = [{"role": "user", "content": "hi"}]
+    with SessionRecorder(path) as rec:
+        assert RecordingLLMClient(_FixedLLM(resp), "main", rec).chat(messages) is resp
+        RecordingLLMClient(_FixedLLM("plain"), "main", rec).chat(messages)
+
+    records = load_session(path)
+    assert records[1]["req"] == request_digest(messages)
+    stats = ReplayStats()
+    client = ReplayLLMClient("main", records, stats)
+    out = client.chat(messages)
+    assert isinstance(out, ChatResponse)
+    assert out == resp
+    for f in ("finish_reason", "prompt_tokens", "completion_tokens", "prompt_ms", "completion_ms"):
+        assert getattr(out, f) == getattr(resp, f)
+    # a plain str reply stays a plain str
+    plain = client.chat([{"role": "user", "content": "changed"}])
+    assert plain == "plain" and not isinstance(plain, ChatResponse)
+    assert (stats.llm_calls, stats.mismatched_requests) == (2, 1)
+
+
+def test_record_then_replay_session(tmp_path, stub_llm):
+    path = str(tmp_path / "session.jsonl.gz")
+    url, _ = stub_llm([
+        "<CMD>\nASK\nWhich topology?\n</CMD>",
+        "<CMD>\nSAY\nTEXT:\nBuck it is.\n</CMD>",
+    ])
+    io = _ScriptIO(["buck"])
+    with SessionRecorder(path) as rec:
+        process = create_process(
+            io=io,
+            mem=_memory(),
+            llms={"stub": LLMClient(LLMConfig(base_url=url, model="stub"))},
+            process_cfg=ProcessConfig(control_llm_key="stub"),
+            recorder=rec,
+        )
+        for text in ("hi", "go on"):
+            process.handle_user_message(text)
+            process.run_once()
+        process.close()
+    recorded_memory = process.mem.to_text()
+
+    records = load_session(path)
+    llm = [r for r in records if r["type"] == "llm"]
+    assert [r["type"] for r in records if r["type"] in ("user", "ask")] == ["user", "ask", "user"]
+    assert len(llm) == 2 and all(r["meta"]["finish_reason"] == "stop" for r in llm)
+
+    report = replay_session(path, mem=_memory(), process_cfg=ProcessConfig(control_llm_key="stub"))
+    assert report.turns == 2
+    assert report.stats.llm_calls == 2
+    assert report.stats.mismatched_requests == 0
+    assert report.said == io.said == ["Which topology?", "Buck it is."]
+    assert report.final_memory == recorded_memory
+
+    # a different starting memory changes the prompts, and replay says where
+    report = replay_session(path, mem=Memory(body="other\n"), process_cfg=ProcessConfig(control_llm_key="stub"))
+    assert report.stats.mismatched_requests == 2
+    assert report.stats.first_mismatches[0][:3] == (1, "stub", llm[0]["req"])
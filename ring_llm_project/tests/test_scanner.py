@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from core.scanner import (
+    COMMAND,
+    MESSAGE,
+    TEXT,
+    CMD_PAIR,
+    DelimiterPair,
+    StreamScanner,
+    commands,
+    has_stray_text,
+    scan,
+)
+
+MSG_PAIR = DelimiterPair(MESSAGE, "<MSG>", "</MSG>")
+PAIRS = (CMD_PAIR, MSG_PAIR)
+
+
+def _merge(spans):
+    out = []
+    for sp in spans:
+        if out and sp.kind == TEXT and out[-1][0] == TEXT:
+            prev = out.pop()
+            out.append((TEXT, prev[1], sp.end, prev[3] + sp.text))
+        else:
+            out.append((sp.kind, sp.start, sp.end, sp.text))
+    return out
+
+
+def _output(rng, n):
+    parts = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.4:
+            parts.append(f"<CMD>\nSAY\nTEXT:\n{'x' * rng.randint(0, 300)} <MSG> inside\n</CMD>")
+        elif r < 0.6:
+            parts.append("<MSG>hello < CMD> </CMD></MSG>")
+        else:
+            parts.append(rng.choice(["prose ", "<", "<CM", "\n", "</CMD>", "a" * rng.randint(0, 900)]))
+    return "".join(parts)
+
+
+def test_streaming_equals_one_pass_for_any_chunking():
+    rng = random.Random(8)
+    for _ in range(60):
+        text = _output(rng, rng.randint(0, 40))
+        want = scan(text, PAIRS)
+        sc = StreamScanner(PAIRS)
+        got, i = [], 0
+        while i < len(text):
+            n = rng.choice([1, 2, 5, 64, 5000])
+            got += sc.feed(text[i:i + n])
+            i += n
+        got += sc.close()
+        assert _merge(got) == [(sp.kind, sp.start, sp.end, sp.text) for sp in want]
+        for sp in got:
+            assert text[sp.start:sp.end] == sp.text
+            assert text[sp.inner_start:sp.inner_end] == sp.inner
+        assert "".join(sp.text for sp in got) == text
+
+
+def test_block_inner_and_stray_text():
+    spans = scan("Sure!\n<CMD>\nSAY\n</CMD>\n")
+    assert [sp.kind for sp in spans] == [TEXT, COMMAND, TEXT]
+    assert spans[1].inner == "\nSAY\n"
+    assert has_stray_text(spans)
+    assert commands(spans) == [spans[1]]
+    assert not has_stray_text(scan("\n<CMD>x</CMD>\n"))
+
+
+def test_unclosed_block_is_reported_open():
+    spans = scan("<CMD>\nSAY\nTEXT:\nhalf")
+    assert len(spans) == 1 and spans[0].kind == COMMAND and not spans[0].closed
+    assert spans[0].inner == "\nSAY\nTEXT:\nhalf"
+    assert commands(spans) == []
+
+
+def test_longer_marker_wins_over_its_prefix():
+    pairs = (DelimiterPair("a", "<C>", "</C>"), DelimiterPair("b", "<CC>", "</CC>"))
+    assert [(sp.kind, sp.inner) for sp in scan("<CC>x</CC><C>y</C>", pairs)] == [("b", "x"), ("a", "y")]
+
+
+def test_bad_pairs_are_rejected():
+    with pytest.raises(ValueError):
+        StreamScanner(())
+    with pytest.raises(ValueError):
+        StreamScanner((DelimiterPair(COMMAND, "<CMD>", ""),))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+
+from core.deadline import Deadline
+from core.scheduler import AIMDLimiter, LimiterConfig, LLMScheduler, Priority, QueueTimeout
+
+
+def test_additive_increase_about_one_per_round():
+    lim = AIMDLimiter(LimiterConfig(initial=2, max_limit=8))
+    for _ in range(2):
+        lim.on_complete(100.0, True, 50)
+    assert 2.8 < lim.limit < 3.0
+    for _ in range(200):
+        lim.on_complete(100.0, True, 50)
+    assert lim.limit == 8.0
+
+
+def test_errors_and_inflated_latency_back_off():
+    lim = AIMDLimiter(LimiterConfig(initial=8, min_limit=1, max_limit=8))
+    lim.on_complete(100.0, True, 100)  # baseline: 1 ms per token
+    lim.on_complete(100.0, False)
+    assert lim.limit == 4.0
+    lim.on_complete(300.0, True, 100)  # 3 ms per token > 2x baseline
+    assert lim.limit == 2.0
+    for _ in range(5):
+        lim.on_complete(100.0, False)
+    assert lim.limit == 1.0
+
+
+def test_latency_is_compared_per_completion_token():
+    lim = AIMDLimiter(LimiterConfig(initial=4))
+    lim.on_complete(100.0, True, 100)
+    lim.on_complete(2000.0, True, 2000)  # long reply, same speed
+    lim.on_complete(500.0, True, 5)  # too short to say anything about congestion
+    lim.on_complete(900.0, True)  # no token count
+    assert lim.limit > 4.0
+    assert lim.min_ms_per_token == 1.0
+
+
+def _wait_queued(sched, key, n):
+    for _ in range(500):
+        q = sched.stats()["endpoints"].get(key, {}).get("queued", {})
+        if sum(q.values()) == n:
+            return
+        time.sleep(0.005)
+    raise AssertionError("waiters did not queue")
+
+
+def _wait_in_flight(sched, key):
+    while sched.stats()["endpoints"].get(key, {}).get("in_flight") != 1:
+        time.sleep(0.005)
+
+
+def test_priority_then_round_robin_across_sessions():
+    sched = LLMScheduler(default=LimiterConfig(initial=1, max_limit=1))
+    release = threading.Event()
+    order = []
+    blocker = threading.Thread(target=sched.run, args=("ep", release.wait))
+    blocker.start()
+    _wait_in_flight(sched, "ep")
+
+    threads = []
+    jobs = [("a", Priority.BACKGROUND), ("a", Priority.BACKGROUND), ("a", Priority.BACKGROUND),
+            ("b", Priority.BACKGROUND), ("c", Priority.INTERACTIVE)]
+    for n, (session, prio) in enumerate(jobs):
+        t = threading.Thread(
+            target=sched.run,
+            args=("ep", lambda s=session, n=n: order.append(f"{s}{n}")),
+            kwargs={"priority": prio, "session": session},
+        )
+        t.start()
+        threads.append(t)
+        _wait_queued(sched, "ep", n + 1)
+    release.set()
+    for t in [blocker] + threads:
+        t.join(5)
+    assert order == ["c4", "a0", "b3", "a1", "a2"]
+    stats = sched.stats()
+    assert stats["queue_wait"]["background"]["count"] == 4
+    assert stats["endpoints"]["ep"]["in_flight"] == 0
+
+
+def test_in_flight_never_exceeds_the_limit():
+    sched = LLMScheduler(default=LimiterConfig(initial=3, max_limit=3))
+    lock, active, peak = threading.Lock(), [0], [0]
+
+    def call():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=sched.run, args=("ep", call), kwargs={"session": str(k % 4)}) for k in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert peak[0] == 3
+
+
+def test_queued_request_times_out_and_leaves_the_queue():
+    sched = LLMScheduler(default=LimiterConfig(initial=1, max_limit=1))
+    release = threading.Event()
+    blocker = threading.Thread(target=sched.run, args=("ep", release.wait))
+    blocker.start()
+    _wait_in_flight(sched, "ep")
+    with pytest.raises(QueueTimeout):
+        sched.run("ep", lambda: None, priority=Priority.BACKGROUND, deadline=Deadline.after(0.05))
+    release.set()
+    blocker.join(5)
+    stats = sched.stats()
+    assert stats["queue_timeouts"]["background"] == 1
+    assert stats["endpoints"]["ep"]["queued"] == {"interactive": 0, "background": 0}
+    assert sched.run("ep", lambda: 42) == 42
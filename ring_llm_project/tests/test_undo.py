@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from core.memory import Memory
+from core.undo import UndoError, UndoLog
+
+BODY = "alpha line\nbeta line\ngamma line\n"
+
+
+def _edit(mem, label, fn):
+    with mem.undo.step(label):
+        fn()
+
+
+def _behind_the_log(mem, body):
+    # an edit the undo log never saw (e.g. a bug in a command), to force a conflict
+    mem.undo._replaying = True
+    try:
+        mem.body = body
+    finally:
+        mem.undo._replaying = False
+
+
+def test_one_step_per_block_and_redo():
+    mem = Memory(body=BODY)
+
+    def two_edits():
+        mem.insert_at(0, "head\n")
+        mem.clipboard = "copied"
+
+    _edit(mem, "EDIT", two_edits)
+    assert mem.undo.labels() == {"undo": ["EDIT"], "redo": []}
+
+    assert mem.undo.undo(mem) == ["EDIT"]
+    assert (mem.body, mem.clipboard) == (BODY, "")
+    assert mem.undo.redo(mem) == ["EDIT"]
+    assert (mem.body, mem.clipboard) == ("head\n" + BODY, "copied")
+
+
+def test_nested_steps_join_the_outer_one():
+    mem = Memory(body=BODY)
+    with mem.undo.step("OUTER"):
+        mem.insert_at(0, "a\n")
+        with mem.undo.step("INNER"):
+            mem.insert_at(0, "b\n")
+    assert mem.undo.labels()["undo"] == ["OUTER"]
+    mem.undo.undo(mem)
+    assert mem.body == BODY
+
+
+def test_new_step_clears_redo():
+    mem = Memory(body=BODY)
+    _edit(mem, "ONE", lambda: mem.insert_at(0, "1\n"))
+    mem.undo.undo(mem)
+    _edit(mem, "TWO", lambda: mem.insert_at(0, "2\n"))
+    assert mem.undo.labels() == {"undo": ["TWO"], "redo": []}
+    assert mem.undo.redo(mem) == []
+
+
+def test_fold_and_shard_are_undone():
+    mem = Memory(body=BODY)
+    i, j = mem.find_range("beta", "line\n", fuzzy=False)
+    _edit(mem, "FOLD", lambda: mem.fold_by_offsets(i, j, "beta"))
+    _edit(mem, "SHARD", lambda: mem.switch_shard("notes"))
+    assert mem.undo.undo(mem, steps=2) == ["SHARD", "FOLD"]
+    assert (mem.shard, mem.body, mem.folds) == ("main", BODY, {})
+
+
+def test_limits_drop_oldest_steps():
+    log = UndoLog(max_steps=2, max_chars=1_000)
+    mem = Memory(body=BODY)
+    mem.undo = log
+    for k in range(3):
+        _edit(mem, f"E{k}", lambda k=k: mem.insert_at(0, f"{k}\n"))
+    assert log.labels()["undo"] == ["E1", "E2"]
+    assert log.stats()["dropped"] == 1
+
+    # a step larger than max_chars is not kept, and the older ones go too
+    _edit(mem, "BIG", lambda: mem.insert_at(0, "x" * 2_000))
+    assert log.labels() == {"undo": [], "redo": []}
+    assert log.stats()["dropped"] == 4
+
+
+def _two_splices(mem):
+    # ops: insert "head" at the start, then delete the last line
+    with mem.undo.step("EDIT"):
+        mem.insert_at(0, "head\n")
+        i = mem.body.index("gamma")
+        mem.delete_offsets(i, len(mem.body))
+
+
+def test_undo_is_all_or_nothing():
+    mem = Memory(body=BODY)
+    _two_splices(mem)
+    # undo restores the last line first; removing "head" then conflicts
+    _behind_the_log(mem, "HEAD\n" + mem.body[len("head\n"):])
+    before = mem.body
+
+    with pytest.raises(UndoError):
+        mem.undo.undo(mem)
+    assert mem.body == before  # the last line is deleted again
+    assert mem.undo.labels() == {"undo": ["EDIT"], "redo": []}
+
+
+def test_redo_is_all_or_nothing():
+    mem = Memory(body=BODY)
+    _two_splices(mem)
+    mem.undo.undo(mem)
+    # redo re-inserts "head" first; deleting the last line then conflicts
+    _behind_the_log(mem, BODY.replace("gamma", "GAMMA"))
+    before = mem.body
+
+    with pytest.raises(UndoError):
+        mem.undo.redo(mem)
+    assert mem.body == before  # "head" is gone again
+    assert mem.undo.labels() == {"undo": [], "redo": ["EDIT"]}
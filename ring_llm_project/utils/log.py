@@ -1,8 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, TextIO, Tuple
+
 from utils.text import clamp
 
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+_NAMES = {v: k for k, v in _LEVELS.items()}
+
 
 def to_one_line_for_log(s: str, limit: int = 500) -> str:
     """
@@ -10,3 +27,207 @@ def to_one_line_for_log(s: str, limit: int = 500) -> str:
     """
     s = (s or "").replace("\n", "\\n")
     return clamp(s, limit)
+
+
+def parse_level(level: Any) -> int:
+    if isinstance(level, int):
+        return level
+    try:
+        return _LEVELS[str(level).upper()]
+    except KeyError:
+        raise ValueError(f"unknown log level: {level!r}") from None
+
+
+@dataclass(frozen=True)
+class LogConfig:
+    level: str = "INFO"
+    # None = stderr
+    path: Optional[str] = None
+    # one JSON object per line instead of "ts LEVEL name event k=v ..."
+    json_lines: bool = False
+    # every string field is cut to this many chars (one-lined in text mode)
+    max_field_chars: int = 500
+    # file is rotated to <path>.1 once it grows past this (0 = never)
+    max_bytes: int = 10_000_000
+    # records beyond this are dropped (and counted) instead of blocking the caller
+    max_queue: int = 10_000
+
+
+# (ts, level, logger, event, fields)
+_Record = Tuple[float, int, str, str, Dict[str, Any]]
+
+
+class _Sink:
+    """Queue + background writer thread. Callers only enqueue; formatting and IO happen off-thread."""
+
+    def __init__(self, cfg: LogConfig):
+        self.cfg = cfg
+        self.level = parse_level(cfg.level)
+        self.dropped = 0
+        self._q: "queue.Queue[Optional[_Record]]" = queue.Queue(maxsize=cfg.max_queue)
+        self._fh: Optional[TextIO] = None
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, rec: _Record) -> None:
+        try:
+            self._q.put_nowait(rec)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        self._q.put(None)
+        self._thread.join(timeout=timeout)
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Block until everything queued so far is written (tests, shutdown, before exit)."""
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    # ----------------------------
+    # Writer thread
+    # ----------------------------
+
+    def _open(self) -> TextIO:
+        if self.cfg.path is None:
+            return sys.stderr
+        d = os.path.dirname(self.cfg.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        return open(self.cfg.path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        if self.cfg.path is None or self.cfg.max_bytes <= 0 or self._fh is None:
+            return
+        if self._fh.tell() < self.cfg.max_bytes:
+            return
+        self._fh.close()
+        os.replace(self.cfg.path, self.cfg.path + ".1")
+        self._fh = self._open()
+
+    def _format(self, rec: _Record) -> str:
+        ts, level, name, event, fields = rec
+        limit = self.cfg.max_field_chars
+        if self.cfg.json_lines:
+            obj: Dict[str, Any] = {"ts": round(ts, 3), "level": _NAMES.get(level, str(level)), "logger": name, "event": event}
+            for k, v in fields.items():
+                obj[k] = clamp(v, limit) if isinstance(v, str) else v
+            return json.dumps(obj, ensure_ascii=False, default=str)
+        stamp = time.strftime("%H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+        parts = [stamp, _NAMES.get(level, str(level)), name, event]
+        for k, v in fields.items():
+            parts.append(f"{k}={to_one_line_for_log(v if isinstance(v, str) else repr(v), limit)}")
+        return " ".join(parts)
+
+    def _run(self) -> None:
+        self._fh = self._open()
+        while True:
+            rec = self._q.get()
+            try:
+                if rec is None:
+                    break
+                try:
+                    self._fh.write(self._format(rec) + "\n")
+                    if self._q.empty():
+                        self._fh.flush()
+                        self._rotate()
+                except Exception:  # a log line must never take the process down
+                    self.dropped += 1
+            finally:
+                self._q.task_done()
+        self._fh.flush()
+        if self._fh is not sys.stderr:
+            self._fh.close()
+
+
+_sink: Optional[_Sink] = None
+_sink_lock = threading.Lock()
+
+
+def configure(cfg: LogConfig = LogConfig()) -> None:
+    """(Re)start the background writer with cfg. Safe to call more than once."""
+    global _sink
+    with _sink_lock:
+        old, _sink = _sink, _Sink(cfg)
+    if old is not None:
+        old.close()
+
+
+def shutdown() -> None:
+    global _sink
+    with _sink_lock:
+        old, _sink = _sink, None
+    if old is not None:
+        old.close()
+
+
+def _get_sink() -> _Sink:
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = _Sink(LogConfig())
+    return _sink
+
+
+class Logger:
+    """Structured, levelled logger: log.debug("raw_model_output", text=raw, key=key).
+
+    A call below the configured level returns after one integer compare; fields
+    are only formatted (and truncated) on the writer thread. Guard expensive
+    field values with `if log.enabled(DEBUG):`.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def enabled(self, level: int) -> bool:
+        return level >= _get_sink().level
+
+    def log(self, level: int, event: str, **fields: Any) -> None:
+        sink = _get_sink()
+        if level < sink.level:
+            return
+        sink.put((time.time(), level, self.name, event, fields))
+
+    def debug(self, event: str, **fields: Any) -> None:
+        sink = _sink or _get_sink()
+        if DEBUG >= sink.level:
+            sink.put((time.time(), DEBUG, self.name, event, fields))
+
+    def info(self, event: str, **fields: Any) -> None:
+        sink = _sink or _get_sink()
+        if INFO >= sink.level:
+            sink.put((time.time(), INFO, self.name, event, fields))
+
+    def warning(self, event: str, **fields: Any) -> None:
+        sink = _sink or _get_sink()
+        if WARNING >= sink.level:
+            sink.put((time.time(), WARNING, self.name, event, fields))
+
+    def error(self, event: str, **fields: Any) -> None:
+        sink = _sink or _get_sink()
+        if ERROR >= sink.level:
+            sink.put((time.time(), ERROR, self.name, event, fields))
+
+
+_loggers: Dict[str, Logger] = {}
+
+
+def get_logger(name: str) -> Logger:
+    lg = _loggers.get(name)
+    if lg is None:
+        lg = _loggers.setdefault(name, Logger(name))
+    return lg
+
+
+def flush(timeout: float = 2.0) -> None:
+    if _sink is not None:
+        _sink.flush(timeout)
+
+
+def dropped() -> int:
+    return _sink.dropped if _sink is not None else 0
@@ -47,3 +47,23 @@ def remove_model_thoughts(s: str) -> str:
     s = re.sub(r"(?im)^\s*FINAL\s*:\s*", "", s)
 
     return strip_surrounding_whitespace_lines(s)
+
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(s: str) -> int:
+    """Cheap token estimate (~4 chars per token). Good enough for budgeting, not for billing."""
+    if not s:
+        return 0
+    return (len(s) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clamp(s: str, limit: int) -> str:
+    """Cut s to at most limit chars, marking the cut with "...(+N)"."""
+    if s is None:
+        return ""
+    if limit <= 0 or len(s) <= limit:
+        return s
+    tail = f"...(+{len(s) - limit})"
+    return s[: max(0, limit - len(tail))] + tail